@@ -0,0 +1,152 @@
+import os
+import re
+from typing import Dict, Iterable, List, Optional
+
+import numpy as np
+
+# Punctuation that separates tokens, besides whitespace: ASCII, Latin-1, general and CJK
+# punctuation, fullwidth ASCII punctuation and the Myanmar section marks
+SEPARATOR_RANGES = [(0x21, 0x2f), (0x3a, 0x40), (0x5b, 0x60), (0x7b, 0x7e), (0xa1, 0xbf),
+                    (0x2010, 0x205e), (0x3000, 0x303f), (0xff01, 0xff0f), (0x104a, 0x104b)]
+
+# Tokens are runs of characters that are neither whitespace nor separators. Unlike \w+
+# this keeps combining marks, so words in scripts such as Myanmar or Devanagari stay whole.
+DEFAULT_PATTERN = "[^\\s" + "".join(f"\\u{lo:04x}-\\u{hi:04x}" for lo, hi in SEPARATOR_RANGES) + "]+"
+
+# Same tokenization as DEFAULT_PATTERN with str.translate + str.split, about twice as fast
+_SEPARATOR_TABLE = {c: " " for lo, hi in SEPARATOR_RANGES for c in range(lo, hi + 1)}
+
+ENGLISH_STOPWORDS = frozenset("""
+a about above after again against all am an and any are as at be because been before being below
+between both but by can could did do does doing down during each few for from further had has have
+having he her here hers herself him himself his how i if in into is it its itself just me more most
+my myself no nor not now of off on once only or other our ours ourselves out over own same she should
+so some such than that the their theirs them themselves then there these they this those through to
+too under until up very was we were what when where which while who whom why will with would you
+your yours yourself yourselves s t d ll m re ve
+""".split())
+
+STOPWORD_LISTS = {'none': frozenset(), 'english': ENGLISH_STOPWORDS}
+STEMMERS = ("none", "plural", "snowball")
+
+
+def plural_stem(term: str) -> str:
+    """English plural stripping (the S-stemmer): "queries" -> "query", "documents" -> "document"."""
+    if len(term) <= 3 or not term.endswith("s"):
+        return term
+    if term.endswith("ies") and not term.endswith(("eies", "aies")):
+        return term[:-3] + "y"
+    if term.endswith("es") and not term.endswith(("aes", "ees", "oes")):
+        return term[:-1]
+    if not term.endswith(("us", "ss")):
+        return term[:-1]
+    return term
+
+
+class Analyzer:
+    """
+    Turns text into index terms, the same way for chunks and queries:
+    regex tokenization, lowercasing, stopword removal and stemming.
+
+    Each distinct token is normalized once and remembered (dropped tokens map to ""),
+    so analyzing a chunk is one regex scan plus C-level dict lookups.
+    """
+
+    CACHE_SIZE = 200_000
+
+    def __init__(self, pattern: str = DEFAULT_PATTERN, lowercase: bool = True,
+                 stopwords: str = "english", stemmer: str = "plural"):
+        if stopwords not in STOPWORD_LISTS:
+            raise ValueError(f"Unknown stopword list '{stopwords}', expected one of {', '.join(STOPWORD_LISTS)}")
+        if stemmer not in STEMMERS:
+            raise ValueError(f"Unknown stemmer '{stemmer}', expected one of {', '.join(STEMMERS)}")
+        self.pattern = pattern
+        self.lowercase = lowercase
+        self.stopwords = stopwords
+        self.stemmer = stemmer
+        self._findall = re.compile(pattern).findall
+        self._stopwords = STOPWORD_LISTS[stopwords]
+        self._stem = self._make_stemmer(stemmer)
+        self._terms: Dict[str, str] = {}
+
+    @staticmethod
+    def _make_stemmer(name: str):
+        if name == "plural":
+            return plural_stem
+        if name == "snowball":
+            try:
+                import snowballstemmer
+            except ImportError:
+                raise ValueError("KEYWORD_STEMMER=snowball needs the snowballstemmer package (pip install snowballstemmer)")
+            return snowballstemmer.stemmer("english").stemWord
+        return None
+
+    @classmethod
+    def from_env(cls) -> "Analyzer":
+        return cls(
+            pattern=os.getenv("KEYWORD_TOKEN_PATTERN", DEFAULT_PATTERN),
+            lowercase=os.getenv("KEYWORD_LOWERCASE", "true").lower() == "true",
+            stopwords=os.getenv("KEYWORD_STOPWORDS", "english"),
+            stemmer=os.getenv("KEYWORD_STEMMER", "plural")
+        )
+
+    def to_dict(self) -> dict:
+        """Settings recorded in the keyword index manifest; an index is only searched with the analyzer that built it."""
+        return {'pattern': self.pattern, 'lowercase': self.lowercase, 'stopwords': self.stopwords, 'stemmer': self.stemmer}
+
+    @classmethod
+    def from_dict(cls, settings: dict) -> "Analyzer":
+        return cls(**settings)
+
+    def __eq__(self, other) -> bool:
+        return isinstance(other, Analyzer) and self.to_dict() == other.to_dict()
+
+    def __repr__(self) -> str:
+        return f"Analyzer(stopwords={self.stopwords!r}, stemmer={self.stemmer!r}, lowercase={self.lowercase})"
+
+    def _normalize(self, token: str) -> str:
+        """Term for one raw token, or "" if it is dropped."""
+        if token in self._stopwords:
+            return ""
+        return self._stem(token) if self._stem is not None else token
+
+    def __call__(self, text: str) -> List[str]:
+        if self.lowercase:
+            text = text.lower()
+        tokens = text.translate(_SEPARATOR_TABLE).split() if self.pattern == DEFAULT_PATTERN else self._findall(text)
+        if not self._stopwords and self._stem is None:
+            return tokens
+
+        # A full cache is replaced rather than cleared, so concurrent calls keep a consistent one
+        terms = self._terms
+        if len(terms) > self.CACHE_SIZE:
+            terms = self._terms = {}
+        for token in set(tokens).difference(terms):
+            terms[token] = self._normalize(token)
+        return list(filter(None, map(terms.get, tokens)))
+
+
+class Vocabulary:
+    """
+    Shared term -> integer id interning for the keyword index. Ids are dense and
+    assigned in first-seen order, so list(ids) is the id -> term table.
+    """
+
+    def __init__(self, terms: Iterable[str] = ()):
+        self.ids: Dict[str, int] = {term: i for i, term in enumerate(terms)}
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def get(self, term: str) -> Optional[int]:
+        return self.ids.get(term)
+
+    def intern(self, terms: List[str]) -> np.ndarray:
+        """Ids of `terms`, adding new terms to the vocabulary (in first-seen order)."""
+        ids = self.ids
+        new = [term for term in dict.fromkeys(terms) if term not in ids]
+        ids.update(zip(new, range(len(ids), len(ids) + len(new))))
+        return np.fromiter(map(ids.__getitem__, terms), dtype=np.int64, count=len(terms))
+
+    def terms(self) -> List[str]:
+        return list(self.ids)
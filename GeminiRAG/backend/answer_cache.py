@@ -0,0 +1,171 @@
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, FrozenSet, Iterable, List, Optional
+
+import numpy as np
+
+
+class AnswerCache:
+    """
+    Semantic cache of generated answers for /ask. A question reuses a cached answer when
+    its retrieval returned exactly the same chunks and its embedding is within `threshold`
+    cosine similarity of the cached question's, so paraphrases of a question skip the
+    LLM call. Entries expire after `ttl` seconds and whenever the index generation
+    changes (documents added, replaced or deleted).
+
+    The question embeddings are rows of one preallocated matrix (unit vectors), and a
+    lookup only compares against the rows cached for the same set of chunks.
+    """
+
+    def __init__(self, maxsize: int = 256, ttl: Optional[float] = 3600, threshold: float = 0.95):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.threshold = threshold
+        self._vectors: Optional[np.ndarray] = None
+        self._free_rows: List[int] = []
+        # row -> entry in LRU order, and the rows cached for each set of chunk ids
+        self._entries: "OrderedDict[int, dict]" = OrderedDict()
+        self._rows_by_context: Dict[FrozenSet[str], List[int]] = {}
+        self._generation: Optional[int] = None
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+        self.seconds_saved = 0.0
+
+    @classmethod
+    def from_env(cls) -> "AnswerCache":
+        ttl = float(os.getenv("ANSWER_CACHE_TTL", "3600"))
+        return cls(
+            maxsize=int(os.getenv("ANSWER_CACHE_SIZE", "256")),
+            ttl=ttl if ttl > 0 else None,
+            threshold=float(os.getenv("ANSWER_CACHE_THRESHOLD", "0.95"))
+        )
+
+    @property
+    def enabled(self) -> bool:
+        return self.maxsize > 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def lookup(self, embedding: List[float], chunk_ids: Iterable[str], generation: int) -> Optional[Dict[str, Any]]:
+        """
+        The cached answer for a question with this embedding that retrieved `chunk_ids`
+        at index `generation`, or None. A hit carries the cached 'answer', 'sources' and
+        'context', the cached 'question', its 'similarity' and the 'seconds' it took to generate.
+        """
+        if not self.enabled:
+            return None
+        query = _unit(embedding)
+        context = frozenset(chunk_ids)
+        with self._lock:
+            self._check_generation(generation)
+            now = time.monotonic()
+            best, best_similarity = None, self.threshold
+            # A search that started before the latest index change cannot reuse its answers
+            rows = self._rows_by_context.get(context, ()) if generation == self._generation else ()
+            for row in list(rows):
+                entry = self._entries[row]
+                if entry['expires_at'] is not None and entry['expires_at'] <= now:
+                    self._remove(row)
+                    continue
+                if len(query) != self._vectors.shape[1]:
+                    continue
+                similarity = float(self._vectors[row] @ query)
+                if similarity >= best_similarity:
+                    best, best_similarity = row, similarity
+
+            if best is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(best)
+            entry = self._entries[best]
+            self.hits += 1
+            self.seconds_saved += entry['seconds']
+            return dict(entry['answer'], question=entry['question'], similarity=round(best_similarity, 4),
+                        seconds=entry['seconds'])
+
+    def store(self, question: str, embedding: List[float], chunk_ids: Iterable[str], generation: int,
+              answer: Dict[str, Any], seconds: float):
+        """
+        Cache `answer` (the 'answer', 'sources' and 'context' of the response) for a question
+        that retrieved `chunk_ids` at index `generation`; `seconds` is what generating it took.
+        Answers from a generation that has since been replaced are not cached.
+        """
+        if not self.enabled:
+            return
+        vector = _unit(embedding)
+        context = frozenset(chunk_ids)
+        with self._lock:
+            self._check_generation(generation)
+            if generation != self._generation:
+                return
+            if self._vectors is None or self._vectors.shape[1] != len(vector):
+                # First entry, or a different embedding model: start over at its dimension
+                self._clear()
+                self._vectors = np.zeros((self.maxsize, len(vector)), dtype=np.float32)
+                self._free_rows = list(range(self.maxsize - 1, -1, -1))
+            if not self._free_rows:
+                self._remove(next(iter(self._entries)))
+                self.evictions += 1
+
+            row = self._free_rows.pop()
+            self._vectors[row] = vector
+            self._entries[row] = {
+                'question': question,
+                'context': context,
+                'answer': answer,
+                'seconds': seconds,
+                'expires_at': time.monotonic() + self.ttl if self.ttl else None
+            }
+            self._rows_by_context.setdefault(context, []).append(row)
+
+    def clear(self):
+        with self._lock:
+            self._clear()
+
+    def _check_generation(self, generation: int):
+        """Drop every entry once the index moves to a newer generation (caller holds _lock)."""
+        if self._generation is None or generation > self._generation:
+            if self._entries:
+                self.invalidations += 1
+                self._clear()
+            self._generation = generation
+
+    def _remove(self, row: int):
+        entry = self._entries.pop(row)
+        rows = self._rows_by_context[entry['context']]
+        rows.remove(row)
+        if not rows:
+            del self._rows_by_context[entry['context']]
+        self._free_rows.append(row)
+
+    def _clear(self):
+        self._free_rows.extend(self._entries)
+        self._entries.clear()
+        self._rows_by_context.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            'size': len(self._entries),
+            'maxsize': self.maxsize,
+            'ttl': self.ttl,
+            'threshold': self.threshold,
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+            'invalidations': self.invalidations,
+            'hit_rate': round(self.hits / lookups, 4) if lookups else 0.0,
+            'generation_seconds_saved': round(self.seconds_saved, 3),
+        }
+
+
+def _unit(embedding: List[float]) -> np.ndarray:
+    vector = np.asarray(embedding, dtype=np.float32)
+    norm = np.linalg.norm(vector)
+    return vector / norm if norm else vector
@@ -1,30 +1,70 @@
 import os
-from typing import List, Dict, Any
-from langchain_experimental.text_splitter import SemanticChunker
+import re
+from typing import List, Dict, Any, Optional, Tuple
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+from langchain_core.language_models import BaseChatModel
 from langchain_google_genai import GoogleGenerativeAIEmbeddings, ChatGoogleGenerativeAI
 from langchain.text_splitter import RecursiveCharacterTextSplitter
 
+from .embedding_scheduler import EmbeddingScheduler
+from .metrics import metrics
+from .propositions import PropositionExtractor
+
+# Semantic chunking parameters
+BASE_CHUNK_SIZE = 1500
+BASE_CHUNK_OVERLAP = 300
+SENTENCE_SPLIT_REGEX = r"(?<=[.?!])\s+"
+BREAKPOINT_PERCENTILE = 90  # Stricter threshold (was 75) to split less often
+MIN_CHUNK_SIZE = 350  # Target minimum size
+
+
 class AgenticChunker:
-    def __init__(self, strategy: str = "semantic"):
+    def __init__(self, strategy: str = "semantic", embeddings: Optional[Embeddings] = None,
+                 pooled_vectors: Optional[bool] = None, llm: Optional[BaseChatModel] = None):
+        """
+        embeddings: optional shared embeddings client. Pass DocumentStore.embeddings so
+        sentence embeddings go through the same content-addressed cache as chunks.
+        pooled_vectors: return a vector per semantic chunk from chunk_with_vectors, pooled
+        from its sentence embeddings (defaults to SEMANTIC_POOLED_VECTORS, off).
+        llm: optional chat model for proposition extraction (defaults to Gemini).
+        """
         self.strategy = strategy
         api_key = os.getenv("GOOGLE_API_KEY")
-        self.embeddings = GoogleGenerativeAIEmbeddings(
-            model="models/embedding-001",
-            google_api_key=api_key
+        self.embeddings = embeddings or EmbeddingScheduler.from_env(
+            GoogleGenerativeAIEmbeddings(
+                model="models/embedding-001",
+                google_api_key=api_key
+            )
         )
-        self.llm = ChatGoogleGenerativeAI(
+        if pooled_vectors is None:
+            pooled_vectors = os.getenv("SEMANTIC_POOLED_VECTORS", "false").lower() == "true"
+        self.pooled_vectors = pooled_vectors
+        self.llm = llm or ChatGoogleGenerativeAI(
             model="gemini-2.0-flash",
             google_api_key=api_key,
             temperature=0
         )
+        self.propositions = PropositionExtractor.from_env(self.llm)
 
     def chunk(self, text: str) -> List[str]:
-        if self.strategy == "semantic":
-            return self._semantic_chunking(text)
-        elif self.strategy == "agentic": # Proposition-based
-            return self._proposition_chunking(text)
-        else:
-            return self._recursive_chunking(text)
+        return self.chunk_with_vectors(text)[0]
+
+    def chunk_with_vectors(self, text: str) -> Tuple[List[str], Optional[List[List[float]]]]:
+        """
+        Chunk text and, with pooled_vectors on, also return one embedding per chunk so the
+        chunks don't need embedding again at indexing. Vectors are None when disabled or
+        when the chunks were not produced by semantic splitting.
+        """
+        with metrics.timer("chunk"):
+            if self.strategy == "semantic":
+                chunks, vectors = self._semantic_split(text)
+            elif self.strategy == "agentic": # Proposition-based
+                chunks, vectors = self._semantic_split(self._extract_propositions(text))
+            else:
+                return self._recursive_chunking(text), None
+        return chunks, vectors if self.pooled_vectors else None
 
     def _recursive_chunking(self, text: str) -> List[str]:
         splitter = RecursiveCharacterTextSplitter(
@@ -33,101 +73,111 @@ class AgenticChunker:
         )
         return splitter.split_text(text)
 
-    def _semantic_chunking(self, text: str) -> List[str]:
-        """
-        Hybrid semantic chunking: Creates large base chunks then semantically refines them.
-        No fallbacks - always uses this approach for consistency.
-        """
-        # Create larger base chunks using RecursiveCharacterTextSplitter
+    def _base_chunks(self, text: str) -> List[str]:
         base_splitter = RecursiveCharacterTextSplitter(
-            chunk_size=1500,
-            chunk_overlap=300,
+            chunk_size=BASE_CHUNK_SIZE,
+            chunk_overlap=BASE_CHUNK_OVERLAP,
             separators=["\n\n", "\n", ". ", " ", ""]
         )
-        
-        base_chunks = base_splitter.split_text(text)
-        
-        # For short documents, just return the base chunks
-        if len(base_chunks) <= 2:
-            return base_chunks
-        
-        # Apply semantic refinement with stricter thresholds to avoid over-splitting
-        semantic_splitter = SemanticChunker(
-            self.embeddings,
-            breakpoint_threshold_type="percentile",
-            breakpoint_threshold_amount=90  # Stricter threshold (was 75) to split less often
-        )
-        
-        docs = semantic_splitter.create_documents([text])
-        raw_chunks = [doc.page_content.strip() for doc in docs]
-        
-        # Post-processing: Merge small chunks with neighbors
+        return base_splitter.split_text(text)
+
+    def _semantic_chunking(self, text: str) -> List[str]:
+        return self._semantic_split(text)[0]
+
+    def _semantic_split(self, text: str) -> Tuple[List[str], Optional[List[List[float]]]]:
+        """
+        Hybrid semantic chunking: short documents keep their base chunks, longer ones are
+        split at semantic boundaries and small chunks are merged with neighbors.
+
+        Single pass: sentence windows are embedded once (batched), breakpoints come from
+        vectorized cosine distances, and merging runs over the groups directly while
+        pooling the sentence embeddings of each merged chunk.
+        """
+        # 1. For short documents, just return the base chunks. The base split can only
+        # produce <= 2 chunks when the non-whitespace text fits in two of them, so longer
+        # documents skip it entirely
+        if len(re.sub(r"\s", "", text)) <= 2 * BASE_CHUNK_SIZE:
+            base_chunks = self._base_chunks(text)
+            if len(base_chunks) <= 2:
+                return base_chunks, None
+
+        # 2. Split into sentences and embed each with one sentence of context on both sides
+        sentences = re.split(SENTENCE_SPLIT_REGEX, text)
+        if len(sentences) == 1:
+            groups = [(0, 1)]
+            embeddings = None
+        else:
+            windows = [" ".join(sentences[max(0, i - 1):i + 2]) for i in range(len(sentences))]
+            embeddings = np.asarray(self.embeddings.embed_documents(windows), dtype=np.float64)
+
+            # 3. Cosine distance between consecutive windows; break above the percentile
+            norms = np.linalg.norm(embeddings, axis=1)
+            with np.errstate(divide="ignore", invalid="ignore"):
+                similarities = np.einsum("ij,ij->i", embeddings[:-1], embeddings[1:]) / (norms[:-1] * norms[1:])
+            similarities[~np.isfinite(similarities)] = 0.0
+            distances = 1.0 - similarities
+            threshold = np.percentile(distances, BREAKPOINT_PERCENTILE)
+            ends = np.flatnonzero(distances > threshold) + 1
+            bounds = [0, *ends.tolist(), len(sentences)]
+            groups = [(start, end) for start, end in zip(bounds[:-1], bounds[1:]) if start < end]
+
+        # 4. Post-processing: Merge small chunks with neighbors
         # Instead of dropping small chunks (losing content), we merge them
-        merged_chunks = []
+        merged_chunks: List[str] = []
+        merged_spans: List[List[Tuple[int, int]]] = []
         current_chunk = ""
-        min_chunk_size = 350  # Target minimum size
-        
-        for chunk in raw_chunks:
+        current_spans: List[Tuple[int, int]] = []
+
+        for start, end in groups:
+            chunk = " ".join(sentences[start:end]).strip()
             # Skip empty or garbage chunks
             if not chunk or len(set(chunk)) < 10:
                 continue
-                
+
             if not current_chunk:
-                current_chunk = chunk
+                current_chunk, current_spans = chunk, [(start, end)]
+            elif len(current_chunk) < MIN_CHUNK_SIZE:
+                current_chunk += " " + chunk
+                current_spans.append((start, end))
             else:
-                # If current chunk is too small, or adding the next one keeps it under a reasonable limit
-                if len(current_chunk) < min_chunk_size:
-                    current_chunk += " " + chunk
-                else:
-                    # Current chunk is big enough, save it and start new
-                    merged_chunks.append(current_chunk)
-                    current_chunk = chunk
-        
+                # Current chunk is big enough, save it and start new
+                merged_chunks.append(current_chunk)
+                merged_spans.append(current_spans)
+                current_chunk, current_spans = chunk, [(start, end)]
+
         # Don't forget the last chunk
         if current_chunk:
             # If the last chunk is too small and we have previous chunks, merge with the last one
-            if len(current_chunk) < min_chunk_size and merged_chunks:
+            if len(current_chunk) < MIN_CHUNK_SIZE and merged_chunks:
                 merged_chunks[-1] += " " + current_chunk
+                merged_spans[-1].extend(current_spans)
             else:
                 merged_chunks.append(current_chunk)
-        
-        return merged_chunks if merged_chunks else base_chunks
+                merged_spans.append(current_spans)
+
+        if not merged_chunks:
+            return self._base_chunks(text), None
+        if embeddings is None:
+            return merged_chunks, None
+        return merged_chunks, [self._pool(embeddings, spans) for spans in merged_spans]
+
+    @staticmethod
+    def _pool(embeddings: np.ndarray, spans: List[Tuple[int, int]]) -> List[float]:
+        """Mean of the unit-normalized sentence embeddings in the spans, re-normalized."""
+        rows = np.concatenate([embeddings[start:end] for start, end in spans])
+        norms = np.linalg.norm(rows, axis=1, keepdims=True)
+        norms[norms == 0] = 1.0
+        pooled = (rows / norms).mean(axis=0)
+        norm = np.linalg.norm(pooled)
+        return (pooled / norm if norm else pooled).tolist()
 
     def _proposition_chunking(self, text: str) -> List[str]:
         """
         Splits text into propositions using LLM, then chunks them.
         This is a simplified implementation of the "Agentic Chunking" concept.
         """
-        # 1. Split into sentences (simple approximation)
-        import re
-        sentences = re.split(r'(?<=[.!?]) +', text)
-        
-        # 2. Generate propositions for each sentence (or batch of sentences)
-        # For efficiency, we'll process in batches
-        batch_size = 5
-        propositions = []
-        
-        for i in range(0, len(sentences), batch_size):
-            batch = sentences[i:i+batch_size]
-            batch_text = " ".join(batch)
-            
-            prompt = f"""
-            Break down the following text into atomic, context-independent propositions. 
-            Each proposition should be a self-contained sentence.
-            Return ONLY the list of propositions, one per line.
-            
-            Text: {batch_text}
-            """
-            
-            try:
-                response = self.llm.invoke(prompt)
-                batch_props = response.content.strip().split('\n')
-                propositions.extend([p.strip() for p in batch_props if p.strip()])
-            except Exception as e:
-                print(f"Error generating propositions: {e}")
-                propositions.extend(batch) # Fallback to original sentences
-        
-        # 3. Group propositions semantically
-        # We can reuse SemanticChunker on the propositions
-        combined_text = "\n".join(propositions)
-        return self._semantic_chunking(combined_text)
+        return self._semantic_chunking(self._extract_propositions(text))
+
+    def _extract_propositions(self, text: str) -> str:
+        """Rewrite text as newline-separated propositions using the LLM."""
+        return "\n".join(self.propositions.extract(text))
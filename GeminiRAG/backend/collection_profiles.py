@@ -0,0 +1,162 @@
+import os
+from typing import Any, Dict, Optional
+
+from qdrant_client import QdrantClient
+from qdrant_client.models import (
+    BinaryQuantization,
+    BinaryQuantizationConfig,
+    Distance,
+    HnswConfigDiff,
+    QuantizationSearchParams,
+    ScalarQuantization,
+    ScalarQuantizationConfig,
+    ScalarType,
+    SearchParams,
+    VectorParams,
+)
+
+VECTOR_SIZE = 768
+QUANTIZATION_TYPES = (None, "scalar", "binary")
+
+
+class CollectionProfile:
+    """
+    Storage and index settings for the Qdrant collection: quantization (int8 scalar or
+    binary, kept in RAM and rescored against the original vectors), on-disk vectors and
+    payloads, and HNSW parameters. The same profile is used whenever the collection is
+    created, so a recreated collection (e.g. after /clear) keeps its settings.
+
+    Note: the embedded local client (QdrantClient(path=...)) accepts these settings but
+    always searches exactly in RAM; they take effect on a Qdrant server.
+    """
+
+    def __init__(self, name: str, quantization: Optional[str] = None, on_disk: bool = False,
+                 on_disk_payload: bool = False, hnsw_m: Optional[int] = None,
+                 hnsw_ef_construct: Optional[int] = None, hnsw_ef: Optional[int] = None,
+                 rescore: bool = True, oversampling: Optional[float] = None):
+        if quantization not in QUANTIZATION_TYPES:
+            raise ValueError(f"Unknown quantization '{quantization}', expected one of {QUANTIZATION_TYPES}")
+        self.name = name
+        self.quantization = quantization
+        self.on_disk = on_disk
+        self.on_disk_payload = on_disk_payload
+        self.hnsw_m = hnsw_m
+        self.hnsw_ef_construct = hnsw_ef_construct
+        self.hnsw_ef = hnsw_ef
+        self.rescore = rescore
+        self.oversampling = oversampling
+
+    @classmethod
+    def from_env(cls) -> "CollectionProfile":
+        """COLLECTION_PROFILE selects a preset; HNSW_* and QUANTIZATION_* override its fields."""
+        name = os.getenv("COLLECTION_PROFILE", "memory")
+        if name not in PROFILES:
+            raise ValueError(f"Unknown COLLECTION_PROFILE '{name}', expected one of {sorted(PROFILES)}")
+        settings = PROFILES[name].to_dict()
+        for key, env, cast in [
+            ('hnsw_m', "HNSW_M", int),
+            ('hnsw_ef_construct', "HNSW_EF_CONSTRUCT", int),
+            ('hnsw_ef', "HNSW_EF", int),
+            ('oversampling', "QUANTIZATION_OVERSAMPLING", float),
+        ]:
+            if os.getenv(env):
+                settings[key] = cast(os.getenv(env))
+        if os.getenv("QUANTIZATION_RESCORE"):
+            settings['rescore'] = os.getenv("QUANTIZATION_RESCORE").lower() == "true"
+        return cls(**settings)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            'name': self.name,
+            'quantization': self.quantization,
+            'on_disk': self.on_disk,
+            'on_disk_payload': self.on_disk_payload,
+            'hnsw_m': self.hnsw_m,
+            'hnsw_ef_construct': self.hnsw_ef_construct,
+            'hnsw_ef': self.hnsw_ef,
+            'rescore': self.rescore,
+            'oversampling': self.oversampling,
+        }
+
+    def mismatches(self, actual: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Storage settings of `actual` (collection_settings()) that differ from this profile,
+        as {field: (requested, actual)}. HNSW fields the profile leaves unset are not compared.
+        """
+        requested = self.to_dict()
+        differences = {}
+        for key in ('quantization', 'on_disk', 'on_disk_payload', 'hnsw_m', 'hnsw_ef_construct'):
+            if key.startswith('hnsw') and requested[key] is None:
+                continue
+            if requested[key] != actual.get(key):
+                differences[key] = (requested[key], actual.get(key))
+        return differences
+
+    def _hnsw_config(self) -> Optional[HnswConfigDiff]:
+        if self.hnsw_m is None and self.hnsw_ef_construct is None:
+            return None
+        return HnswConfigDiff(m=self.hnsw_m, ef_construct=self.hnsw_ef_construct)
+
+    def _quantization_config(self):
+        if self.quantization == "scalar":
+            return ScalarQuantization(scalar=ScalarQuantizationConfig(type=ScalarType.INT8, quantile=0.99, always_ram=True))
+        if self.quantization == "binary":
+            return BinaryQuantization(binary=BinaryQuantizationConfig(always_ram=True))
+        return None
+
+    def create_collection(self, client: QdrantClient, collection_name: str, size: int = VECTOR_SIZE):
+        client.create_collection(
+            collection_name=collection_name,
+            vectors_config=VectorParams(size=size, distance=Distance.COSINE, on_disk=self.on_disk or None),
+            on_disk_payload=self.on_disk_payload or None,
+            hnsw_config=self._hnsw_config(),
+            quantization_config=self._quantization_config(),
+        )
+
+    def search_params(self) -> Optional[SearchParams]:
+        """Query-time settings: HNSW ef and quantized search with rescoring."""
+        quantization = None
+        if self.quantization is not None:
+            quantization = QuantizationSearchParams(rescore=self.rescore, oversampling=self.oversampling)
+        if quantization is None and self.hnsw_ef is None:
+            return None
+        return SearchParams(hnsw_ef=self.hnsw_ef, quantization=quantization)
+
+
+PROFILES: Dict[str, CollectionProfile] = {
+    # Float32 vectors, payloads and HNSW graph in RAM (Qdrant defaults)
+    "memory": CollectionProfile("memory"),
+    # int8 vectors in RAM for the search (~4x smaller), float32 kept for rescoring
+    "scalar": CollectionProfile("scalar", quantization="scalar", oversampling=2.0),
+    # 1 bit per dimension in RAM (~32x smaller); wider oversampling makes up for the coarser first pass
+    "binary": CollectionProfile("binary", quantization="binary", oversampling=3.0),
+    # Float32 vectors and payloads on disk, only int8 quantized vectors in RAM
+    "on_disk": CollectionProfile("on_disk", quantization="scalar", on_disk=True, on_disk_payload=True,
+                                 oversampling=2.0),
+}
+
+
+def collection_settings(info) -> Dict[str, Any]:
+    """
+    The storage settings an existing collection was created with, from get_collection(),
+    in the layout of CollectionProfile.to_dict() (query-time fields come from the profile).
+    """
+    config = info.config
+    vectors = config.params.vectors
+    quantization_config = getattr(vectors, 'quantization_config', None) or config.quantization_config
+    quantization = None
+    if quantization_config is not None:
+        if getattr(quantization_config, 'scalar', None) is not None:
+            quantization = "scalar"
+        elif getattr(quantization_config, 'binary', None) is not None:
+            quantization = "binary"
+        else:
+            quantization = type(quantization_config).__name__
+    hnsw = getattr(vectors, 'hnsw_config', None) or config.hnsw_config
+    return {
+        'quantization': quantization,
+        'on_disk': bool(getattr(vectors, 'on_disk', None)),
+        'on_disk_payload': bool(config.params.on_disk_payload),
+        'hnsw_m': getattr(hnsw, 'm', None),
+        'hnsw_ef_construct': getattr(hnsw, 'ef_construct', None),
+    }
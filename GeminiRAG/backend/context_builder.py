@@ -0,0 +1,187 @@
+import hashlib
+import os
+import threading
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from .embedding_scheduler import estimate_tokens
+
+_PRIME = (1 << 31) - 1
+
+
+class MinHasher:
+    """MinHash signatures over word shingles; the fraction of equal slots estimates Jaccard similarity."""
+
+    def __init__(self, num_perm: int = 64, shingle_size: int = 3, seed: int = 1):
+        self.shingle_size = shingle_size
+        rng = np.random.default_rng(seed)
+        # (a * h + b) mod p with a, b, h < p = 2^31 - 1 stays below 2^63 in uint64
+        self._a = rng.integers(1, _PRIME, size=num_perm, dtype=np.uint64)
+        self._b = rng.integers(0, _PRIME, size=num_perm, dtype=np.uint64)
+
+    def signature(self, text: str) -> np.ndarray:
+        words = text.lower().split()
+        n = self.shingle_size
+        shingles = {" ".join(words[i:i + n]) for i in range(max(len(words) - n + 1, 1))}
+        hashes = np.fromiter(
+            (int.from_bytes(hashlib.blake2b(s.encode("utf-8"), digest_size=8).digest(), "little") % _PRIME
+             for s in shingles),
+            dtype=np.uint64, count=len(shingles)
+        )
+        return ((np.outer(self._a, hashes) + self._b[:, None]) % _PRIME).min(axis=1)
+
+    @staticmethod
+    def similarity(a: np.ndarray, b: np.ndarray) -> float:
+        return float(np.mean(a == b))
+
+
+def _overlap(previous: str, following: str, min_chars: int = 30, max_chars: int = 600) -> int:
+    """Length of the longest suffix of `previous` that is also a prefix of `following`."""
+    limit = min(len(previous), len(following), max_chars)
+    for size in range(limit, min_chars - 1, -1):
+        if previous.endswith(following[:size]):
+            return size
+    return 0
+
+
+class ContextBuilder:
+    """
+    Assembles the /ask prompt context from fused search results under a token budget:
+    results are taken in fused-rank order, near-duplicates (MinHash Jaccard estimate at
+    or above `dedup_threshold`) are dropped, chunks are added while they fit the budget,
+    and chunks from the same source with consecutive chunk_index are merged into one
+    passage with their overlapping text removed. Running totals of prompt tokens saved
+    are kept for /stats.
+    """
+
+    def __init__(self, max_tokens: int = 4000, dedup_threshold: float = 0.8, num_perm: int = 64):
+        self.max_tokens = max_tokens
+        self.dedup_threshold = dedup_threshold
+        self.minhash = MinHasher(num_perm=num_perm)
+        self._stats_lock = threading.Lock()
+        self._stats = {'queries': 0, 'tokens_in': 0, 'tokens_out': 0, 'duplicates_dropped': 0,
+                       'over_budget_dropped': 0, 'overlap_chars_trimmed': 0}
+
+    @classmethod
+    def from_env(cls) -> "ContextBuilder":
+        return cls(
+            max_tokens=int(os.getenv("CONTEXT_MAX_TOKENS", "4000")),
+            dedup_threshold=float(os.getenv("CONTEXT_DEDUP_THRESHOLD", "0.8")),
+        )
+
+    @staticmethod
+    def _position(result: Dict) -> Optional[Tuple[Any, int]]:
+        metadata = result.get('metadata') or {}
+        if metadata.get('source') is None or not isinstance(metadata.get('chunk_index'), int):
+            return None
+        return metadata['source'], metadata['chunk_index']
+
+    def build(self, results: List[Dict]) -> Tuple[str, Dict[str, Any]]:
+        """
+        Return (context, info) for results in fused-rank order. Passages are labelled with
+        the 1-based numbers of the results they contain, e.g. "[Source 2, 3]", so citations
+        still match the returned sources list. info reports this query's token savings.
+        """
+        # 1. Drop near-duplicates of better-ranked results
+        kept, signatures, duplicates = [], [], 0
+        for rank, result in enumerate(results):
+            signature = self.minhash.signature(result['content'])
+            if any(self.minhash.similarity(signature, other) >= self.dedup_threshold for other in signatures):
+                duplicates += 1
+                continue
+            kept.append(rank)
+            signatures.append(signature)
+
+        # 2. Add chunks by rank while they fit; text shared with an already selected
+        # neighbor (the chunk overlap) is not counted twice
+        selected: Dict[int, str] = {}
+        positions: Dict[int, Tuple[Any, int]] = {}
+        by_position = {}
+        budget, over_budget = self.max_tokens, 0
+        for rank in kept:
+            content = results[rank]['content']
+            position = self._position(results[rank])
+            shared = 0
+            if position is not None:
+                source, index = position
+                if (source, index - 1) in by_position:
+                    shared += _overlap(selected[by_position[(source, index - 1)]], content)
+                if (source, index + 1) in by_position:
+                    shared += _overlap(content, selected[by_position[(source, index + 1)]])
+            cost = estimate_tokens(content[shared:]) if shared < len(content) else 0
+            if cost > budget:
+                if selected:
+                    over_budget += 1
+                    continue
+                # The best result alone exceeds the budget: keep its beginning
+                content = content[:budget * 4]
+                cost = budget
+            selected[rank] = content
+            budget -= cost
+            # Repeated positions (e.g. separate /add calls) stay standalone passages
+            if position is not None and position not in by_position:
+                by_position[position] = rank
+                positions[rank] = position
+
+        # 3. Merge runs of consecutive chunks from the same source, trimming overlaps
+        passages: List[Tuple[List[int], str]] = []
+        grouped = set()
+        trimmed = 0
+        for rank in selected:
+            if rank in grouped:
+                continue
+            run = [rank]
+            if rank in positions:
+                source, index = positions[rank]
+                start = index
+                while (source, start - 1) in by_position:
+                    start -= 1
+                end = index
+                while (source, end + 1) in by_position:
+                    end += 1
+                run = [by_position[(source, i)] for i in range(start, end + 1)]
+            text = selected[run[0]]
+            for previous, following in zip(run, run[1:]):
+                shared = _overlap(selected[previous], selected[following])
+                trimmed += shared
+                text += selected[following][shared:] if shared else "\n" + selected[following]
+            grouped.update(run)
+            passages.append((sorted(r + 1 for r in run), text))
+
+        context = "\n\n".join(
+            f"[Source {', '.join(str(n) for n in numbers)}]: {text}" for numbers, text in passages
+        )
+
+        # Token use of the old context: every result, in full
+        tokens_in = sum(estimate_tokens(f"[Source {i+1}]: {r['content']}") for i, r in enumerate(results))
+        tokens_out = estimate_tokens(context) if context else 0
+        info = {
+            'chunks_in': len(results),
+            'chunks_used': len(selected),
+            'passages': len(passages),
+            'tokens_in': tokens_in,
+            'tokens_out': tokens_out,
+            'tokens_saved': max(tokens_in - tokens_out, 0),
+            'duplicates_dropped': duplicates,
+            'over_budget_dropped': over_budget,
+            'overlap_chars_trimmed': trimmed,
+        }
+        with self._stats_lock:
+            self._stats['queries'] += 1
+            self._stats['tokens_in'] += tokens_in
+            self._stats['tokens_out'] += tokens_out
+            self._stats['duplicates_dropped'] += duplicates
+            self._stats['over_budget_dropped'] += over_budget
+            self._stats['overlap_chars_trimmed'] += trimmed
+        return context, info
+
+    def stats(self) -> Dict[str, Any]:
+        with self._stats_lock:
+            stats = dict(self._stats)
+        saved = max(stats['tokens_in'] - stats['tokens_out'], 0)
+        stats['tokens_saved'] = saved
+        stats['avg_tokens_saved_per_query'] = round(saved / stats['queries'], 1) if stats['queries'] else 0.0
+        stats['savings_rate'] = round(saved / stats['tokens_in'], 4) if stats['tokens_in'] else 0.0
+        stats['max_tokens'] = self.max_tokens
+        return stats
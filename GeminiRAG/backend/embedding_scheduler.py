@@ -0,0 +1,140 @@
+import os
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, Optional
+
+from langchain_core.embeddings import Embeddings
+
+from .metrics import metrics
+
+
+def estimate_tokens(text: str) -> int:
+    """Rough token count (~4 characters per token) used for batch budgeting."""
+    return len(text) // 4 + 1
+
+
+class EmbeddingScheduler(Embeddings):
+    """
+    Embeddings wrapper that splits embed_documents calls into batches (bounded by text
+    count and estimated tokens), keeps up to `max_concurrency` batches in flight, paces
+    requests to an optional requests-per-minute limit and retries failed batches with
+    jittered exponential backoff. Output order always matches input order.
+    """
+
+    def __init__(self, embeddings: Embeddings, batch_size: int = 100, max_batch_tokens: int = 20000,
+                 max_concurrency: int = 4, max_retries: int = 5, base_delay: float = 1.0,
+                 max_delay: float = 30.0, requests_per_minute: Optional[float] = None):
+        self.embeddings = embeddings
+        self.batch_size = batch_size
+        self.max_batch_tokens = max_batch_tokens
+        self.max_concurrency = max_concurrency
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.min_interval = 60.0 / requests_per_minute if requests_per_minute else 0.0
+
+        self._pool = ThreadPoolExecutor(max_workers=max_concurrency, thread_name_prefix="embed")
+        self._pace_lock = threading.Lock()
+        self._next_request_at = 0.0
+        self._stats_lock = threading.Lock()
+        self._stats = {'texts': 0, 'batches': 0, 'retries': 0, 'failures': 0, 'seconds': 0.0}
+
+    @classmethod
+    def from_env(cls, embeddings: Embeddings) -> "EmbeddingScheduler":
+        rpm = os.getenv("EMBED_REQUESTS_PER_MINUTE")
+        return cls(
+            embeddings,
+            batch_size=int(os.getenv("EMBED_BATCH_SIZE", "100")),
+            max_batch_tokens=int(os.getenv("EMBED_MAX_BATCH_TOKENS", "20000")),
+            max_concurrency=int(os.getenv("EMBED_MAX_CONCURRENCY", "4")),
+            max_retries=int(os.getenv("EMBED_MAX_RETRIES", "5")),
+            requests_per_minute=float(rpm) if rpm else None,
+        )
+
+    def batches(self, texts: List[str]) -> List[List[int]]:
+        """Group text indices into batches under both the count and token limits."""
+        batches, current, current_tokens = [], [], 0
+        for i, text in enumerate(texts):
+            tokens = estimate_tokens(text)
+            if current and (len(current) >= self.batch_size or current_tokens + tokens > self.max_batch_tokens):
+                batches.append(current)
+                current, current_tokens = [], 0
+            current.append(i)
+            current_tokens += tokens
+        if current:
+            batches.append(current)
+        return batches
+
+    def _pace(self):
+        """Block until the next request slot when a requests-per-minute limit is set."""
+        if not self.min_interval:
+            return
+        with self._pace_lock:
+            now = time.monotonic()
+            wait = self._next_request_at - now
+            self._next_request_at = max(now, self._next_request_at) + self.min_interval
+        if wait > 0:
+            time.sleep(wait)
+
+    def _call_with_retry(self, fn, *args):
+        attempt = 0
+        while True:
+            self._pace()
+            try:
+                return fn(*args)
+            except Exception as e:
+                if attempt >= self.max_retries:
+                    with self._stats_lock:
+                        self._stats['failures'] += 1
+                    raise
+                # Full jitter: sleep uniformly in [0, min(max_delay, base * 2^attempt)]
+                delay = random.uniform(0, min(self.max_delay, self.base_delay * 2 ** attempt))
+                print(f"[EmbeddingScheduler] Embedding call failed ({e}), retry {attempt + 1}/{self.max_retries} in {delay:.2f}s")
+                with self._stats_lock:
+                    self._stats['retries'] += 1
+                time.sleep(delay)
+                attempt += 1
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        if not texts:
+            return []
+        start = time.perf_counter()
+        batches = self.batches(texts)
+        batch_texts = [[texts[i] for i in batch] for batch in batches]
+
+        if len(batches) == 1:
+            results = [self._call_with_retry(self.embeddings.embed_documents, batch_texts[0])]
+        else:
+            futures = [self._pool.submit(self._call_with_retry, self.embeddings.embed_documents, batch)
+                       for batch in batch_texts]
+            results = [future.result() for future in futures]
+
+        vectors: List[Optional[List[float]]] = [None] * len(texts)
+        for batch, batch_vectors in zip(batches, results):
+            for i, vector in zip(batch, batch_vectors):
+                vectors[i] = vector
+
+        metrics.inc("tokens", "embed", sum(estimate_tokens(text) for text in texts))
+        with self._stats_lock:
+            self._stats['texts'] += len(texts)
+            self._stats['batches'] += len(batches)
+            self._stats['seconds'] += time.perf_counter() - start
+        return vectors
+
+    def embed_query(self, text: str) -> List[float]:
+        metrics.inc("tokens", "embed_query", estimate_tokens(text))
+        return self._call_with_retry(self.embeddings.embed_query, text)
+
+    def close(self):
+        self._pool.shutdown()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._stats_lock:
+            stats = dict(self._stats)
+        stats['texts_per_sec'] = round(stats['texts'] / stats['seconds'], 2) if stats['seconds'] else 0.0
+        stats['seconds'] = round(stats['seconds'], 3)
+        stats['max_concurrency'] = self.max_concurrency
+        stats['batch_size'] = self.batch_size
+        return stats
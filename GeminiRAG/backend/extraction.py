@@ -0,0 +1,153 @@
+import mmap
+import multiprocessing
+import os
+import threading
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from typing import Iterator, List, Optional, Tuple
+
+SUPPORTED_EXTENSIONS = ('.pdf', '.txt', '.md')
+
+# Text files are cut into "pages" of roughly this many characters so they stream too
+TEXT_PAGE_CHARS = 20000
+
+# PDF pages handed to one extraction process at a time; every task re-parses the
+# cross-reference table, so ranges amortize that cost
+PDF_PAGES_PER_TASK = int(os.getenv("PDF_PAGES_PER_TASK", "16"))
+PDF_EXTRACT_PROCESSES = int(os.getenv("PDF_EXTRACT_PROCESSES", str(min(os.cpu_count() or 1, 8))))
+
+_pool: Optional[ProcessPoolExecutor] = None
+_pool_lock = threading.Lock()
+
+
+def is_supported(filename: str) -> bool:
+    return filename.lower().endswith(SUPPORTED_EXTENSIONS)
+
+
+def _is_pdf(filename: str) -> bool:
+    return filename.lower().endswith('.pdf')
+
+
+def _open_pdf(f):
+    """Memory-map an open PDF file and wrap it in a PdfReader (pages are parsed lazily)."""
+    from pypdf import PdfReader
+    mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    return mapped, PdfReader(mapped)
+
+
+def _pdf_page_count(path: str) -> int:
+    with open(path, 'rb') as f:
+        mapped, reader = _open_pdf(f)
+        try:
+            return len(reader.pages)
+        finally:
+            del reader
+            mapped.close()
+
+
+def _extract_range(path: str, start: int, end: int) -> List[str]:
+    """Extract pages [start, end) of a PDF (0-based). Runs inside a worker process."""
+    with open(path, 'rb') as f:
+        mapped, reader = _open_pdf(f)
+        try:
+            return [reader.pages[i].extract_text() or "" for i in range(start, end)]
+        finally:
+            del reader
+            mapped.close()
+
+
+def _get_pool() -> Optional[ProcessPoolExecutor]:
+    """Shared extraction process pool, created on first use. None when disabled."""
+    global _pool
+    if PDF_EXTRACT_PROCESSES <= 1:
+        return None
+    with _pool_lock:
+        if _pool is None:
+            # Never fork: the pool starts from an ingestion thread of a multithreaded server,
+            # and a forked child could inherit a lock held by another thread. forkserver
+            # children fork from a clean single-threaded process; both methods re-import the
+            # main module (web/server.py opens nothing at import, see its lifespan hook)
+            method = 'forkserver' if 'forkserver' in multiprocessing.get_all_start_methods() else 'spawn'
+            _pool = ProcessPoolExecutor(max_workers=PDF_EXTRACT_PROCESSES,
+                                        mp_context=multiprocessing.get_context(method))
+        return _pool
+
+
+def count_pages(path: str, filename: str) -> Optional[int]:
+    """Number of pages for PDFs (None for text files, where it is only known at the end)."""
+    if _is_pdf(filename):
+        return _pdf_page_count(path)
+    return None
+
+
+def iter_pages(path: str, filename: str, parallel: bool = True) -> Iterator[Tuple[int, str]]:
+    """
+    Yield (page_number, text) from a spooled upload, one page at a time (1-based).
+    parallel=False extracts PDFs in the calling process (for callers that are already
+    pool workers).
+    """
+    if _is_pdf(filename):
+        yield from (_iter_pdf_pages(path) if parallel else _iter_pdf_pages_inline(path))
+    else:
+        yield from _iter_text_pages(path)
+
+
+def _iter_pdf_pages(path: str, pages_per_task: Optional[int] = None) -> Iterator[Tuple[int, str]]:
+    """
+    Extract page ranges in the process pool and yield pages in document order. Only a
+    small window of ranges is in flight at once, so a slow consumer (the chunker) holds
+    back extraction instead of letting extracted text pile up in memory.
+    """
+    pages_per_task = pages_per_task or PDF_PAGES_PER_TASK
+    total = _pdf_page_count(path)
+    ranges = [(start, min(start + pages_per_task, total)) for start in range(0, total, pages_per_task)]
+
+    pool = _get_pool() if len(ranges) > 1 else None
+    if pool is None:
+        yield from _iter_pdf_pages_inline(path)
+        return
+
+    window = PDF_EXTRACT_PROCESSES * 2
+    pending = deque()
+    next_range = 0
+    try:
+        while pending or next_range < len(ranges):
+            while next_range < len(ranges) and len(pending) < window:
+                start, end = ranges[next_range]
+                pending.append((start, pool.submit(_extract_range, path, start, end)))
+                next_range += 1
+            start, future = pending.popleft()
+            for offset, text in enumerate(future.result()):
+                yield start + offset + 1, text
+    finally:
+        for _, future in pending:
+            future.cancel()
+
+
+def _iter_pdf_pages_inline(path: str) -> Iterator[Tuple[int, str]]:
+    """Single-process fallback: one memory-mapped reader, pages extracted as they are consumed."""
+    with open(path, 'rb') as f:
+        mapped, reader = _open_pdf(f)
+        try:
+            for page_number, page in enumerate(reader.pages, start=1):
+                yield page_number, page.extract_text() or ""
+        finally:
+            del reader
+            mapped.close()
+
+
+def _iter_text_pages(path: str) -> Iterator[Tuple[int, str]]:
+    """Read a text file incrementally, cutting pages on line boundaries."""
+    page_number = 1
+    buffer = []
+    size = 0
+    with open(path, encoding="utf-8", errors="replace") as f:
+        for line in f:
+            buffer.append(line)
+            size += len(line)
+            if size >= TEXT_PAGE_CHARS:
+                yield page_number, "".join(buffer)
+                page_number += 1
+                buffer, size = [], 0
+    if buffer:
+        yield page_number, "".join(buffer)
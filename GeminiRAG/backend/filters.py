@@ -0,0 +1,69 @@
+import json
+from typing import Any, Dict, Optional
+
+# Chunk metadata fields that searches can filter on. Each has a Qdrant payload index
+# (under metadata.<field>) and per-value slot lists in the keyword index.
+KEYWORD_FIELDS = ("source", "document_id", "strategy")
+INTEGER_FIELDS = ("chunk_index", "page")
+FILTER_FIELDS = KEYWORD_FIELDS + INTEGER_FIELDS
+RANGE_OPERATORS = ("gt", "gte", "lt", "lte")
+
+
+def normalize_filters(filters: Optional[Dict[str, Any]]) -> Optional[Dict[str, Any]]:
+    """
+    Validate a metadata filter and bring it to canonical form. Conditions on different
+    fields must all hold:
+
+        {"source": "manual.pdf"}              equal to a value
+        {"source": ["a.pdf", "b.pdf"]}        equal to any of the values
+        {"page": {"gte": 3, "lte": 10}}       range (chunk_index and page only)
+
+    Returns {field: [values]} / {field: {operator: bound}}, or None for no filter.
+    Raises ValueError for unknown fields or malformed conditions.
+    """
+    if not filters:
+        return None
+    normalized = {}
+    for field, condition in sorted(filters.items()):
+        if field not in FILTER_FIELDS:
+            raise ValueError(f"Cannot filter on '{field}', expected one of {', '.join(FILTER_FIELDS)}")
+        if isinstance(condition, dict):
+            if field not in INTEGER_FIELDS or not condition or set(condition) - set(RANGE_OPERATORS):
+                raise ValueError(f"Invalid range for '{field}': use {', '.join(RANGE_OPERATORS)} on "
+                                 f"{' or '.join(INTEGER_FIELDS)}")
+            for bound in condition.values():
+                _check_value(field, bound)
+            normalized[field] = dict(sorted(condition.items()))
+        else:
+            values = condition if isinstance(condition, list) else [condition]
+            if not values:
+                raise ValueError(f"Filter on '{field}' needs at least one value")
+            for value in values:
+                _check_value(field, value)
+            normalized[field] = sorted(set(values))
+    return normalized
+
+
+def _check_value(field: str, value: Any):
+    expected = int if field in INTEGER_FIELDS else str
+    if not isinstance(value, expected) or isinstance(value, bool):
+        raise ValueError(f"Filter values for '{field}' must be {expected.__name__}s, got {value!r}")
+
+
+def matches(condition: Any, value: Any) -> bool:
+    """True if a metadata value satisfies one normalized field condition."""
+    if isinstance(condition, list):
+        return value in condition
+    if not isinstance(value, int) or isinstance(value, bool):
+        return False
+    return (
+        ('gt' not in condition or value > condition['gt'])
+        and ('gte' not in condition or value >= condition['gte'])
+        and ('lt' not in condition or value < condition['lt'])
+        and ('lte' not in condition or value <= condition['lte'])
+    )
+
+
+def filters_key(filters: Optional[Dict[str, Any]]) -> Optional[str]:
+    """Hashable form of a normalized filter, for cache keys."""
+    return json.dumps(filters, sort_keys=True) if filters else None
@@ -0,0 +1,78 @@
+import hashlib
+from typing import Dict, List
+
+import numpy as np
+
+FUSION_MODES = ("rrf", "weighted")
+
+
+def result_key(result: dict) -> str:
+    """Stable dedup key: the Qdrant point id when known, otherwise a hash of the content."""
+    doc_id = result.get('id')
+    if doc_id is None:
+        doc_id = (result.get('metadata') or {}).get('_id')
+    if doc_id is not None:
+        return str(doc_id)
+    return hashlib.sha1(result['content'].encode("utf-8")).hexdigest()
+
+
+def _min_max(scores: List[float]) -> np.ndarray:
+    """Scale scores to [0, 1]; a list of equal scores maps to all ones."""
+    arr = np.asarray(scores, dtype=float)
+    if not len(arr):
+        return arr
+    low, high = arr.min(), arr.max()
+    if high == low:
+        return np.ones_like(arr)
+    return (arr - low) / (high - low)
+
+
+def fuse(semantic_results: List[dict], keyword_results: List[dict], top_k: int,
+         mode: str = "rrf", alpha: float = 0.5, rrf_k: int = 60) -> List[dict]:
+    """
+    Merge semantic and BM25 result lists into one ranked list cut to top_k.
+
+    mode="rrf":      score = sum over lists of 1 / (rrf_k + rank)
+    mode="weighted": score = alpha * semantic + (1 - alpha) * bm25, each min-max normalized
+
+    Duplicates are merged by result_key in a single pass; a chunk found by both
+    retrievers is labelled 'hybrid'.
+    """
+    if mode not in FUSION_MODES:
+        raise ValueError(f"Unknown fusion mode '{mode}', expected one of {FUSION_MODES}")
+
+    lists = (
+        ('semantic', 'Semantic Score', semantic_results, alpha),
+        ('bm25', 'BM25 Score', keyword_results, 1.0 - alpha),
+    )
+
+    fused: Dict[str, dict] = {}
+    for source_type, label, results, weight in lists:
+        if mode == "rrf":
+            contributions = 1.0 / (rrf_k + np.arange(1, len(results) + 1))
+        else:
+            contributions = weight * _min_max([r['score'] for r in results])
+
+        for result, contribution in zip(results, contributions.tolist()):
+            key = result_key(result)
+            rank_info = f"{label}: {result['score']:.4f}"
+            existing = fused.get(key)
+            if existing is None:
+                fused[key] = {
+                    'content': result['content'],
+                    'metadata': result['metadata'],
+                    'id': result.get('id'),
+                    'score': contribution,
+                    'source_type': source_type,
+                    'rank_info': rank_info,
+                }
+            else:
+                existing['score'] += contribution
+                existing['source_type'] = 'hybrid'
+                existing['rank_info'] += f" | {rank_info}"
+
+    ranked = sorted(fused.values(), key=lambda r: r['score'], reverse=True)[:top_k]
+    score_label = "RRF" if mode == "rrf" else f"Weighted (alpha={alpha:g})"
+    for result in ranked:
+        result['rank_info'] += f" | {score_label}: {result['score']:.4f}"
+    return ranked
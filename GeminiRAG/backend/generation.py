@@ -0,0 +1,183 @@
+import asyncio
+import json
+import os
+import time
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, List, Optional, Tuple
+
+from .context_builder import ContextBuilder
+from .embedding_scheduler import estimate_tokens
+from .metrics import metrics
+
+
+def build_prompt(query: str, context: str) -> str:
+    """RAG prompt: assembled source passages followed by the question."""
+    return f"""Based on the following context, provide a detailed and comprehensive answer to the question. 
+        Explain the concepts thoroughly, citing specific details from the context where appropriate.
+        If the context contains examples, include them in your explanation.
+
+Context:
+{context}
+
+Question: {query}
+
+Answer:"""
+
+
+def format_sources(results: List[Dict]) -> List[Dict]:
+    return [
+        {
+            'content': r['content'],
+            'score': r['score'],
+            'metadata': r['metadata'],
+            'source_type': r.get('source_type', 'unknown'),
+            'rank_info': r.get('rank_info', '')
+        }
+        for r in results
+    ]
+
+
+def _chunk_text(chunk) -> str:
+    # .text raises when a streamed chunk has no parts (e.g. the final safety/usage chunk)
+    try:
+        return chunk.text or ""
+    except (ValueError, AttributeError):
+        return ""
+
+
+class AnswerGenerator:
+    """
+    Gemini answer generation through the async API, whole or streamed. The model is
+    created on first use; pass `model` to use anything with the same
+    generate_content_async interface. Prompts are assembled by a token-budgeted
+    ContextBuilder.
+    """
+
+    def __init__(self, model=None, model_name: str = 'gemini-2.0-flash-exp',
+                 context_builder: Optional[ContextBuilder] = None):
+        self.model_name = model_name
+        self._model = model
+        self.context_builder = context_builder or ContextBuilder.from_env()
+
+    @property
+    def model(self):
+        if self._model is None:
+            import google.generativeai as genai
+            api_key = os.getenv("GOOGLE_API_KEY")
+            if not api_key:
+                raise ValueError('GOOGLE_API_KEY not found in environment')
+            genai.configure(api_key=api_key)
+            self._model = genai.GenerativeModel(self.model_name)
+        return self._model
+
+    @model.setter
+    def model(self, model):
+        self._model = model
+
+    def prepare(self, query: str, results: List[Dict]) -> Tuple[str, Dict[str, Any]]:
+        """Build the prompt for fused results; also returns the context's token accounting."""
+        with metrics.timer("context"):
+            context, info = self.context_builder.build(results)
+        metrics.inc("tokens", "context", info.get('tokens_out', 0))
+        return build_prompt(query, context), info
+
+    async def generate(self, prompt: str) -> str:
+        with metrics.timer("generate"):
+            response = await self.model.generate_content_async(prompt)
+            text = response.text
+        metrics.inc("tokens", "answer", estimate_tokens(text))
+        return text
+
+    async def stream(self, prompt: str) -> AsyncIterator[str]:
+        """Yield answer text pieces as the model produces them."""
+        start = time.perf_counter()
+        chars = 0
+        response = None
+        try:
+            response = await self.model.generate_content_async(prompt, stream=True)
+            async for chunk in response:
+                text = _chunk_text(chunk)
+                if text:
+                    if not chars:
+                        metrics.observe("generate_first_token", time.perf_counter() - start)
+                    chars += len(text)
+                    yield text
+        finally:
+            # Stopped early (client gone, error): close the model's stream so it stops generating
+            close = getattr(response, "aclose", None)
+            if close is not None:
+                await close()
+            metrics.observe("generate", time.perf_counter() - start)
+            metrics.inc("tokens", "answer", chars // 4 + 1 if chars else 0)
+
+
+def _event(payload: Dict[str, Any]) -> bytes:
+    return (json.dumps(payload) + "\n").encode("utf-8")
+
+
+async def answer_events(query: str, results: List[Dict], generator: AnswerGenerator,
+                        is_disconnected: Optional[Callable[[], Awaitable[bool]]] = None,
+                        cached: Optional[Dict[str, Any]] = None,
+                        on_answer: Optional[Callable[[Dict[str, Any], float], None]] = None) -> AsyncIterator[bytes]:
+    """
+    NDJSON event stream for a streamed answer: one `sources` event, then `token` events
+    as text arrives, then `done` (or `error`). Generation stops as soon as
+    `is_disconnected` reports that the client has gone away.
+
+    A `cached` answer (AnswerCache.lookup) is replayed as a single token without calling
+    the model. `on_answer(answer, seconds)` receives each answer that streamed to the end.
+    """
+    start = time.perf_counter()
+    if cached is not None:
+        yield _event({'type': 'sources', 'question': query, 'sources': cached['sources'], 'context': cached['context']})
+        yield _event({'type': 'token', 'text': cached['answer']})
+        yield _event({
+            'type': 'done',
+            'answer_chars': len(cached['answer']),
+            'elapsed_ms': round((time.perf_counter() - start) * 1000, 1),
+            'cached': {'question': cached['question'], 'similarity': cached['similarity']}
+        })
+        return
+
+    if not results:
+        yield _event({'type': 'sources', 'question': query, 'sources': []})
+        answer = "I couldn't find any relevant information in the document store to answer your question."
+        yield _event({'type': 'token', 'text': answer})
+        yield _event({'type': 'done', 'answer_chars': len(answer), 'elapsed_ms': round((time.perf_counter() - start) * 1000, 1)})
+        return
+
+    prompt, context_info = generator.prepare(query, results)
+    sources = format_sources(results)
+    yield _event({'type': 'sources', 'question': query, 'sources': sources, 'context': context_info})
+
+    chars = 0
+    pieces = []
+    first_token_ms = None
+    stream = generator.stream(prompt)
+    try:
+        async for text in stream:
+            if is_disconnected is not None and await is_disconnected():
+                print(f"[Generation] Client disconnected, stopping generation after {chars} chars")
+                return
+            if first_token_ms is None:
+                first_token_ms = round((time.perf_counter() - start) * 1000, 1)
+            chars += len(text)
+            pieces.append(text)
+            yield _event({'type': 'token', 'text': text})
+        if on_answer is not None:
+            on_answer({'answer': "".join(pieces), 'sources': sources, 'context': context_info},
+                      time.perf_counter() - start)
+        yield _event({
+            'type': 'done',
+            'answer_chars': chars,
+            'first_token_ms': first_token_ms,
+            'elapsed_ms': round((time.perf_counter() - start) * 1000, 1)
+        })
+    except asyncio.CancelledError:
+        print(f"[Generation] Answer stream cancelled after {chars} chars")
+        raise
+    except Exception as e:
+        print(f"[Generation] RAG stream error: {e}")
+        yield _event({'type': 'error', 'error': str(e)})
+    finally:
+        # Closing the generator releases the model's HTTP stream
+        await stream.aclose()
@@ -0,0 +1,340 @@
+"""
+Bulk ingestion CLI: load a directory tree straight into Qdrant and the keyword index.
+
+Files are extracted and chunked in a process pool, the chunks are embedded in large
+scheduled batches (with SEMANTIC_POOLED_VECTORS=true, semantic chunks come back with
+pooled vectors and skip that step), points are upserted in batches under their
+content-derived ids, and the keyword index is snapshotted once at the end. Progress
+is recorded in a checkpoint manifest after each batch, so an interrupted run resumes
+where it stopped; files whose size or mtime changed are processed again and replace
+their previous chunks.
+
+A file's document source is its bare file name, as for /upload, so a file ingested
+here and uploaded through the server is one document and each replaces the other.
+With --source relative it is the path relative to the directory instead, for trees
+where several files share a name.
+
+The embedded Qdrant database can only be opened by one process, so stop the server
+before running this. With a Qdrant server (QDRANT_URL) it can run next to the server;
+it holds the keyword index writer lock until its final snapshot, so writes through
+the server wait for it.
+
+Usage (from GeminiRAG/):
+    python -m backend.ingest <dir> [--strategy semantic] [--processes N] [--batch 512]
+        [--checkpoint PATH] [--restart] [--source name|relative]
+"""
+
+import argparse
+import json
+import multiprocessing
+import os
+import sys
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from concurrent.futures.process import BrokenProcessPool
+from typing import Any, Dict, List, Optional, Tuple
+
+from dotenv import load_dotenv
+
+# Load .env before the backend modules read their settings (GEMINIRAG_DATA_DIR, ...) at
+# import time, so the CLI and its worker processes use the same paths as the server
+load_dotenv()
+
+from .extraction import is_supported, iter_pages
+from .vector_store import DocumentStore, chunk_id, document_id
+
+CHECKPOINT_VERSION = 1
+SOURCE_MODES = ("name", "relative")
+
+# Per-process chunker, created by _init_worker
+_chunker = None
+
+
+def discover(root: str) -> List[Tuple[str, str, int, float]]:
+    """(path, path relative to root, size, mtime) for every supported file, sorted."""
+    found = []
+    for directory, dirnames, filenames in os.walk(root):
+        dirnames[:] = sorted(d for d in dirnames if not d.startswith('.'))
+        for filename in sorted(filenames):
+            if is_supported(filename):
+                path = os.path.join(directory, filename)
+                stat = os.stat(path)
+                found.append((path, os.path.relpath(path, root), stat.st_size, stat.st_mtime))
+    return found
+
+
+def source_for(relative_path: str, mode: str = "name") -> str:
+    """Document source of a discovered file: its bare name (as /upload uses) or its relative path."""
+    return os.path.basename(relative_path) if mode == "name" else relative_path
+
+
+def duplicate_sources(files: List[Tuple[str, str, int, float]], mode: str) -> Dict[str, List[str]]:
+    """Sources shared by several files (they would overwrite each other), with their paths."""
+    by_source: Dict[str, List[str]] = {}
+    for _, relative, _, _ in files:
+        by_source.setdefault(source_for(relative, mode), []).append(relative)
+    return {source: paths for source, paths in by_source.items() if len(paths) > 1}
+
+
+def _init_worker(strategy: str):
+    """Build this worker's chunker; sentence embeddings share the on-disk embedding cache."""
+    global _chunker
+    from langchain_google_genai import GoogleGenerativeAIEmbeddings
+    from .chunking import AgenticChunker
+    from .embedding_cache import CachedEmbeddings, EmbeddingCache
+    from .embedding_scheduler import EmbeddingScheduler
+    from .vector_store import EMBEDDING_CACHE_PATH, EMBEDDING_MODEL
+
+    embeddings = CachedEmbeddings(
+        EmbeddingScheduler.from_env(GoogleGenerativeAIEmbeddings(
+            model=EMBEDDING_MODEL,
+            google_api_key=os.getenv("GOOGLE_API_KEY")
+        )),
+        EmbeddingCache(EMBEDDING_CACHE_PATH, model=EMBEDDING_MODEL)
+    )
+    _chunker = AgenticChunker(strategy=strategy, embeddings=embeddings)
+
+
+def _process_file(path: str, source: str) -> Dict[str, Any]:
+    """Extract and chunk one file. Runs in a worker process."""
+    chunks, metadatas, vectors = [], [], []
+    pages = 0
+    for page, text in iter_pages(path, path, parallel=False):
+        pages += 1
+        if not text.strip():
+            continue
+        page_chunks, page_vectors = _chunker.chunk_with_vectors(text)
+        for i, chunk in enumerate(page_chunks):
+            metadatas.append({
+                'chunk_index': len(chunks),
+                'strategy': _chunker.strategy,
+                'source': source,
+                'page': page
+            })
+            chunks.append(chunk)
+            vectors.append(page_vectors[i] if page_vectors is not None else None)
+    return {'source': source, 'pages': pages, 'chunks': chunks, 'metadatas': metadatas, 'vectors': vectors}
+
+
+class Checkpoint:
+    """JSON manifest of finished files, rewritten atomically after every batch."""
+
+    def __init__(self, path: str, root: str):
+        self.path = path
+        self.data: Dict[str, Any] = {'version': CHECKPOINT_VERSION, 'root': root, 'files': {}}
+
+    def load(self):
+        try:
+            with open(self.path) as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return
+        if data.get('version') == CHECKPOINT_VERSION and data.get('root') == self.data['root']:
+            self.data = data
+
+    def is_done(self, path: str, size: int, mtime: float, strategy: str, source: str) -> bool:
+        entry = self.data['files'].get(path)
+        return (entry is not None and entry['size'] == size and entry['mtime'] == mtime
+                and entry['strategy'] == strategy and self.source(path) == source)
+
+    def source(self, path: str) -> Optional[str]:
+        """Document source the file was last ingested under (None if it never was)."""
+        entry = self.data['files'].get(path)
+        if entry is None:
+            return None
+        # Entries written before sources were recorded used the relative path
+        return entry.get('source', path)
+
+    def mark_done(self, path: str, size: int, mtime: float, strategy: str, chunks: int, source: str):
+        self.data['files'][path] = {'size': size, 'mtime': mtime, 'strategy': strategy, 'chunks': chunks,
+                                    'source': source}
+
+    def save(self):
+        tmp = f"{self.path}.tmp-{os.getpid()}"
+        with open(tmp, 'w') as f:
+            json.dump(self.data, f)
+        os.replace(tmp, self.path)
+
+
+class BulkIngester:
+    """Buffers chunked files and writes them to the DocumentStore in large batches."""
+
+    def __init__(self, doc_store, checkpoint: Checkpoint, strategy: str, batch_size: int = 512):
+        self.doc_store = doc_store
+        self.checkpoint = checkpoint
+        self.strategy = strategy
+        self.batch_size = batch_size
+        self._texts: List[str] = []
+        self._metadatas: List[dict] = []
+        self._vectors: List[Optional[List[float]]] = []
+        self._files: List[Tuple[str, str, int, float, int]] = []
+        self.stats = {'files': 0, 'pages': 0, 'chunks': 0, 'new_chunks': 0, 'removed_chunks': 0,
+                      'embedded': 0, 'failed': 0}
+
+    def add(self, result: Dict[str, Any], path: str, size: int, mtime: float):
+        """Buffer a chunked file; `path` (relative to the root) is its checkpoint key."""
+        self._texts.extend(result['chunks'])
+        self._metadatas.extend(result['metadatas'])
+        self._vectors.extend(result['vectors'])
+        self._files.append((path, result['source'], size, mtime, len(result['chunks'])))
+        self.stats['pages'] += result['pages']
+        if len(self._texts) >= self.batch_size:
+            self.flush()
+
+    def flush(self):
+        if not self._files:
+            return
+        # 1. Embed chunks that did not come with pooled vectors, in one scheduled pass
+        missing = [i for i, vector in enumerate(self._vectors) if vector is None]
+        if missing:
+            embedded = self.doc_store.embeddings.embed_documents([self._texts[i] for i in missing])
+            for i, vector in zip(missing, embedded):
+                self._vectors[i] = vector
+            self.stats['embedded'] += len(missing)
+
+        # 2. Batched upserts under precomputed ids; the keyword index is only updated in memory
+        added = self.doc_store.add_documents(self._texts, self._metadatas, vectors=self._vectors, persist=False)
+
+        # 3. Each file replaces any earlier version of its document (ingested here or uploaded
+        # through the server): drop chunks that are no longer present
+        start = 0
+        for path, source, size, mtime, chunks in self._files:
+            doc_id = document_id(source)
+            keep = {chunk_id(text, doc_id) for text in self._texts[start:start + chunks]}
+            self.stats['removed_chunks'] += self.doc_store.prune_document(doc_id, keep, persist=False)
+            previous = self.checkpoint.source(path)
+            if previous is not None and previous != source:
+                # Ingested before under another source (--source changed): remove that document
+                self.stats['removed_chunks'] += self.doc_store.delete_document(document_id(previous), persist=False)
+            start += chunks
+
+        # 4. Record the files as done
+        for path, source, size, mtime, chunks in self._files:
+            self.checkpoint.mark_done(path, size, mtime, self.strategy, chunks, source)
+        self.checkpoint.save()
+
+        self.stats['files'] += len(self._files)
+        self.stats['chunks'] += len(self._texts)
+        self.stats['new_chunks'] += len(added)
+        self._texts, self._metadatas, self._vectors, self._files = [], [], [], []
+
+
+def ingest(root: str, strategy: str = "semantic", processes: int = 1, batch_size: int = 512,
+           checkpoint_path: Optional[str] = None, restart: bool = False, source_mode: str = "name") -> Dict[str, Any]:
+    """
+    source_mode: "name" uses each file's bare name as its document source (like /upload),
+    "relative" its path relative to root. Raises ValueError if two files would share a source.
+    """
+    if source_mode not in SOURCE_MODES:
+        raise ValueError(f"Unknown source mode '{source_mode}', expected one of {SOURCE_MODES}")
+    root = os.path.abspath(root)
+    checkpoint = Checkpoint(checkpoint_path or os.path.join(root, ".geminirag_ingest.json"), root)
+    checkpoint.load()
+
+    files = discover(root)
+    duplicates = duplicate_sources(files, source_mode)
+    if duplicates:
+        listing = "; ".join(f"{source}: {', '.join(paths)}" for source, paths in sorted(duplicates.items()))
+        raise ValueError(f"{len(duplicates)} file names occur more than once ({listing}). "
+                         f"Rename them or use --source relative")
+    todo = [f for f in files
+            if restart or not checkpoint.is_done(f[1], f[2], f[3], strategy, source_for(f[1], source_mode))]
+    print(f"[Ingest] {len(files)} files under {root}: {len(files) - len(todo)} already ingested, {len(todo)} to process")
+
+    # Start workers before the DocumentStore opens Qdrant and its threads
+    pool = None
+    if processes > 1 and len(todo) > 1:
+        pool = ProcessPoolExecutor(max_workers=processes, mp_context=multiprocessing.get_context("spawn"),
+                                   initializer=_init_worker, initargs=(strategy,))
+    else:
+        _init_worker(strategy)
+
+    doc_store = DocumentStore()
+    doc_store.wait_until_ready()
+    ingester = BulkIngester(doc_store, checkpoint, strategy, batch_size)
+
+    start = time.perf_counter()
+    last_report = start
+
+    def collect(item, result=None, error=None):
+        nonlocal last_report
+        path, relative, size, mtime = item
+        if error is not None:
+            print(f"[Ingest] Failed {relative}: {error}")
+            ingester.stats['failed'] += 1
+        else:
+            ingester.add(result, relative, size, mtime)
+        if time.perf_counter() - last_report >= 5:
+            last_report = time.perf_counter()
+            _report(ingester.stats, last_report - start, prefix="[Ingest] Progress:")
+
+    try:
+        if pool is None:
+            for item in todo:
+                try:
+                    collect(item, _process_file(item[0], source_for(item[1], source_mode)))
+                except Exception as e:
+                    collect(item, error=e)
+        else:
+            # Keep a bounded number of files in flight so results never pile up
+            pending = {}
+            queue = list(reversed(todo))
+            while queue or pending:
+                while queue and len(pending) < processes * 2:
+                    item = queue.pop()
+                    pending[pool.submit(_process_file, item[0], source_for(item[1], source_mode))] = item
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    item = pending.pop(future)
+                    try:
+                        collect(item, future.result())
+                    except BrokenProcessPool:
+                        raise
+                    except Exception as e:
+                        collect(item, error=e)
+        ingester.flush()
+    finally:
+        if pool is not None:
+            pool.shutdown(cancel_futures=True)
+        # Keyword index snapshot written once, covering everything that was flushed
+        doc_store.persist_keyword_index()
+
+    elapsed = time.perf_counter() - start
+    stats = dict(ingester.stats, seconds=round(elapsed, 2))
+    _report(stats, elapsed, prefix="[Ingest] Done:")
+    return stats
+
+
+def _report(stats: Dict[str, Any], elapsed: float, prefix: str):
+    elapsed = max(elapsed, 1e-9)
+    print(f"{prefix} {stats['files']} files ({stats['files'] / elapsed:.2f} docs/sec), "
+          f"{stats['chunks']} chunks ({stats['chunks'] / elapsed:.1f} chunks/sec), "
+          f"{stats['new_chunks']} new, {stats['removed_chunks']} removed, {stats['pages']} pages, {stats['failed']} failed, {elapsed:.1f}s")
+
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(prog="python -m backend.ingest", description="Bulk-load a directory into GeminiRAG")
+    parser.add_argument("directory")
+    parser.add_argument("--strategy", default="semantic", choices=["semantic", "agentic", "recursive"])
+    parser.add_argument("--processes", type=int, default=os.cpu_count() or 1,
+                        help="extract/chunk worker processes (1 = in this process)")
+    parser.add_argument("--batch", type=int, default=512, help="chunks per embed/upsert batch")
+    parser.add_argument("--checkpoint", help="checkpoint manifest (default: <directory>/.geminirag_ingest.json)")
+    parser.add_argument("--restart", action="store_true", help="ignore the checkpoint and process every file")
+    parser.add_argument("--source", default="name", choices=SOURCE_MODES,
+                        help="document source of a file: its name, as /upload uses (default), or its path "
+                             "relative to the directory")
+    args = parser.parse_args(argv)
+
+    if not os.path.isdir(args.directory):
+        parser.error(f"not a directory: {args.directory}")
+    try:
+        stats = ingest(args.directory, strategy=args.strategy, processes=args.processes, batch_size=args.batch,
+                       checkpoint_path=args.checkpoint, restart=args.restart, source_mode=args.source)
+    except ValueError as e:
+        parser.error(str(e))
+    sys.exit(1 if stats['failed'] else 0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,341 @@
+import json
+import os
+import queue
+import threading
+import time
+import uuid
+from typing import Any, Callable, Dict, List, Optional
+
+from .extraction import count_pages, is_supported, iter_pages
+from .metrics import metrics
+from .vector_store import chunk_id, document_id
+
+
+class IngestionJob:
+    """Progress of one uploaded file through the ingestion pipeline."""
+
+    def __init__(self, filename: str, path: str, strategy: str):
+        self.id = uuid.uuid4().hex
+        self.filename = filename
+        self.document_id = document_id(filename)
+        self.path = path
+        self.strategy = strategy
+        self.status = "queued"
+        self.pages_total: Optional[int] = None
+        self.pages_done = 0
+        self.chunks = 0
+        self.new_chunks = 0
+        self.removed_chunks = 0
+        self.errors: List[str] = []
+        self.created_at = time.time()
+        self.started_at: Optional[float] = None
+        self.finished_at: Optional[float] = None
+        self.published_at = 0.0
+
+        # Pipeline bookkeeping
+        self.chunker = None
+        self.next_chunk_index = 0
+        self.chunk_ids = set()
+        self.units_pending = 0
+        self.extraction_done = False
+        self.lock = threading.Lock()
+
+    def to_dict(self) -> Dict[str, Any]:
+        end = self.finished_at or time.time()
+        return {
+            'id': self.id,
+            'filename': self.filename,
+            'document_id': self.document_id,
+            'status': self.status,
+            'pages_total': self.pages_total,
+            'pages_done': self.pages_done,
+            'chunks': self.chunks,
+            'new_chunks': self.new_chunks,
+            'removed_chunks': self.removed_chunks,
+            'errors': self.errors,
+            'elapsed_seconds': round(end - self.started_at, 2) if self.started_at else None,
+            'created_at': self.created_at,
+            'finished_at': self.finished_at,
+        }
+
+
+class _Unit:
+    """One page of one job moving through the chunk -> embed -> index stages."""
+
+    def __init__(self, job: IngestionJob, page: int, text: str):
+        self.job = job
+        self.page = page
+        self.text = text
+        self.chunks: List[str] = []
+        self.metadatas: List[dict] = []
+        self.vectors: Optional[List[List[float]]] = None
+
+
+class IngestionQueue:
+    """
+    Background ingestion: uploads are spooled to disk and processed page by page through
+    extract -> chunk -> embed -> index stages connected by bounded queues. A full queue
+    blocks the stage before it, so memory stays bounded by the queue sizes no matter how
+    large an upload is, and every page is searchable as soon as its chunks are indexed.
+
+    Extraction runs on `workers` threads (one file each). Chunking, embedding and
+    indexing have one thread each so chunk_index stays in page order within a file;
+    the embedding stage still fans out through DocumentStore's embedding scheduler.
+
+    Job progress is also written to spool_dir/jobs/<id>.json (at most every
+    publish_interval seconds while a job runs), so every server worker process sharing
+    the spool directory can report any job, whichever worker ingests it.
+    """
+
+    def __init__(self, doc_store, chunker_factory: Callable[[str], Any], spool_dir: str,
+                 workers: int = 2, queue_size: int = 4, persist_interval: float = 5.0,
+                 job_ttl: float = 3600.0, max_jobs: int = 1000, publish_interval: float = 1.0):
+        """
+        job_ttl / max_jobs: finished jobs stay listed for job_ttl seconds, and only the
+        newest max_jobs finished jobs are kept.
+        """
+        self.doc_store = doc_store
+        self.persist_interval = persist_interval
+        self.job_ttl = job_ttl
+        self.max_jobs = max_jobs
+        self._last_persist = time.monotonic()
+        self.chunker_factory = chunker_factory
+        self.spool_dir = spool_dir
+        self.jobs_dir = os.path.join(spool_dir, "jobs")
+        self.publish_interval = publish_interval
+        os.makedirs(self.jobs_dir, exist_ok=True)
+
+        self._jobs: Dict[str, IngestionJob] = {}
+        self._jobs_lock = threading.Lock()
+        self._publish_lock = threading.Lock()
+        self._file_queue: "queue.Queue" = queue.Queue()
+        self._chunk_queue: "queue.Queue" = queue.Queue(maxsize=queue_size)
+        self._embed_queue: "queue.Queue" = queue.Queue(maxsize=queue_size)
+        self._index_queue: "queue.Queue" = queue.Queue(maxsize=queue_size)
+
+        self._threads = [
+            threading.Thread(target=self._extract_worker, name=f"ingest-extract-{i}", daemon=True)
+            for i in range(workers)
+        ]
+        self._threads += [
+            threading.Thread(target=self._stage_worker, args=(self._chunk_queue, self._chunk, self._embed_queue),
+                             name="ingest-chunk", daemon=True),
+            threading.Thread(target=self._stage_worker, args=(self._embed_queue, self._embed, self._index_queue),
+                             name="ingest-embed", daemon=True),
+            threading.Thread(target=self._stage_worker, args=(self._index_queue, self._index, None),
+                             name="ingest-index", daemon=True),
+        ]
+        for thread in self._threads:
+            thread.start()
+
+    # ------------------------------------------------------------------ public API
+
+    def spool_path(self) -> str:
+        """A fresh path in the spool directory for streaming an upload to disk."""
+        return os.path.join(self.spool_dir, uuid.uuid4().hex)
+
+    def submit(self, filename: str, path: str, strategy: str = "semantic") -> IngestionJob:
+        """Queue a spooled file for ingestion and return its job immediately."""
+        job = IngestionJob(filename, path, strategy)
+        with self._jobs_lock:
+            self._prune_jobs()
+            self._jobs[job.id] = job
+        if not is_supported(filename):
+            job.status = "skipped"
+            job.errors.append("Unsupported file type")
+            job.finished_at = time.time()
+            self._remove_spool(job)
+        else:
+            self._file_queue.put(job)
+        self._publish(job)
+        return job
+
+    def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        """Status of a job submitted to any worker process sharing spool_dir, or None."""
+        job = self._jobs.get(job_id)
+        if job is not None:
+            return job.to_dict()
+        if len(job_id) != 32 or not job_id.isalnum():
+            return None
+        return self._read_status(self._job_path(job_id))
+
+    def jobs(self) -> List[Dict[str, Any]]:
+        """Statuses of all jobs known to the worker processes sharing spool_dir."""
+        with self._jobs_lock:
+            self._prune_jobs()
+            statuses = {job.id: job.to_dict() for job in self._jobs.values()}
+        for name in os.listdir(self.jobs_dir):
+            job_id, ext = os.path.splitext(name)
+            if ext == ".json" and job_id not in statuses:
+                status = self._read_status(os.path.join(self.jobs_dir, name))
+                if status is not None:
+                    statuses[job_id] = status
+        return sorted(statuses.values(), key=lambda status: status['created_at'])
+
+    def _prune_jobs(self):
+        """Forget finished jobs past job_ttl, then the oldest finished ones past max_jobs (caller holds _jobs_lock)."""
+        cutoff = time.time() - self.job_ttl
+        finished = sorted((job for job in self._jobs.values() if job.finished_at), key=lambda job: job.finished_at)
+        excess = len(finished) - self.max_jobs
+        for i, job in enumerate(finished):
+            if i < excess or job.finished_at < cutoff:
+                del self._jobs[job.id]
+                self._remove_file(self._job_path(job.id))
+
+    # ------------------------------------------------------------------ shared job status
+
+    def _job_path(self, job_id: str) -> str:
+        return os.path.join(self.jobs_dir, f"{job_id}.json")
+
+    def _publish(self, job: IngestionJob, force: bool = True):
+        """Write the job's status file; progress updates (force=False) at most every publish_interval."""
+        now = time.monotonic()
+        if not force and now - job.published_at < self.publish_interval:
+            return
+        path = self._job_path(job.id)
+        tmp = f"{path}.tmp-{os.getpid()}"
+        try:
+            with self._publish_lock:
+                job.published_at = now
+                with open(tmp, 'w') as f:
+                    json.dump(job.to_dict(), f)
+                os.replace(tmp, path)
+        except OSError as e:
+            print(f"[Ingestion] Job {job.id}: writing status failed: {e}")
+
+    def _read_status(self, path: str) -> Optional[Dict[str, Any]]:
+        """A job status file, or None if it is missing or expired (expired files are removed)."""
+        try:
+            with open(path) as f:
+                status = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if status.get('finished_at') and status['finished_at'] < time.time() - self.job_ttl:
+            self._remove_file(path)
+            return None
+        return status
+
+    # ------------------------------------------------------------------ stages
+
+    def _extract_worker(self):
+        while True:
+            job = self._file_queue.get()
+            job.status = "running"
+            job.started_at = time.time()
+            self._publish(job)
+            print(f"[Ingestion] Job {job.id}: extracting {job.filename}")
+            try:
+                # Inside the try: a chunker that cannot be built fails this job, not the worker
+                job.chunker = self.chunker_factory(job.strategy)
+                job.pages_total = count_pages(job.path, job.filename)
+                tick = time.perf_counter()
+                for page, text in iter_pages(job.path, job.filename):
+                    metrics.observe("extract", time.perf_counter() - tick)
+                    metrics.inc("bytes", "extracted", len(text.encode("utf-8")))
+                    with job.lock:
+                        job.units_pending += 1
+                    # Blocks while downstream stages are busy (backpressure)
+                    self._chunk_queue.put(_Unit(job, page, text))
+                    tick = time.perf_counter()
+            except Exception as e:
+                print(f"[Ingestion] Job {job.id}: extraction failed: {e}")
+                job.errors.append(f"extraction: {e}")
+                job.status = "error"
+            finally:
+                self._remove_spool(job)
+                with job.lock:
+                    job.extraction_done = True
+                self._maybe_finish(job)
+
+    def _stage_worker(self, inbox: "queue.Queue", handler: Callable[[_Unit], None], outbox: Optional["queue.Queue"]):
+        while True:
+            unit = inbox.get()
+            try:
+                handler(unit)
+            except Exception as e:
+                print(f"[Ingestion] Job {unit.job.id}: page {unit.page} failed: {e}")
+                unit.job.errors.append(f"page {unit.page}: {e}")
+                unit.chunks = []
+            if outbox is not None and unit.chunks:
+                outbox.put(unit)
+            else:
+                self._unit_done(unit)
+
+    def _chunk(self, unit: _Unit):
+        job = unit.job
+        if not unit.text.strip():
+            return
+        unit.chunks, unit.vectors = job.chunker.chunk_with_vectors(unit.text)
+        for chunk in unit.chunks:
+            unit.metadatas.append({
+                'chunk_index': job.next_chunk_index,
+                'strategy': job.strategy,
+                'source': job.filename,
+                'page': unit.page
+            })
+            job.next_chunk_index += 1
+        unit.text = ""
+
+    def _embed(self, unit: _Unit):
+        # Semantic chunks may already carry vectors pooled from their sentence embeddings
+        if unit.vectors is None:
+            with metrics.timer("embed"):
+                unit.vectors = self.doc_store.embeddings.embed_documents(unit.chunks)
+
+    def _index(self, unit: _Unit):
+        added_ids = self.doc_store.add_documents(unit.chunks, unit.metadatas, vectors=unit.vectors, persist=False)
+        unit.job.chunks += len(unit.chunks)
+        unit.job.chunk_ids.update(chunk_id(chunk, unit.job.document_id) for chunk in unit.chunks)
+        unit.job.new_chunks += len(added_ids)
+        # Snapshot the keyword index when the pipeline drains (at most every persist_interval
+        # seconds) rather than after every page; finished jobs always persist
+        if self._index_queue.empty() and time.monotonic() - self._last_persist >= self.persist_interval:
+            self._persist()
+
+    # ------------------------------------------------------------------ bookkeeping
+
+    def _unit_done(self, unit: _Unit):
+        job = unit.job
+        with job.lock:
+            job.units_pending -= 1
+            job.pages_done += 1
+        self._publish(job, force=False)
+        self._maybe_finish(job)
+
+    def _maybe_finish(self, job: IngestionJob):
+        with job.lock:
+            if not job.extraction_done or job.units_pending or job.finished_at:
+                return
+            job.finished_at = time.time()
+        # A complete upload replaces the document: drop chunks of its previous version
+        if job.status != "error" and not job.errors:
+            try:
+                job.removed_chunks = self.doc_store.prune_document(job.document_id, job.chunk_ids, persist=False)
+            except Exception as e:
+                print(f"[Ingestion] Job {job.id}: removing old chunks failed: {e}")
+                job.errors.append(f"replace: {e}")
+        if job.status != "error":
+            job.status = "done"
+        job.chunker = None
+        try:
+            self._persist()
+        except Exception as e:
+            print(f"[Ingestion] Job {job.id}: keyword index snapshot failed: {e}")
+        self._publish(job)
+        print(f"[Ingestion] Job {job.id}: {job.status}, {job.chunks} chunks from {job.pages_done} pages "
+              f"in {job.finished_at - job.started_at:.2f}s")
+
+    def _persist(self):
+        self._last_persist = time.monotonic()
+        self.doc_store.persist_keyword_index()
+
+    @classmethod
+    def _remove_spool(cls, job: IngestionJob):
+        cls._remove_file(job.path)
+
+    @staticmethod
+    def _remove_file(path: str):
+        try:
+            os.remove(path)
+        except OSError:
+            pass
@@ -0,0 +1,972 @@
+import hashlib
+import json
+import os
+import shutil
+import threading
+import time
+from array import array
+from typing import Any, Dict, Iterable, Iterator, List, Optional
+
+import numpy as np
+
+try:
+    import fcntl
+except ImportError:  # Windows: no cross-process writer lock, serve from a single process
+    fcntl = None
+
+from .analyzer import Analyzer, Vocabulary
+from .filters import FILTER_FIELDS, INTEGER_FIELDS, matches, normalize_filters
+
+FORMAT_VERSION = 4
+
+
+def ids_fingerprint(ids: Iterable) -> str:
+    """Order-independent hash of chunk ids, stored in the manifest to detect stale snapshots."""
+    digest = hashlib.sha1()
+    for doc_id in sorted(str(i) for i in ids):
+        digest.update(doc_id.encode("utf-8"))
+        digest.update(b"\n")
+    return digest.hexdigest()
+
+
+def _filter_value(field: str, metadata: dict):
+    """The metadata value indexed for a filter field, or None if it is missing or of the wrong type."""
+    value = metadata.get(field)
+    expected = int if field in INTEGER_FIELDS else str
+    if isinstance(value, expected) and not isinstance(value, bool):
+        return value
+    return None
+
+
+class _Growable:
+    """Append-only NumPy column with amortized growth; `array` is a view of the filled part."""
+
+    def __init__(self, dtype):
+        self._data = np.zeros(16, dtype=dtype)
+        self._size = 0
+
+    def __len__(self) -> int:
+        return self._size
+
+    @property
+    def array(self) -> np.ndarray:
+        return self._data[:self._size]
+
+    def grow_to(self, size: int):
+        """Extend to `size` elements, zero-filled."""
+        if size > len(self._data):
+            data = np.zeros(max(size, 2 * len(self._data)), dtype=self._data.dtype)
+            data[:self._size] = self._data[:self._size]
+            self._data = data
+        self._size = max(self._size, size)
+
+    def extend(self, values):
+        values = np.asarray(values)
+        start = self._size
+        self.grow_to(start + len(values))
+        self._data[start:self._size] = values
+
+
+class _Segment:
+    """
+    One published snapshot generation, opened read-only with memory mapping.
+
+    Layout (all arrays are .npy files):
+      term_offsets/post_slots/post_tfs   CSR postings, one row per term id (terms.json lists the terms)
+      doc_offsets/doc_terms/doc_tfs      CSR forward index, needed to delete documents
+      doc_len                            tokens per document
+      text.bin + text_offsets            chunk contents (utf-8)
+      meta.bin + meta_offsets            {"id", "metadata"} JSON per document
+      ids_sorted + ids_order             sorted chunk ids -> slot, for id lookups
+      filter_<field>_offsets/_slots      CSR slot lists per metadata value in filters.json,
+                                         for the filter fields (source, strategy, ...)
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        with open(os.path.join(path, "manifest.json")) as f:
+            self.manifest = json.load(f)
+        with open(os.path.join(path, "terms.json")) as f:
+            # Extended in place by the KeywordIndex that opens the segment: ids of terms
+            # added since are >= num_terms and have no base postings
+            self.vocabulary = Vocabulary(json.load(f))
+        self.num_terms = len(self.vocabulary)
+
+        load = lambda name: np.load(os.path.join(path, name + ".npy"), mmap_mode="r")
+        self.term_offsets = load("term_offsets")
+        self.post_slots = load("post_slots")
+        self.post_tfs = load("post_tfs")
+        self.doc_offsets = load("doc_offsets")
+        self.doc_terms = load("doc_terms")
+        self.doc_tfs = load("doc_tfs")
+        self.doc_len = load("doc_len")
+        self.text_offsets = load("text_offsets")
+        self.meta_offsets = load("meta_offsets")
+        self.ids_sorted = load("ids_sorted")
+        self.ids_order = load("ids_order")
+        self.text = self._map_blob(os.path.join(path, "text.bin"))
+        self.meta = self._map_blob(os.path.join(path, "meta.bin"))
+
+        with open(os.path.join(path, "filters.json")) as f:
+            self.filter_values: Dict[str, list] = json.load(f)
+        self.filter_rows = {field: {value: row for row, value in enumerate(values)}
+                            for field, values in self.filter_values.items()}
+        self.filter_offsets = {field: load(f"filter_{field}_offsets") for field in self.filter_values}
+        self.filter_slots = {field: load(f"filter_{field}_slots") for field in self.filter_values}
+        self._slot_ids: Optional[np.ndarray] = None
+
+    @staticmethod
+    def _map_blob(path: str) -> np.ndarray:
+        if os.path.getsize(path) == 0:
+            return np.zeros(0, dtype=np.uint8)
+        return np.memmap(path, dtype=np.uint8, mode="r")
+
+    def __len__(self) -> int:
+        return len(self.doc_len)
+
+    def find(self, doc_id) -> Optional[int]:
+        key = str(doc_id)
+        pos = int(np.searchsorted(self.ids_sorted, key))
+        if pos < len(self.ids_sorted) and self.ids_sorted[pos] == key:
+            return int(self.ids_order[pos])
+        return None
+
+    def id_of(self, slot: int) -> str:
+        if self._slot_ids is None:
+            self._slot_ids = np.empty_like(self.ids_sorted)
+            self._slot_ids[self.ids_order] = self.ids_sorted
+        return str(self._slot_ids[slot])
+
+    def value_slots(self, field: str, condition) -> np.ndarray:
+        """Slots whose `field` value satisfies a normalized filter condition (dead slots included)."""
+        if isinstance(condition, list):
+            rows = [self.filter_rows[field][value] for value in condition if value in self.filter_rows[field]]
+        else:
+            rows = [row for row, value in enumerate(self.filter_values[field]) if matches(condition, value)]
+        offsets, slots = self.filter_offsets[field], self.filter_slots[field]
+        return np.concatenate([np.zeros(0, dtype=np.int64)] + [slots[offsets[row]:offsets[row + 1]] for row in rows])
+
+    def value_codes(self, field: str) -> np.ndarray:
+        """Row in filter_values of every slot's `field` value (-1 if it has none)."""
+        offsets, slots = self.filter_offsets[field], self.filter_slots[field]
+        codes = np.full(len(self), -1, dtype=np.int64)
+        codes[slots] = np.repeat(np.arange(len(offsets) - 1), np.diff(offsets))
+        return codes
+
+    def content(self, slot: int) -> str:
+        start, end = self.text_offsets[slot], self.text_offsets[slot + 1]
+        return self.text[start:end].tobytes().decode("utf-8")
+
+    def record(self, slot: int) -> dict:
+        start, end = self.meta_offsets[slot], self.meta_offsets[slot + 1]
+        return json.loads(self.meta[start:end].tobytes().decode("utf-8"))
+
+
+class KeywordIndex:
+    """
+    Incremental inverted index scored like rank_bm25.BM25Okapi.
+
+    The index is a read-only base segment (memory-mapped from the last snapshot)
+    plus an in-memory delta of documents added since. Deleting a base document
+    only tombstones its slot and decrements its terms' document frequencies, so
+    adds and deletes touch just the affected terms. save() merges both into a new
+    versioned generation on disk and re-opens it as the base. The merge runs on a
+    copy of the delta and tombstones, outside the lock, so searches and updates are
+    not held up by it.
+
+    Searches can be restricted by a metadata filter (see backend/filters.py). The
+    matching slots come from per-value slot lists (a postings list for each source,
+    strategy, ...), and only those documents are scored.
+
+    Text goes through an Analyzer (backend/analyzer.py) and terms are interned into
+    one Vocabulary shared by the base and the delta, so every document is stored as
+    integer term ids and counts. Queries must be analyzed the same way (analyze()).
+    """
+
+    CURRENT_FILE = "CURRENT"
+    KEEP_GENERATIONS = 2
+
+    def __init__(self, k1: float = 1.5, b: float = 0.75, epsilon: float = 0.25,
+                 analyzer: Optional[Analyzer] = None):
+        self.k1 = k1
+        self.b = b
+        self.epsilon = epsilon
+        self.analyzer = analyzer or Analyzer()
+        self.manifest: Dict[str, Any] = {}
+        self._lock = threading.RLock()
+        # One save at a time; _epoch counts clear() calls, so a save overtaken by one is not swapped in
+        self._save_lock = threading.Lock()
+        self._epoch = 0
+        self._reset()
+
+    def _reset(self, base: Optional[_Segment] = None):
+        self._base = base
+        self._base_size = len(base) if base is not None else 0
+        self._base_alive = np.ones(self._base_size, dtype=bool)
+        self._base_terms = base.num_terms if base is not None else 0
+        self.vocabulary = base.vocabulary if base is not None else Vocabulary()
+
+        # Document frequency of every term id (live documents of base and delta)
+        self._term_df = _Growable(np.int64)
+        if base is not None:
+            self._term_df.extend(np.diff(base.term_offsets))
+        self._term_df.grow_to(len(self.vocabulary))
+
+        # Delta: slots continue after the base segment. Its forward index is a CSR of term
+        # ids in append-only columns, and each term's delta postings are (slot, tf) pairs
+        # in one int32 array. Removed documents are only marked dead until the next save.
+        self._entries: List[Optional[dict]] = []
+        self._alive = _Growable(bool)
+        self._doc_len = _Growable(np.int64)
+        self._doc_offsets = _Growable(np.int64)
+        self._doc_offsets.extend([0])
+        self._doc_terms = _Growable(np.int32)
+        self._doc_tfs = _Growable(np.int32)
+        self._postings: Dict[int, array] = {}
+        self._slot_by_id: Dict[Any, int] = {}
+        self._delta_values: Dict[str, Dict[Any, set]] = {field: {} for field in FILTER_FIELDS}
+
+        self._num_docs = self._base_size
+        self._total_len = int(np.sum(base.doc_len, dtype=np.int64)) if base is not None else 0
+        self._idf_cache = None
+        self._dirty = base is None
+
+    def __len__(self) -> int:
+        return self._num_docs
+
+    def __contains__(self, doc_id) -> bool:
+        return self._find(doc_id) is not None
+
+    @property
+    def avgdl(self) -> float:
+        return self._total_len / self._num_docs if self._num_docs else 0.0
+
+    @property
+    def dirty(self) -> bool:
+        """True if there are changes not yet written to a snapshot."""
+        return self._dirty
+
+    @property
+    def generation(self) -> int:
+        return self.manifest.get('generation', 0)
+
+    def analyze(self, text: str) -> List[str]:
+        """Query terms for top_k() / search(), analyzed like the indexed chunks."""
+        return self.analyzer(text)
+
+    def _find(self, doc_id) -> Optional[int]:
+        slot = self._slot_by_id.get(doc_id)
+        if slot is not None:
+            return slot
+        if self._base is not None:
+            slot = self._base.find(doc_id)
+            if slot is not None and self._base_alive[slot]:
+                return slot
+        return None
+
+    # ------------------------------------------------------------------ updates
+
+    def add(self, doc_id, content: str, metadata: Optional[dict] = None):
+        """Index one chunk. Re-adding an existing id replaces the previous version."""
+        self.add_many([doc_id], [content], [metadata])
+
+    def add_many(self, doc_ids: Iterable, contents: Iterable[str], metadatas: Iterable[Optional[dict]]):
+        """
+        Index a batch of chunks. Each chunk is analyzed, then the whole batch is interned
+        and counted in one vectorized pass. Re-added ids replace their previous version.
+        """
+        with self._lock:
+            batch: Dict[Any, tuple] = {}
+            for doc_id, content, metadata in zip(doc_ids, contents, metadatas):
+                batch.pop(doc_id, None)  # a repeated id keeps its last version
+                batch[doc_id] = (content, metadata or {})
+            if not batch:
+                return
+            for doc_id in batch:
+                self.remove(doc_id)
+
+            # 1. Analyze and intern into term ids
+            analyzed = [self.analyzer(content) for content, _ in batch.values()]
+            lengths = np.fromiter((len(terms) for terms in analyzed), dtype=np.int64, count=len(analyzed))
+            term_ids = self.vocabulary.intern([term for terms in analyzed for term in terms])
+            self._term_df.grow_to(len(self.vocabulary))
+            num_terms = max(len(self.vocabulary), 1)
+
+            # 2. Term frequencies per (document, term), ordered by document then term id
+            docs = np.repeat(np.arange(len(analyzed), dtype=np.int64), lengths)
+            keys, tfs = np.unique(docs * num_terms + term_ids, return_counts=True)
+            docs, terms = np.divmod(keys, num_terms)
+            first_slot = self._base_size + len(self._entries)
+            slots = first_slot + docs
+
+            # 3. Append to the forward index and document frequencies
+            self._doc_offsets.extend(self._doc_offsets.array[-1] + np.cumsum(np.bincount(docs, minlength=len(analyzed))))
+            self._doc_terms.extend(terms)
+            self._doc_tfs.extend(tfs)
+            self._doc_len.extend(lengths)
+            self._alive.extend(np.ones(len(analyzed), dtype=bool))
+            unique_terms, doc_counts = np.unique(terms, return_counts=True)
+            self._term_df.array[unique_terms] += doc_counts
+
+            # 4. Append (slot, tf) pairs to each term's postings
+            order = np.argsort(terms, kind="stable")
+            pairs = memoryview(np.column_stack([slots[order], tfs[order]]).astype(np.int32).tobytes())
+            ends = (np.cumsum(doc_counts) * 8).tolist()
+            get_postings = self._postings.get
+            for term, start, end in zip(unique_terms.tolist(), [0] + ends[:-1], ends):
+                postings = get_postings(term)
+                if postings is None:
+                    postings = self._postings[term] = array('i')
+                postings.frombytes(pairs[start:end])
+
+            for slot, (doc_id, (content, metadata)) in enumerate(batch.items(), start=first_slot):
+                self._entries.append({'content': content, 'metadata': metadata, 'id': doc_id})
+                self._slot_by_id[doc_id] = slot
+                for field in FILTER_FIELDS:
+                    value = _filter_value(field, metadata)
+                    if value is not None:
+                        self._delta_values[field].setdefault(value, set()).add(slot)
+
+            self._num_docs += len(batch)
+            self._total_len += int(lengths.sum())
+            self._idf_cache = None
+            self._dirty = True
+
+    def remove(self, doc_id) -> bool:
+        """Remove a chunk by id. Returns False if it was not indexed."""
+        with self._lock:
+            slot = self._find(doc_id)
+            if slot is None:
+                return False
+
+            if slot < self._base_size:
+                start, end = self._base.doc_offsets[slot], self._base.doc_offsets[slot + 1]
+                self._term_df.array[self._base.doc_terms[start:end]] -= 1
+                self._base_alive[slot] = False
+                doc_len = int(self._base.doc_len[slot])
+            else:
+                i = slot - self._base_size
+                del self._slot_by_id[doc_id]
+                start, end = self._doc_offsets.array[i], self._doc_offsets.array[i + 1]
+                self._term_df.array[self._doc_terms.array[start:end]] -= 1
+                for field in FILTER_FIELDS:
+                    value = _filter_value(field, self._entries[i]['metadata'])
+                    if value is not None:
+                        slots = self._delta_values[field][value]
+                        slots.discard(slot)
+                        if not slots:
+                            del self._delta_values[field][value]
+                doc_len = int(self._doc_len.array[i])
+                self._entries[i] = None
+                self._alive.array[i] = False
+
+            self._num_docs -= 1
+            self._total_len -= doc_len
+            self._idf_cache = None
+            self._dirty = True
+            return True
+
+    def clear(self):
+        with self._lock:
+            self.manifest = {}
+            self._epoch += 1
+            self._reset()
+
+    # ------------------------------------------------------------------ scoring
+
+    def _compute_idf(self) -> np.ndarray:
+        """
+        Same IDF as BM25Okapi._calc_idf (negative values floored to epsilon * mean idf),
+        computed over every term with a non-zero document frequency. Returns the idf of
+        every term id (0 for terms no live document contains).
+        """
+        if self._idf_cache is not None:
+            return self._idf_cache
+
+        df = self._term_df.array
+        present = df > 0
+        idf = np.log(self._num_docs - df + 0.5) - np.log(df + 0.5)
+        if present.any():
+            eps = self.epsilon * (idf[present].sum() / present.sum())
+            idf[present & (idf < 0)] = eps
+        idf[~present] = 0.0
+        self._idf_cache = idf
+        return self._idf_cache
+
+    def _query_terms(self, query_tokens: List[str]) -> List[tuple]:
+        """(position, term id, idf) of the query tokens with a non-zero idf."""
+        idf = self._compute_idf()
+        terms = []
+        for position, token in enumerate(query_tokens):
+            term = self.vocabulary.get(token)
+            if term is not None and idf[term] != 0:
+                terms.append((position, term, float(idf[term])))
+        return terms
+
+    def get_scores(self, query_tokens: List[str]) -> np.ndarray:
+        """BM25 score for every slot (removed slots score 0), like BM25Okapi.get_scores."""
+        with self._lock:
+            scores = np.zeros(self._base_size + len(self._entries))
+            if not self._num_docs:
+                return scores
+
+            avgdl = self.avgdl
+            k1, b = self.k1, self.b
+            for _, term, idf in self._query_terms(query_tokens):
+                slots, tfs, doc_len = self._term_postings(term)
+                scores[slots] += idf * (tfs * (k1 + 1) / (tfs + k1 * (1 - b + b * doc_len / avgdl)))
+            return scores
+
+    def _term_postings(self, term: int):
+        """(slots, tfs, doc lengths) of the live documents containing term id `term`."""
+        slots, tfs, lens = [], [], []
+        if term < self._base_terms:
+            start, end = self._base.term_offsets[term], self._base.term_offsets[term + 1]
+            base_slots = np.asarray(self._base.post_slots[start:end], dtype=np.int64)
+            alive = self._base_alive[base_slots]
+            base_slots = base_slots[alive]
+            slots.append(base_slots)
+            tfs.append(np.asarray(self._base.post_tfs[start:end], dtype=np.int64)[alive])
+            lens.append(np.asarray(self._base.doc_len[base_slots], dtype=np.int64))
+        delta = self._postings.get(term)
+        if delta:
+            pairs = np.array(delta, dtype=np.int64).reshape(-1, 2)
+            local = pairs[:, 0] - self._base_size
+            alive = self._alive.array[local]
+            local = local[alive]
+            slots.append(local + self._base_size)
+            tfs.append(pairs[alive, 1])
+            lens.append(self._doc_len.array[local])
+        if not slots:
+            empty = np.zeros(0, dtype=np.int64)
+            return empty, empty, empty
+        return np.concatenate(slots), np.concatenate(tfs), np.concatenate(lens)
+
+    def filter_slots(self, filters: Dict[str, Any]) -> np.ndarray:
+        """Sorted live slots whose metadata matches `filters` (every field's condition must hold)."""
+        with self._lock:
+            result = None
+            for field, condition in normalize_filters(filters).items():
+                parts = [np.zeros(0, dtype=np.int64)]
+                if self._base is not None:
+                    parts.append(np.asarray(self._base.value_slots(field, condition), dtype=np.int64))
+                delta = self._delta_values[field]
+                values = [v for v in condition if v in delta] if isinstance(condition, list) else \
+                    [v for v in delta if matches(condition, v)]
+                for value in values:
+                    parts.append(np.fromiter(delta[value], dtype=np.int64, count=len(delta[value])))
+                slots = np.unique(np.concatenate(parts))
+                result = slots if result is None else np.intersect1d(result, slots, assume_unique=True)
+                if not len(result):
+                    break
+
+            in_base = result < self._base_size
+            keep = np.ones(len(result), dtype=bool)
+            keep[in_base] = self._base_alive[result[in_base]]
+            return result[keep]
+
+    def filter_ids(self, filters: Dict[str, Any], limit: Optional[int] = None) -> Optional[list]:
+        """Ids of the chunks matching `filters`, or None if there are more than `limit`."""
+        with self._lock:
+            slots = self.filter_slots(filters)
+            if limit is not None and len(slots) > limit:
+                return None
+            return [self._base.id_of(slot) if slot < self._base_size else self._entries[slot - self._base_size]['id']
+                    for slot in slots.tolist()]
+
+    def _candidate_postings(self, terms: List[int], candidates: np.ndarray) -> Dict[int, tuple]:
+        """
+        _term_postings() restricted to `candidates` (sorted live slots). A small candidate
+        set is scored document-at-a-time through the forward indexes, so the cost follows
+        the filter's size rather than the query terms' document frequencies; a large one
+        masks the full postings.
+        """
+        base_c = candidates[candidates < self._base_size]
+        delta_c = candidates[candidates >= self._base_size] - self._base_size
+        empty = np.zeros(0, dtype=np.int64)
+        base_flat, base_counts = _forward_entries(self._base.doc_offsets, base_c) if len(base_c) else (empty, empty)
+        delta_flat, delta_counts = _forward_entries(self._doc_offsets.array, delta_c)
+
+        if int(base_counts.sum() + delta_counts.sum()) >= int(self._term_df.array[terms].sum()):
+            mask = np.zeros(self._base_size + len(self._entries), dtype=bool)
+            mask[candidates] = True
+            postings = {}
+            for term in terms:
+                slots, tfs, lens = self._term_postings(term)
+                keep = mask[slots]
+                postings[term] = (slots[keep], tfs[keep], lens[keep])
+            return postings
+
+        # Forward index entries of every candidate, flattened: (term ids, tfs, slots, doc lengths)
+        parts = [(empty, empty, empty, empty)]
+        if len(base_c):
+            parts.append((np.asarray(self._base.doc_terms[base_flat], dtype=np.int64),
+                          np.asarray(self._base.doc_tfs[base_flat], dtype=np.int64),
+                          np.repeat(base_c, base_counts),
+                          np.repeat(np.asarray(self._base.doc_len[base_c], dtype=np.int64), base_counts)))
+        if len(delta_c):
+            parts.append((self._doc_terms.array[delta_flat].astype(np.int64),
+                          self._doc_tfs.array[delta_flat].astype(np.int64),
+                          np.repeat(delta_c + self._base_size, delta_counts),
+                          np.repeat(self._doc_len.array[delta_c], delta_counts)))
+        flat_terms, flat_tfs, flat_slots, flat_lens = (np.concatenate(column) for column in zip(*parts))
+
+        postings = {}
+        for term in terms:
+            hit = flat_terms == term
+            postings[term] = (flat_slots[hit], flat_tfs[hit], flat_lens[hit])
+        return postings
+
+    def top_k(self, query_tokens: List[str], k: int, early_termination: bool = True,
+              filters: Optional[Dict[str, Any]] = None) -> List[tuple]:
+        """
+        Top-k (slot, score) pairs with score > 0, touching only the postings of the
+        query terms (analyzed, see analyze()). Scores, order and tie-breaking (lower slot first) are identical to
+        taking sorted(get_scores(...), reverse=True)[:k].
+
+        With early_termination, terms are visited by descending score upper bound
+        (MaxScore): once the k-th best partial score exceeds what the remaining terms
+        could add, those terms only update documents that are already candidates.
+
+        filters: only documents whose metadata matches are scored (IDF and average
+        length stay corpus-wide, so scores equal the unfiltered ones).
+        """
+        with self._lock:
+            if k <= 0 or not self._num_docs:
+                return []
+
+            avgdl = self.avgdl
+            k1, b = self.k1, self.b
+            terms = self._query_terms(query_tokens)
+            if not terms:
+                return []
+
+            if filters:
+                candidates = self.filter_slots(filters)
+                if not len(candidates):
+                    return []
+                postings = self._candidate_postings(list({term for _, term, _ in terms}), candidates)
+            else:
+                postings = {term: self._term_postings(term) for _, term, _ in terms}
+
+            def contributions(term, idf, mask=None):
+                slots, tfs, lens = postings[term]
+                if mask is not None:
+                    keep = mask[slots]
+                    slots, tfs, lens = slots[keep], tfs[keep], lens[keep]
+                return slots, idf * (tfs * (k1 + 1) / (tfs + k1 * (1 - b + b * lens / avgdl)))
+
+            # Split terms into essential (scored for every posting) and non-essential
+            # (scored only for candidates). All-essential is plain exhaustive scoring.
+            essential = terms
+            non_essential = []
+            if early_termination and len(terms) > 1 and all(idf > 0 for _, _, idf in terms):
+                by_bound = sorted(terms, key=lambda t: -t[2])
+                upper_bounds = [idf * (k1 + 1) for _, _, idf in by_bound]
+                seen_slots, seen_scores = [], []
+                for i, (position, term, idf) in enumerate(by_bound[:-1]):
+                    slots, contrib = contributions(term, idf)
+                    seen_slots.append(slots)
+                    seen_scores.append(contrib)
+                    uniq, inverse = np.unique(np.concatenate(seen_slots), return_inverse=True)
+                    if len(uniq) < k:
+                        continue
+                    partial = np.bincount(inverse, weights=np.concatenate(seen_scores))
+                    threshold = np.partition(partial, len(partial) - k)[len(partial) - k]
+                    if threshold > sum(upper_bounds[i + 1:]):
+                        essential = by_bound[:i + 1]
+                        non_essential = by_bound[i + 1:]
+                        break
+
+            candidate_mask = None
+            if non_essential:
+                candidate_mask = np.zeros(self._base_size + len(self._entries), dtype=bool)
+                for _, term, _ in essential:
+                    candidate_mask[postings[term][0]] = True
+
+            # Sum contributions in query order so floating point results match get_scores
+            essential_positions = {position for position, _, _ in essential}
+            all_slots, all_scores = [], []
+            for position, term, idf in terms:
+                mask = None if position in essential_positions else candidate_mask
+                slots, contrib = contributions(term, idf, mask)
+                all_slots.append(slots)
+                all_scores.append(contrib)
+
+            uniq, inverse = np.unique(np.concatenate(all_slots), return_inverse=True)
+            scores = np.bincount(inverse, weights=np.concatenate(all_scores), minlength=len(uniq))
+            positive = scores > 0
+            uniq, scores = uniq[positive], scores[positive]
+            if len(scores) > k:
+                kth = np.partition(scores, len(scores) - k)[len(scores) - k]
+                keep = scores >= kth
+                uniq, scores = uniq[keep], scores[keep]
+            order = np.lexsort((uniq, -scores))[:k]
+            return [(int(uniq[i]), float(scores[i])) for i in order]
+
+    def search(self, query_tokens: List[str], k: int, early_termination: bool = True,
+               filters: Optional[Dict[str, Any]] = None) -> List[tuple]:
+        """top_k() resolved to (entry, score) pairs under one lock, so a concurrent save can't renumber slots."""
+        with self._lock:
+            return [(self.get_entry(slot), score)
+                    for slot, score in self.top_k(query_tokens, k, early_termination, filters)]
+
+    def get_entry(self, slot: int) -> Optional[dict]:
+        with self._lock:
+            if slot >= self._base_size:
+                return self._entries[slot - self._base_size]
+            if not self._base_alive[slot]:
+                return None
+            record = self._base.record(slot)
+            return {'content': self._base.content(slot), 'metadata': record['metadata'], 'id': record['id']}
+
+    def iter_entries(self) -> Iterator[dict]:
+        for slot in range(self._base_size + len(self._entries)):
+            entry = self.get_entry(slot)
+            if entry is not None:
+                yield entry
+
+    # ------------------------------------------------------------------ persistence
+
+    def _save_state(self) -> Dict[str, Any]:
+        """
+        What save() merges, taken under the lock: the base segment (read-only), copies of
+        the tombstones, vocabulary and delta entries, and views of the delta's append-only
+        columns (later appends never touch the part they cover).
+        """
+        return {
+            'epoch': self._epoch,
+            'base': self._base,
+            'base_alive': self._base_alive.copy(),
+            'base_terms': self._base_terms,
+            'terms': self.vocabulary.terms(),
+            'entries': list(self._entries),
+            'alive': self._alive.array.copy(),
+            'doc_offsets': self._doc_offsets.array,
+            'doc_terms': self._doc_terms.array,
+            'doc_tfs': self._doc_tfs.array,
+            'doc_len': self._doc_len.array,
+        }
+
+    @staticmethod
+    def _merged_arrays(state: Dict[str, Any]) -> Dict[str, Any]:
+        """Flatten base (minus tombstones) and delta of a _save_state() into the arrays of a new generation."""
+        base = state['base']
+        alive = state['base_alive']
+        entries = state['entries']
+        terms = state['terms']
+
+        rows, slots, tfs = [], [], []
+        doc_len, ids = [], []
+        text_parts, text_lens, meta_parts, meta_lens = [], [], [], []
+        n_base = int(alive.sum())
+
+        if base is not None and len(alive):
+            new_slot = np.cumsum(alive) - 1
+            row_of_posting = np.repeat(np.arange(state['base_terms'], dtype=np.int64), np.diff(base.term_offsets))
+            keep = alive[base.post_slots]
+            rows.append(row_of_posting[keep])
+            slots.append(new_slot[base.post_slots[keep]])
+            tfs.append(np.asarray(base.post_tfs[keep], dtype=np.int32))
+            doc_len.append(np.asarray(base.doc_len[alive], dtype=np.int32))
+            # Contents and records of the live base documents, copied a run of live slots at a time
+            for blob, offsets, parts, lens in ((base.text, base.text_offsets, text_parts, text_lens),
+                                               (base.meta, base.meta_offsets, meta_parts, meta_lens)):
+                parts.extend(_live_runs(blob, offsets, alive))
+                lens.append(np.diff(offsets)[alive])
+            ids.extend(base.ids_sorted[np.argsort(base.ids_order)][alive].tolist())
+
+        # Delta: live documents in slot order, their term ids straight from the forward index
+        live = np.flatnonzero(state['alive'])
+        flat, counts = _forward_entries(state['doc_offsets'], live)
+        rows.append(state['doc_terms'][flat].astype(np.int64))
+        slots.append(np.repeat(n_base + np.arange(len(live), dtype=np.int64), counts))
+        tfs.append(state['doc_tfs'][flat])
+        doc_len.append(state['doc_len'][live].astype(np.int32))
+        texts = [entries[i]['content'].encode("utf-8") for i in live.tolist()]
+        metas = [json.dumps({'id': entries[i]['id'], 'metadata': entries[i]['metadata']}).encode("utf-8")
+                 for i in live.tolist()]
+        ids.extend(str(entries[i]['id']) for i in live.tolist())
+        text_parts.extend(texts)
+        text_lens.append(np.fromiter((len(t) for t in texts), dtype=np.int64, count=len(texts)))
+        meta_parts.extend(metas)
+        meta_lens.append(np.fromiter((len(m) for m in metas), dtype=np.int64, count=len(metas)))
+        next_slot = n_base + len(live)
+
+        rows = np.concatenate(rows)
+        slots = np.concatenate(slots).astype(np.int32)
+        tfs = np.concatenate(tfs)
+        num_docs = next_slot
+
+        # Drop terms whose postings became empty and renumber the rest
+        counts = np.bincount(rows, minlength=len(terms))
+        present = counts > 0
+        rows = (np.cumsum(present) - 1)[rows]
+        terms = [term for term, keep in zip(terms, present) if keep]
+        counts = counts[present]
+
+        by_term = np.argsort(rows, kind="stable")
+        by_doc = np.argsort(slots, kind="stable")
+        doc_counts = np.bincount(slots, minlength=num_docs)
+
+        ids_arr = np.asarray(ids, dtype=str)
+        ids_order = np.argsort(ids_arr, kind="stable")
+
+        # Per-value slot lists of the filter fields, in new slot order
+        filters = {}
+        for field in FILTER_FIELDS:
+            column: List[Any] = []
+            if base is not None and len(alive):
+                values = base.filter_values[field]
+                column.extend(values[code] if code >= 0 else None for code in base.value_codes(field)[alive].tolist())
+            column.extend(_filter_value(field, entries[i]['metadata']) for i in live.tolist())
+            filters[field] = _value_postings(column)
+
+        return {
+            'terms': terms,
+            'term_offsets': np.concatenate([[0], np.cumsum(counts)]).astype(np.int64),
+            'post_slots': slots[by_term],
+            'post_tfs': tfs[by_term],
+            'doc_offsets': np.concatenate([[0], np.cumsum(doc_counts)]).astype(np.int64),
+            'doc_terms': rows[by_doc].astype(np.int32),
+            'doc_tfs': tfs[by_doc],
+            'doc_len': np.concatenate(doc_len),
+            'text_offsets': np.concatenate([[0], np.cumsum(np.concatenate(text_lens))]).astype(np.int64),
+            'meta_offsets': np.concatenate([[0], np.cumsum(np.concatenate(meta_lens))]).astype(np.int64),
+            'ids_sorted': ids_arr[ids_order],
+            'ids_order': ids_order.astype(np.int64),
+            'text': b"".join(text_parts),
+            'meta': b"".join(meta_parts),
+            'ids': ids,
+            'filters': filters,
+        }
+
+    def save(self, directory: str, **manifest_extra) -> str:
+        """
+        Publish the index as a new generation under `directory` and re-open it as the
+        base segment. The generation is written to a temp dir, renamed into place and
+        then made current by atomically replacing the CURRENT pointer file.
+
+        Only the copy in _save_state() is taken under the lock; merging and writing work
+        from it while searches and updates go on, and changes made meanwhile are applied
+        again on top of the new base when it is swapped in (so the index stays dirty).
+        """
+        with self._save_lock:
+            os.makedirs(directory, exist_ok=True)
+            with self._lock:
+                state = self._save_state()
+                generation = max([self.generation] + _list_generations(directory)) + 1
+            arrays = self._merged_arrays(state)
+            name = f"gen-{generation:06d}"
+            final_path = os.path.join(directory, name)
+            tmp_path = f"{final_path}.tmp-{os.getpid()}"
+            shutil.rmtree(tmp_path, ignore_errors=True)
+            os.makedirs(tmp_path)
+
+            for key in ('term_offsets', 'post_slots', 'post_tfs', 'doc_offsets', 'doc_terms',
+                        'doc_tfs', 'doc_len', 'text_offsets', 'meta_offsets', 'ids_sorted', 'ids_order'):
+                np.save(os.path.join(tmp_path, key + ".npy"), arrays[key])
+            with open(os.path.join(tmp_path, "text.bin"), "wb") as f:
+                f.write(arrays['text'])
+            with open(os.path.join(tmp_path, "meta.bin"), "wb") as f:
+                f.write(arrays['meta'])
+            with open(os.path.join(tmp_path, "terms.json"), "w") as f:
+                json.dump(arrays['terms'], f)
+            for field, (values, offsets, slots) in arrays['filters'].items():
+                np.save(os.path.join(tmp_path, f"filter_{field}_offsets.npy"), offsets)
+                np.save(os.path.join(tmp_path, f"filter_{field}_slots.npy"), slots)
+            with open(os.path.join(tmp_path, "filters.json"), "w") as f:
+                json.dump({field: values for field, (values, _, _) in arrays['filters'].items()}, f)
+
+            manifest = {
+                'format_version': FORMAT_VERSION,
+                'generation': generation,
+                'created_at': time.time(),
+                'num_docs': len(arrays['doc_len']),
+                'num_terms': len(arrays['terms']),
+                'params': {'k1': self.k1, 'b': self.b, 'epsilon': self.epsilon},
+                'analyzer': self.analyzer.to_dict(),
+                'ids_hash': ids_fingerprint(arrays['ids']),
+                **manifest_extra,
+            }
+            with open(os.path.join(tmp_path, "manifest.json"), "w") as f:
+                json.dump(manifest, f)
+
+            os.rename(tmp_path, final_path)
+            pointer_tmp = os.path.join(directory, self.CURRENT_FILE + f".tmp-{os.getpid()}")
+            with open(pointer_tmp, "w") as f:
+                f.write(name)
+            os.replace(pointer_tmp, os.path.join(directory, self.CURRENT_FILE))
+
+            segment = _Segment(final_path)
+            with self._lock:
+                self._swap_in(segment, state, manifest)
+            _prune_generations(directory, keep=self.KEEP_GENERATIONS)
+            return final_path
+
+    def _swap_in(self, segment: _Segment, state: Dict[str, Any], manifest: Dict[str, Any]):
+        """
+        Make a newly saved segment the base, then remove and add again what changed after
+        `state` was taken (caller holds _lock). Nothing is swapped if clear() ran meanwhile.
+        """
+        if state['epoch'] != self._epoch:
+            return
+        removed = []
+        if state['base'] is not None:
+            gone = np.flatnonzero(state['base_alive'] & ~self._base_alive)
+            removed.extend(state['base'].id_of(slot) for slot in gone.tolist())
+        known = len(state['entries'])
+        gone = np.flatnonzero(state['alive'] & ~self._alive.array[:known])
+        removed.extend(state['entries'][i]['id'] for i in gone.tolist())
+        added = [entry for entry in self._entries[known:] if entry is not None]
+
+        self.manifest = manifest
+        self._reset(segment)
+        for doc_id in removed:
+            self.remove(doc_id)
+        if added:
+            self.add_many([entry['id'] for entry in added], [entry['content'] for entry in added],
+                          [entry['metadata'] for entry in added])
+
+    @classmethod
+    def current_generation(cls, directory: str) -> Optional[int]:
+        """Generation number the CURRENT pointer names, or None if there is none."""
+        try:
+            with open(os.path.join(directory, cls.CURRENT_FILE)) as f:
+                name = f.read().strip()
+        except OSError:
+            return None
+        return int(name[4:]) if name.startswith("gen-") and name[4:].isdigit() else None
+
+    @classmethod
+    def load(cls, directory: str, analyzer: Optional[Analyzer] = None) -> Optional["KeywordIndex"]:
+        """
+        Open the current generation under `directory` with memory mapping. Returns None
+        if there is no snapshot, it was written by an incompatible format version, or it
+        was built with a different analyzer than `analyzer` (default: the snapshot's own).
+        """
+        try:
+            with open(os.path.join(directory, cls.CURRENT_FILE)) as f:
+                path = os.path.join(directory, f.read().strip())
+            segment = _Segment(path)
+        except (OSError, ValueError) as e:
+            print(f"[KeywordIndex] No usable snapshot in {directory}: {e}")
+            return None
+
+        if segment.manifest.get('format_version') != FORMAT_VERSION:
+            print(f"[KeywordIndex] Ignoring snapshot with format version {segment.manifest.get('format_version')}")
+            return None
+
+        settings = segment.manifest['analyzer']
+        if analyzer is not None and analyzer.to_dict() != settings:
+            print(f"[KeywordIndex] Ignoring snapshot built with a different analyzer ({settings})")
+            return None
+
+        params = segment.manifest['params']
+        index = cls(k1=params['k1'], b=params['b'], epsilon=params['epsilon'],
+                    analyzer=analyzer or Analyzer.from_dict(settings))
+        index.manifest = segment.manifest
+        index._reset(segment)
+        return index
+
+
+class WriterLockTimeout(TimeoutError):
+    """Another process kept the keyword index writer lock for longer than the caller would wait."""
+
+
+class WriterLock:
+    """
+    Exclusive lock on a keyword index directory for the process publishing generations
+    (flock on WRITER.lock, so the OS releases it if the process dies). Processes that
+    do not hold it only read generations; acquire() waits for the current writer.
+    """
+
+    FILE = "WRITER.lock"
+    POLL_INTERVAL = 0.05
+
+    def __init__(self, directory: str):
+        self.path = os.path.join(directory, self.FILE)
+        self._fd: Optional[int] = None
+
+    @property
+    def held(self) -> bool:
+        return self._fd is not None
+
+    def acquire(self, timeout: Optional[float] = None) -> bool:
+        """
+        Take the lock, waiting at most `timeout` seconds for another process to release it
+        (None: as long as it takes). Returns False if this process already holds it;
+        raises WriterLockTimeout when the wait runs out.
+        """
+        if self._fd is not None:
+            return False
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o644)
+        try:
+            if fcntl is not None and timeout is None:
+                fcntl.flock(fd, fcntl.LOCK_EX)
+            elif fcntl is not None:
+                deadline = time.monotonic() + timeout
+                while True:
+                    try:
+                        fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                        break
+                    except BlockingIOError:
+                        if time.monotonic() >= deadline:
+                            raise WriterLockTimeout(
+                                f"keyword index at {os.path.dirname(self.path)} is being written by another "
+                                f"process (waited {timeout:g}s)")
+                        time.sleep(self.POLL_INTERVAL)
+        except BaseException:
+            os.close(fd)
+            raise
+        self._fd = fd
+        return True
+
+    def release(self):
+        if self._fd is None:
+            return
+        if fcntl is not None:
+            fcntl.flock(self._fd, fcntl.LOCK_UN)
+        os.close(self._fd)
+        self._fd = None
+
+
+def _value_postings(column: List[Any]):
+    """(distinct values, CSR offsets, slots) for a column of per-slot values (None = no value)."""
+    slots_by_value: Dict[Any, List[int]] = {}
+    for slot, value in enumerate(column):
+        if value is not None:
+            slots_by_value.setdefault(value, []).append(slot)
+    values = list(slots_by_value)
+    offsets = np.concatenate([[0], np.cumsum([len(slots_by_value[v]) for v in values])]).astype(np.int64)
+    slots = np.asarray([slot for v in values for slot in slots_by_value[v]], dtype=np.int32)
+    return values, offsets, slots
+
+
+def _live_runs(blob: np.ndarray, offsets: np.ndarray, alive: np.ndarray) -> List[bytes]:
+    """The bytes of the live rows of a blob with CSR `offsets`, one slice per run of consecutive live rows."""
+    edges = np.flatnonzero(np.diff(np.concatenate([[False], alive, [False]]).astype(np.int8)))
+    return [blob[offsets[start]:offsets[end]].tobytes() for start, end in zip(edges[0::2], edges[1::2])]
+
+
+def _forward_entries(offsets: np.ndarray, rows: np.ndarray):
+    """Positions of all entries of `rows` in a CSR array (flattened, in row order) and the entries per row."""
+    starts = np.asarray(offsets[rows], dtype=np.int64)
+    counts = np.asarray(offsets[rows + 1], dtype=np.int64) - starts
+    flat = np.repeat(starts - np.cumsum(counts) + counts, counts) + np.arange(int(counts.sum()))
+    return flat, counts
+
+
+def _list_generations(directory: str) -> List[int]:
+    generations = []
+    for name in os.listdir(directory):
+        if name.startswith("gen-") and name[4:].isdigit():
+            generations.append(int(name[4:]))
+    return generations
+
+
+def _prune_generations(directory: str, keep: int):
+    """Delete all but the newest `keep` generations (open mmaps stay valid on POSIX)."""
+    for generation in sorted(_list_generations(directory))[:-keep]:
+        shutil.rmtree(os.path.join(directory, f"gen-{generation:06d}"), ignore_errors=True)
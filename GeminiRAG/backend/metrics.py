@@ -0,0 +1,233 @@
+import bisect
+import math
+import os
+import threading
+import time
+from contextvars import ContextVar
+from typing import Any, Dict, List, Optional, Tuple
+
+# Log-spaced histogram bounds from 10 µs to ~170 s, 8 per doubling (~9% relative resolution)
+_BOUNDS = [1e-5 * 2 ** (i / 8) for i in range(8 * 24 + 1)]
+QUANTILES = (0.5, 0.95, 0.99)
+
+# Stage timings of the request being served, for Server-Timing headers
+_request_timings: ContextVar[Optional[List[Tuple[str, float]]]] = ContextVar("request_timings", default=None)
+
+
+class Histogram:
+    """Fixed log-bucket latency histogram; quantiles are read from the bucket counts."""
+
+    __slots__ = ('counts', 'count', 'sum', 'min', 'max')
+
+    def __init__(self):
+        self.counts = [0] * (len(_BOUNDS) + 1)
+        self.count = 0
+        self.sum = 0.0
+        self.min = math.inf
+        self.max = 0.0
+
+    def observe(self, value: float):
+        self.counts[bisect.bisect_left(_BOUNDS, value)] += 1
+        self.count += 1
+        self.sum += value
+        if value < self.min:
+            self.min = value
+        if value > self.max:
+            self.max = value
+
+    def quantile(self, q: float) -> float:
+        if not self.count:
+            return 0.0
+        rank = q * self.count
+        seen = 0
+        for i, n in enumerate(self.counts):
+            seen += n
+            if n and seen >= rank:
+                # Geometric middle of the bucket, clamped to the observed range
+                low = _BOUNDS[i - 1] if i > 0 else self.min
+                high = _BOUNDS[i] if i < len(_BOUNDS) else self.max
+                return min(max(math.sqrt(low * high) if low > 0 else high, self.min), self.max)
+        return self.max
+
+    def summary(self) -> Dict[str, Any]:
+        return {
+            'count': self.count,
+            'mean_ms': round(self.sum / self.count * 1000, 3) if self.count else 0.0,
+            **{f"p{int(q * 100)}_ms": round(self.quantile(q) * 1000, 3) for q in QUANTILES},
+            'max_ms': round(self.max * 1000, 3),
+        }
+
+
+class _Timer:
+    __slots__ = ('metrics', 'stage', 'start')
+
+    def __init__(self, metrics: "Metrics", stage: str):
+        self.metrics = metrics
+        self.stage = stage
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.metrics.observe(self.stage, time.perf_counter() - self.start)
+        return False
+
+
+class _NullTimer:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+_NULL_TIMER = _NullTimer()
+
+
+class Metrics:
+    """
+    Process-wide latency histograms per pipeline stage and per HTTP route, plus byte and
+    token counters, rendered in the Prometheus text format for /metrics.
+
+    Stages: ingestion (extract, chunk, embed, upsert, keyword_index, delete) and retrieval
+    (embed_query, vector_search, keyword_search, fuse, context, generate,
+    generate_first_token). Timing a stage costs two perf_counter() calls and one
+    uncontended lock; METRICS_ENABLED=false turns it into a no-op.
+    """
+
+    def __init__(self, enabled: bool = True, prefix: str = "geminirag"):
+        self.enabled = enabled
+        self.prefix = prefix
+        self._lock = threading.Lock()
+        self._stages: Dict[str, Histogram] = {}
+        self._requests: Dict[Tuple[str, str], Histogram] = {}
+        self._counters: Dict[Tuple[str, str], float] = {}
+
+    @classmethod
+    def from_env(cls) -> "Metrics":
+        return cls(enabled=os.getenv("METRICS_ENABLED", "true").lower() == "true")
+
+    # ------------------------------------------------------------------ recording
+
+    def timer(self, stage: str):
+        """Context manager that records the duration of a stage."""
+        return _Timer(self, stage) if self.enabled else _NULL_TIMER
+
+    def observe(self, stage: str, seconds: float):
+        if not self.enabled:
+            return
+        with self._lock:
+            histogram = self._stages.get(stage)
+            if histogram is None:
+                histogram = self._stages[stage] = Histogram()
+            histogram.observe(seconds)
+        timings = _request_timings.get()
+        if timings is not None:
+            timings.append((stage, seconds))
+
+    def observe_request(self, method: str, route: str, seconds: float):
+        if not self.enabled:
+            return
+        with self._lock:
+            histogram = self._requests.get((method, route))
+            if histogram is None:
+                histogram = self._requests[(method, route)] = Histogram()
+            histogram.observe(seconds)
+
+    def inc(self, name: str, kind: str, value: float = 1.0):
+        """Add to a counter, e.g. inc("bytes", "upload", n) or inc("tokens", "embed", n)."""
+        if not self.enabled:
+            return
+        with self._lock:
+            self._counters[(name, kind)] = self._counters.get((name, kind), 0.0) + value
+
+    # ------------------------------------------------------------------ reporting
+
+    def snapshot(self) -> Dict[str, Any]:
+        """Per-stage and per-route latency summaries and counter totals, as JSON-friendly dicts."""
+        with self._lock:
+            return {
+                'stages': {stage: h.summary() for stage, h in sorted(self._stages.items())},
+                'requests': {f"{method} {route}": h.summary() for (method, route), h in sorted(self._requests.items())},
+                'counters': {f"{name}.{kind}": value for (name, kind), value in sorted(self._counters.items())},
+            }
+
+    def render(self) -> str:
+        """Prometheus text exposition format (latencies as summaries with p50/p95/p99)."""
+        lines: List[str] = []
+        with self._lock:
+            self._render_summary(lines, "stage_seconds", "Pipeline stage latency",
+                                 [(f'stage="{stage}"', h) for stage, h in sorted(self._stages.items())])
+            self._render_summary(lines, "http_request_seconds", "HTTP request latency by route",
+                                 [(f'method="{method}",route="{route}"', h)
+                                  for (method, route), h in sorted(self._requests.items())])
+            for name in sorted({name for name, _ in self._counters}):
+                metric = f"{self.prefix}_{name}_total"
+                lines.append(f"# HELP {metric} Total {name} processed, by kind")
+                lines.append(f"# TYPE {metric} counter")
+                for (counter, kind), value in sorted(self._counters.items()):
+                    if counter == name:
+                        lines.append(f'{metric}{{kind="{kind}"}} {value:g}')
+        return "\n".join(lines) + "\n"
+
+    def _render_summary(self, lines: List[str], name: str, help_text: str, series: List[tuple]):
+        metric = f"{self.prefix}_{name}"
+        lines.append(f"# HELP {metric} {help_text}")
+        lines.append(f"# TYPE {metric} summary")
+        for labels, h in series:
+            for q in QUANTILES:
+                lines.append(f'{metric}{{{labels},quantile="{q}"}} {h.quantile(q):.6g}')
+            lines.append(f"{metric}_sum{{{labels}}} {h.sum:.6g}")
+            lines.append(f"{metric}_count{{{labels}}} {h.count}")
+
+
+def server_timing(timings: List[Tuple[str, float]]) -> str:
+    """Server-Timing header value; repeated stages are summed."""
+    totals: Dict[str, float] = {}
+    for stage, seconds in timings:
+        totals[stage] = totals.get(stage, 0.0) + seconds
+    return ", ".join(f"{stage};dur={seconds * 1000:.2f}" for stage, seconds in totals.items())
+
+
+class TimingMiddleware:
+    """
+    ASGI middleware: records each request's latency by route template and, with
+    headers=True, adds a Server-Timing header listing the stages timed while serving it.
+    Streamed responses send their headers first, so theirs cover the work done before
+    the body started (retrieval), not the generation that follows.
+    """
+
+    def __init__(self, app, metrics: "Metrics", headers: bool = False):
+        self.app = app
+        self.metrics = metrics
+        self.headers = headers
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] != 'http' or not self.metrics.enabled:
+            await self.app(scope, receive, send)
+            return
+
+        timings: List[Tuple[str, float]] = []
+        token = _request_timings.set(timings)
+        start = time.perf_counter()
+
+        async def send_with_timing(message):
+            if self.headers and message['type'] == 'http.response.start':
+                value = server_timing(timings + [("total", time.perf_counter() - start)])
+                message['headers'] = list(message.get('headers', [])) + [(b"server-timing", value.encode("latin-1"))]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_timing)
+        finally:
+            _request_timings.reset(token)
+            # Route templates (/jobs/{job_id}) keep the label set bounded
+            route = getattr(scope.get('route'), 'path', None) or "unmatched"
+            self.metrics.observe_request(scope['method'], route, time.perf_counter() - start)
+
+
+# Shared by the DocumentStore, the ingestion pipeline, answer generation and the server
+metrics = Metrics.from_env()
@@ -0,0 +1,146 @@
+import asyncio
+import os
+import random
+import re
+import threading
+from typing import Any, Dict, List, Optional
+
+from .cache import LRUCache
+from .embedding_cache import content_hash
+from .embedding_scheduler import estimate_tokens
+
+PROMPT_TEMPLATE = """
+            Break down the following text into atomic, context-independent propositions.
+            Each proposition should be a self-contained sentence.
+            Return ONLY the list of propositions, one per line.
+
+            Text: {batch_text}
+            """
+
+# Shared by every extractor in the process, so re-chunking the same text is free
+_shared_cache = LRUCache(maxsize=int(os.getenv("PROPOSITION_CACHE_SIZE", "4096")))
+
+_loop: Optional[asyncio.AbstractEventLoop] = None
+_loop_lock = threading.Lock()
+
+
+def _background_loop() -> asyncio.AbstractEventLoop:
+    """
+    One long-lived event loop on a daemon thread for synchronous callers. The async
+    Gemini client binds to the loop it was first used on, so every call goes through
+    the same loop rather than a fresh asyncio.run().
+    """
+    global _loop
+    with _loop_lock:
+        if _loop is None:
+            _loop = asyncio.new_event_loop()
+            threading.Thread(target=_loop.run_forever, name="propositions-loop", daemon=True).start()
+        return _loop
+
+
+class PropositionExtractor:
+    """
+    Rewrites text as atomic propositions with an LLM. Sentences are grouped into batches
+    by an estimated token budget, up to `max_concurrency` batches are sent at once
+    through the async API, each batch is retried on its own with jittered backoff, and
+    results are cached by a hash of the batch text. Output keeps sentence order.
+    """
+
+    def __init__(self, llm, max_concurrency: int = 8, batch_tokens: int = 400, max_retries: int = 3,
+                 base_delay: float = 1.0, max_delay: float = 20.0, cache: Optional[LRUCache] = None):
+        self.llm = llm
+        self.max_concurrency = max_concurrency
+        self.batch_tokens = batch_tokens
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.cache = cache if cache is not None else _shared_cache
+        self._model = getattr(llm, "model", type(llm).__name__)
+        self._stats_lock = threading.Lock()
+        self._stats = {'batches': 0, 'llm_calls': 0, 'cache_hits': 0, 'retries': 0, 'failures': 0}
+
+    @classmethod
+    def from_env(cls, llm) -> "PropositionExtractor":
+        return cls(
+            llm,
+            max_concurrency=int(os.getenv("PROPOSITION_MAX_CONCURRENCY", "8")),
+            batch_tokens=int(os.getenv("PROPOSITION_BATCH_TOKENS", "400")),
+            max_retries=int(os.getenv("PROPOSITION_MAX_RETRIES", "3")),
+        )
+
+    def batches(self, sentences: List[str]) -> List[List[str]]:
+        """Group consecutive sentences into batches of at most batch_tokens (estimated)."""
+        batches, current, current_tokens = [], [], 0
+        for sentence in sentences:
+            tokens = estimate_tokens(sentence)
+            if current and current_tokens + tokens > self.batch_tokens:
+                batches.append(current)
+                current, current_tokens = [], 0
+            current.append(sentence)
+            current_tokens += tokens
+        if current:
+            batches.append(current)
+        return batches
+
+    def extract(self, text: str) -> List[str]:
+        """Synchronous wrapper around aextract, safe to call from any thread."""
+        future = asyncio.run_coroutine_threadsafe(self.aextract(text), _background_loop())
+        return future.result()
+
+    async def aextract(self, text: str) -> List[str]:
+        # 1. Split into sentences (simple approximation)
+        sentences = re.split(r'(?<=[.!?]) +', text)
+
+        # 2. Generate propositions for each batch of sentences, several batches at a time
+        semaphore = asyncio.Semaphore(self.max_concurrency)
+        results = await asyncio.gather(*(self._batch(batch, semaphore) for batch in self.batches(sentences)))
+
+        propositions = []
+        for batch_props in results:
+            propositions.extend(batch_props)
+        return propositions
+
+    async def _batch(self, batch: List[str], semaphore: asyncio.Semaphore) -> List[str]:
+        batch_text = " ".join(batch)
+        key = (self._model, content_hash(batch_text))
+        with self._stats_lock:
+            self._stats['batches'] += 1
+        cached = self.cache.get(key)
+        if cached is not None:
+            with self._stats_lock:
+                self._stats['cache_hits'] += 1
+            return cached
+
+        prompt = PROMPT_TEMPLATE.format(batch_text=batch_text)
+        async with semaphore:
+            attempt = 0
+            while True:
+                try:
+                    with self._stats_lock:
+                        self._stats['llm_calls'] += 1
+                    response = await self.llm.ainvoke(prompt)
+                    break
+                except Exception as e:
+                    if attempt >= self.max_retries:
+                        print(f"Error generating propositions: {e}")
+                        with self._stats_lock:
+                            self._stats['failures'] += 1
+                        return batch  # Fallback to original sentences (not cached)
+                    # Full jitter: sleep uniformly in [0, min(max_delay, base * 2^attempt)]
+                    delay = random.uniform(0, min(self.max_delay, self.base_delay * 2 ** attempt))
+                    with self._stats_lock:
+                        self._stats['retries'] += 1
+                    await asyncio.sleep(delay)
+                    attempt += 1
+
+        batch_props = response.content.strip().split('\n')
+        propositions = [p.strip() for p in batch_props if p.strip()]
+        self.cache.set(key, propositions)
+        return propositions
+
+    def stats(self) -> Dict[str, Any]:
+        with self._stats_lock:
+            stats = dict(self._stats)
+        stats['max_concurrency'] = self.max_concurrency
+        stats['batch_tokens'] = self.batch_tokens
+        return stats
@@ -1,177 +1,885 @@
+import asyncio
+import contextlib
+import contextvars
+import hashlib
 import os
+import threading
+import time
+import uuid
+import warnings
+from concurrent.futures import ThreadPoolExecutor
 from typing import List, Dict, Any, Optional
+import numpy as np
+from langchain_core.embeddings import Embeddings
 from langchain_qdrant import QdrantVectorStore
 from langchain_google_genai import GoogleGenerativeAIEmbeddings
 from qdrant_client import QdrantClient
-from qdrant_client.models import Distance, VectorParams
+from qdrant_client.models import (
+    FieldCondition,
+    Filter,
+    FilterSelector,
+    HasIdCondition,
+    MatchAny,
+    MatchValue,
+    PayloadSchemaType,
+    PointStruct,
+    Range,
+    SetPayload,
+    SetPayloadOperation,
+)
+
+from .analyzer import Analyzer
+from .cache import LRUCache
+from .collection_profiles import CollectionProfile, collection_settings
+from .embedding_cache import CachedEmbeddings, EmbeddingCache, content_hash
+from .embedding_scheduler import EmbeddingScheduler
+from .filters import FILTER_FIELDS, INTEGER_FIELDS, filters_key, normalize_filters
+from .fusion import fuse
+from .keyword_index import KeywordIndex, WriterLock, WriterLockTimeout, ids_fingerprint
+from .metrics import metrics
+
+EMBEDDING_MODEL = "models/embedding-001"
+# Qdrant database, keyword index snapshots and the embedding cache live under DATA_DIR
+DATA_DIR = os.getenv("GEMINIRAG_DATA_DIR", os.path.join(os.path.dirname(__file__), ".."))
+# Shared by the server, the chunker and the bulk ingest CLI's worker processes
+EMBEDDING_CACHE_PATH = os.path.join(DATA_DIR, "embedding_cache.sqlite3")
+
+
+def document_id(source: str) -> str:
+    """Stable id of a document, derived from its source (file name or origin)."""
+    return hashlib.sha256(source.encode("utf-8")).hexdigest()[:16]
+
+
+def chunk_id(text: str, doc_id: Optional[str] = None) -> str:
+    """Deterministic Qdrant point id for a chunk, derived from its document id and content hash."""
+    key = content_hash(text) if doc_id is None else f"{doc_id}:{content_hash(text)}"
+    return str(uuid.uuid5(uuid.NAMESPACE_URL, key))
+
+
+def normalize_query(query: str) -> str:
+    """Cache key form of a query: case-folded with collapsed whitespace."""
+    return " ".join(query.casefold().split())
+
+
+def qdrant_filter(filters: Optional[Dict[str, Any]]) -> Optional[Filter]:
+    """Qdrant payload filter for a normalized metadata filter (see backend/filters.py)."""
+    if not filters:
+        return None
+    conditions = []
+    for field, condition in filters.items():
+        if isinstance(condition, dict):
+            match = {'range': Range(**condition)}
+        elif len(condition) == 1:
+            match = {'match': MatchValue(value=condition[0])}
+        else:
+            match = {'match': MatchAny(any=condition)}
+        conditions.append(FieldCondition(key=f"metadata.{field}", **match))
+    return Filter(must=conditions)
+
 
 class DocumentStore:
-    def __init__(self):
-        self.embeddings = GoogleGenerativeAIEmbeddings(
-            model="models/embedding-001",
-            google_api_key=os.getenv("GOOGLE_API_KEY")
+    def __init__(self, embeddings: Optional[Embeddings] = None, client: Optional[QdrantClient] = None,
+                 data_dir: Optional[str] = None):
+        """
+        embeddings: embedding model behind the cache and scheduler (default: Gemini).
+        client: Qdrant client (default: the Qdrant server at QDRANT_URL if set, else the
+        embedded database in data_dir/qdrant_db).
+        data_dir: directory for qdrant_db, keyword_index and the embedding cache (default: DATA_DIR).
+
+        With a Qdrant server, several processes (uvicorn workers) can share one data_dir:
+        the keyword index generations are memory-mapped read-only by all of them, one
+        process at a time holds the writer lock to publish a new generation, and the
+        others switch to it on their next search.
+        """
+        init_start = time.perf_counter()
+        self.data_dir = data_dir or DATA_DIR
+        # Document embeddings go through a persistent content-addressed cache, shared with
+        # AgenticChunker, so re-ingesting unchanged text never re-embeds it. Cache misses
+        # are batched, run concurrently and retried by the embedding scheduler.
+        self.embedding_cache = EmbeddingCache(os.path.join(self.data_dir, "embedding_cache.sqlite3"), model=EMBEDDING_MODEL)
+        self.embedding_scheduler = EmbeddingScheduler.from_env(
+            embeddings or GoogleGenerativeAIEmbeddings(
+                model=EMBEDDING_MODEL,
+                google_api_key=os.getenv("GOOGLE_API_KEY")
+            )
         )
+        self.embeddings = CachedEmbeddings(self.embedding_scheduler, self.embedding_cache)
         self.collection_name = "gemini_rag_docs"
-        self.qdrant_path = os.path.join(os.path.dirname(__file__), "..", "qdrant_db")
+        self.qdrant_path = os.path.join(self.data_dir, "qdrant_db")
         
-        # Initialize Qdrant Client
-        self.client = QdrantClient(path=self.qdrant_path)
+        # Storage/index settings (quantization, on-disk, HNSW) for the collection
+        self.profile = CollectionProfile.from_env()
+        
+        # Initialize Qdrant Client: a server (shared by worker processes) or the embedded
+        # database, which locks qdrant_db to a single process
+        self.qdrant_url = os.getenv("QDRANT_URL") if client is None else None
+        if client is not None:
+            self.client = client
+        elif self.qdrant_url:
+            self.client = QdrantClient(url=self.qdrant_url, api_key=os.getenv("QDRANT_API_KEY") or None)
+        else:
+            self.client = QdrantClient(path=self.qdrant_path)
+        # The embedded client checks payload filters point by point in Python; filters matching
+        # at most this many chunks are scored exactly here instead (see _exact_filtered_search)
+        self.exact_filter_limit = int(os.getenv("EXACT_FILTER_LIMIT", "2048")) if client is None and not self.qdrant_url else 0
         
         # Ensure collection exists (from original code, adapted)
         if not self.client.collection_exists(self.collection_name):
-            self.client.create_collection(
-                collection_name=self.collection_name,
-                vectors_config=VectorParams(size=768, distance=Distance.COSINE)
-            )
+            try:
+                self._create_collection()
+            except Exception:
+                # Another worker process created it first
+                if not self.client.collection_exists(self.collection_name):
+                    raise
+                self._create_payload_indexes()
+        else:
+            self._create_payload_indexes()
+            # An existing collection keeps the settings it was created with
+            status = self.profile_status()
+            if status['mismatches']:
+                differences = ", ".join(f"{key}={value['actual']} (profile: {value['requested']})"
+                                        for key, value in status['mismatches'].items())
+                print(f"[DocumentStore] ⚠️  Collection '{self.collection_name}' does not match profile "
+                      f"'{self.profile.name}': {differences}. It applies once the collection is recreated (/clear).")
 
         # Initialize Vector Store
+        # The collection is created with the profile's vector size, so skip the validation
+        # that embeds a dummy text (an embedding API call on every startup)
         self.vector_store = QdrantVectorStore(
             client=self.client,
             collection_name=self.collection_name,
             embedding=self.embeddings,
+            validate_collection_config=False,
         )
         
-        # Initialize BM25
-        self.bm25 = None
-        self.bm25_corpus = []
-        self.bm25_mapping = []
+        # Thread pool for blocking retrieval work (embedding calls, Qdrant, BM25) in ahybrid_search
+        self._executor = ThreadPoolExecutor(
+            max_workers=int(os.getenv("RETRIEVAL_WORKERS", "8")),
+            thread_name_prefix="retrieval"
+        )
+
+        # Query embedding and result caches. Results are keyed by the index generation,
+        # which add_documents / invalidate() bump so stale results are never served.
+        self.generation = 0
+        self.query_embedding_cache = LRUCache(
+            maxsize=int(os.getenv("QUERY_EMBEDDING_CACHE_SIZE", "2048")),
+            ttl=float(os.getenv("QUERY_EMBEDDING_CACHE_TTL", "86400"))
+        )
+        self.results_cache = LRUCache(
+            maxsize=int(os.getenv("RESULTS_CACHE_SIZE", "512")),
+            ttl=float(os.getenv("RESULTS_CACHE_TTL", "300"))
+        )
+
+        # Initialize keyword (BM25) index from its on-disk snapshot
+        self.keyword_index_path = os.path.join(self.data_dir, "keyword_index")
+        # Tokenization, stopwords and stemming for chunks and queries (KEYWORD_* settings);
+        # a snapshot built with other settings is rebuilt
+        self.analyzer = Analyzer.from_env()
+        self.keyword_index = KeywordIndex(analyzer=self.analyzer)
+        self._index_lock = threading.Lock()
+        # One snapshot at a time; persist_keyword_index() saves under this lock only, not _index_lock
+        self._save_lock = threading.Lock()
+        self._index_journal: Optional[List[tuple]] = None
+        # Cross-process writer lock, held from the first unsaved change until it is published
+        self._writer = WriterLock(self.keyword_index_path)
+        self._rebuilding = False
+        self._current_signature = None
+        self._rebuild_thread: Optional[threading.Thread] = None
+        # Set by close(): a rebuild still waiting for another process's writer lock gives up
+        self._closing = threading.Event()
+        # Unsaved changes from persist_later() callers are published together after this delay
+        self.persist_delay = float(os.getenv("KEYWORD_PERSIST_DELAY", "5"))
+        self._persist_timer: Optional[threading.Timer] = None
+        self.startup_stats: Dict[str, Any] = {}
         self._load_bm25()
+        self.startup_stats['ready_ms'] = round((time.perf_counter() - init_start) * 1000, 2)
+        print(f"[DocumentStore] Ready in {self.startup_stats['ready_ms']} ms")
 
     def _load_bm25(self):
-        """Load or rebuild BM25 index from Qdrant"""
+        """
+        Warm start: memory-map the keyword index snapshot and check it against Qdrant.
+        A missing or stale snapshot is rebuilt from Qdrant in a background thread.
+        """
+        try:
+            load_start = time.perf_counter()
+            self._current_signature = self._current_file_signature()
+            snapshot = KeywordIndex.load(self.keyword_index_path, analyzer=self.analyzer)
+            self.startup_stats['snapshot_load_ms'] = round((time.perf_counter() - load_start) * 1000, 2)
+
+            points_count = self.client.count(self.collection_name, exact=True).count
+            manifest = snapshot.manifest if snapshot is not None else {}
+            fresh = snapshot is not None and self._is_fresh(snapshot, points_count)
+
+            if snapshot is not None:
+                # Serve from the snapshot right away, even a stale one, until the rebuild lands
+                self.keyword_index = snapshot
+            self.startup_stats.update({
+                'snapshot_generation': manifest.get('generation'),
+                'snapshot_docs': len(snapshot) if snapshot is not None else 0,
+                'points_count': points_count,
+                'snapshot_fresh': fresh,
+            })
+
+            if fresh:
+                print(f"[DocumentStore] BM25 index loaded from snapshot with {len(snapshot)} documents")
+                self._start_background(self._verify_bm25)
+            else:
+                print("[DocumentStore] BM25 snapshot missing or stale, rebuilding from Qdrant in background...")
+                self._start_background(self._rebuild_bm25)
+        except Exception as e:
+            print(f"[DocumentStore] Error loading BM25: {e}")
+            import traceback
+            traceback.print_exc()
+
+    def _is_fresh(self, index: KeywordIndex, points_count: int) -> bool:
+        return index.manifest.get('collection_name') == self.collection_name and len(index) == points_count
+
+    def _start_background(self, target):
+        with self._index_lock:
+            self._index_journal = []
+        self._rebuild_thread = threading.Thread(target=target, name="keyword-index-rebuild", daemon=True)
+        self._rebuild_thread.start()
+
+    def _verify_bm25(self):
+        """Compare the snapshot's id fingerprint with Qdrant (ids only) and rebuild on mismatch."""
         try:
-            print("[DocumentStore] Rebuilding BM25 index from Qdrant...")
-            # Fetch all documents from Qdrant
-            # Note: For large collections, this should be done in batches or cached to disk
-            all_docs = []
+            ids = []
+            next_offset = None
+            while True:
+                records, next_offset = self.client.scroll(
+                    collection_name=self.collection_name,
+                    limit=1000,
+                    offset=next_offset,
+                    with_payload=False,
+                    with_vectors=False
+                )
+                ids.extend(record.id for record in records)
+                if not next_offset:
+                    break
+
+            if ids_fingerprint(ids) == self.keyword_index.manifest.get('ids_hash'):
+                self.startup_stats['snapshot_verified'] = True
+                with self._index_lock:
+                    self._index_journal = None
+                return
+
+            print("[DocumentStore] BM25 snapshot does not match Qdrant ids, rebuilding...")
+            self.startup_stats['snapshot_verified'] = False
+            self._rebuild_bm25(skip_if_fresh=False)
+        except Exception as e:
+            print(f"[DocumentStore] Error verifying BM25 snapshot: {e}")
+            with self._index_lock:
+                self._index_journal = None
+
+    def _rebuild_bm25(self, skip_if_fresh: bool = True):
+        """Rebuild the keyword index from a full Qdrant scroll, then swap it in and snapshot it"""
+        try:
+            rebuild_start = time.perf_counter()
+            # Hold the writer lock for the whole rebuild: other processes wait instead of
+            # publishing generations that this one would overwrite. Writes from this process
+            # go on (journaled) under the same lock. While another process (e.g. the ingest
+            # CLI) holds it, the current generation keeps serving and writes here time out.
+            try:
+                self._lock_index(None, stop=self._closing)
+            except WriterLockTimeout:
+                print("[DocumentStore] Closing while waiting for the keyword index writer lock, not rebuilding")
+                with self._index_lock:
+                    self._index_journal = None
+                return
+            self._rebuilding = True
+            self._index_lock.release()
+            if skip_if_fresh and self._is_fresh(self.keyword_index, self.client.count(self.collection_name, exact=True).count):
+                # Another worker process rebuilt it while this one waited for the lock
+                with self._index_lock:
+                    self._index_journal = None
+                print(f"[DocumentStore] BM25 index generation {self.keyword_index.generation} is current, not rebuilding")
+                return
+
+            index = KeywordIndex(analyzer=self.analyzer)
             next_offset = None
             
             while True:
                 records, next_offset = self.client.scroll(
                     collection_name=self.collection_name,
-                    limit=100,
+                    limit=1000,
                     offset=next_offset,
                     with_payload=True,
                     with_vectors=False
                 )
                 
-                for record in records:
-                    if record.payload and 'page_content' in record.payload:
-                        all_docs.append({
-                            'content': record.payload['page_content'],
-                            'metadata': record.payload.get('metadata', {})
-                        })
+                records = [record for record in records if record.payload and 'page_content' in record.payload]
+                index.add_many(
+                    [record.id for record in records],
+                    [record.payload['page_content'] for record in records],
+                    [record.payload.get('metadata') or {} for record in records]
+                )
                 
                 if not next_offset:
                     break
-            
-            if all_docs:
-                self.bm25_corpus = [doc['content'].lower().split() for doc in all_docs]
-                self.bm25_mapping = []
-                for i, doc in enumerate(all_docs):
-                    self.bm25_mapping.append({
-                        'content': doc['content'],
-                        'metadata': doc['metadata'],
-                        'id': i
-                    })
-                
-                from rank_bm25 import BM25Okapi
-                self.bm25 = BM25Okapi(self.bm25_corpus)
-                print(f"[DocumentStore] BM25 index rebuilt with {len(all_docs)} documents")
-            else:
-                print("[DocumentStore] No documents found in Qdrant to build BM25 index")
-                
+
+            with self._index_lock:
+                # Replay chunks added (or removed, text None) while the scroll was running
+                for doc_id, text, metadata in self._index_journal or []:
+                    if text is None:
+                        index.remove(doc_id)
+                    else:
+                        index.add(doc_id, text, metadata)
+                self._index_journal = None
+                self.keyword_index = index
+                self._save_keyword_index()
+            self.invalidate()
+
+            self.startup_stats['rebuild_ms'] = round((time.perf_counter() - rebuild_start) * 1000, 2)
+            print(f"[DocumentStore] BM25 index rebuilt with {len(index)} documents in {self.startup_stats['rebuild_ms']} ms")
         except Exception as e:
-            print(f"[DocumentStore] Error loading BM25: {e}")
+            print(f"[DocumentStore] Error rebuilding BM25: {e}")
             import traceback
             traceback.print_exc()
+            with self._index_lock:
+                self._index_journal = None
+        finally:
+            with self._index_lock:
+                self._rebuilding = False
+                self._release_writer()
 
-    def add_documents(self, texts: List[str], metadatas: List[dict]):
-        # Add to Qdrant
-        self.vector_store.add_texts(texts, metadatas=metadatas)
-        
-        # Update BM25 Index
-        self.bm25_corpus.extend([text.lower().split() for text in texts])
-        
-        # Store mapping
-        start_idx = len(self.bm25_mapping)
-        for i, (text, meta) in enumerate(zip(texts, metadatas)):
-            self.bm25_mapping.append({
-                'content': text,
-                'metadata': meta,
-                'id': start_idx + i
-            })
-            
-        # Rebuild BM25
-        if self.bm25_corpus:
-            from rank_bm25 import BM25Okapi
-            self.bm25 = BM25Okapi(self.bm25_corpus)
-            print(f"[DocumentStore] BM25 index updated with {len(texts)} new documents")
+    # ------------------------------------------------------------------ keyword index sharing
+
+    @contextlib.contextmanager
+    def _writing(self, timeout: Optional[float] = None):
+        """
+        Hold while changing the keyword index: takes the writer lock (waiting for another
+        process that is publishing), switches to any generation published meanwhile, and
+        releases the lock once the change is saved. Unsaved (persist=False) changes keep
+        it until persist_keyword_index().
+
+        timeout: seconds to wait for the locks (None: no limit); raises WriterLockTimeout
+        without changing anything when they are not free in time.
+        """
+        self._lock_index(timeout)
+        try:
+            try:
+                yield
+            finally:
+                self._release_writer()
+        finally:
+            self._index_lock.release()
+
+    def _lock_index(self, timeout: Optional[float], stop: Optional[threading.Event] = None):
+        """
+        Take _index_lock and the writer lock (catching up with the current generation when
+        the writer lock is newly taken) and return holding both. The writer lock is only
+        tried without waiting; between tries _index_lock is released, so nothing in this
+        process waits behind another process's writer. Raises WriterLockTimeout after
+        `timeout` seconds (None: no limit) or once `stop` is set.
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            remaining = None if deadline is None else max(0.0, deadline - time.monotonic())
+            if not self._index_lock.acquire(timeout=-1 if remaining is None else remaining):
+                raise WriterLockTimeout(f"keyword index is busy in this process (waited {timeout:g}s)")
+            try:
+                if self._writer.acquire(0):
+                    self._catch_up()
+                return
+            except WriterLockTimeout:
+                self._index_lock.release()
+            except BaseException:
+                self._index_lock.release()
+                raise
+            if deadline is not None and time.monotonic() >= deadline:
+                raise WriterLockTimeout(f"keyword index at {self.keyword_index_path} is being written by another "
+                                        f"process (waited {timeout:g}s)")
+            if stop is None:
+                time.sleep(WriterLock.POLL_INTERVAL)
+            elif stop.wait(WriterLock.POLL_INTERVAL):
+                raise WriterLockTimeout("stopped waiting for the keyword index writer lock")
+
+    def _release_writer(self):
+        # Caller holds _index_lock
+        if not self.keyword_index.dirty and not self._rebuilding:
+            self._writer.release()
+
+    def _save_keyword_index(self):
+        # Caller holds _index_lock and the writer lock
+        with self._save_lock:
+            self.keyword_index.save(self.keyword_index_path, collection_name=self.collection_name)
+            self._current_signature = self._current_file_signature()
+
+    def _catch_up(self):
+        """Switch to the newest published generation, if it is not the one in use (caller holds _index_lock)."""
+        self._current_signature = self._current_file_signature()
+        generation = KeywordIndex.current_generation(self.keyword_index_path)
+        if generation is None or generation == self.keyword_index.generation:
+            return
+        index = KeywordIndex.load(self.keyword_index_path, analyzer=self.analyzer)
+        if index is None:
+            # Pruned or half-written under us: try again on the next search
+            self._current_signature = None
+            return
+        self.keyword_index = index
+        self.invalidate()
+        print(f"[DocumentStore] Switched to BM25 index generation {index.generation} ({len(index)} documents)")
 
-    def search(self, query: str, top_k: int = 5) -> List[dict]:
+    def _current_file_signature(self):
+        try:
+            stat = os.stat(os.path.join(self.keyword_index_path, KeywordIndex.CURRENT_FILE))
+        except OSError:
+            return None
+        return stat.st_ino, stat.st_mtime_ns
+
+    def refresh_keyword_index(self):
+        """
+        Pick up a generation published by another process. Called before every search;
+        costs one stat() of the CURRENT pointer unless it changed.
+        """
+        if self._writer.held or self._current_file_signature() == self._current_signature:
+            return
+        # Never wait here: a write in this process (possibly waiting for the writer lock)
+        # catches up by itself, and searches keep the current generation meanwhile
+        if not self._index_lock.acquire(blocking=False):
+            return
+        try:
+            if not self._writer.held and not self._rebuilding:
+                self._catch_up()
+        finally:
+            self._index_lock.release()
+
+    def close(self):
+        """Publish pending keyword index changes, stop the worker pools and release the Qdrant client and embedding cache."""
+        self._closing.set()
+        self.wait_until_ready()
+        with self._index_lock:
+            timer, self._persist_timer = self._persist_timer, None
+        if timer is not None:
+            timer.cancel()
+        self.persist_keyword_index()
+        with self._index_lock:
+            self._writer.release()
+        self._executor.shutdown()
+        self.embedding_scheduler.close()
+        self.client.close()
+        self.embedding_cache.close()
+
+    def wait_until_ready(self, timeout: Optional[float] = None):
+        """Block until any background keyword index rebuild/verification has finished."""
+        if self._rebuild_thread is not None:
+            self._rebuild_thread.join(timeout)
+
+    def add_documents(self, texts: List[str], metadatas: List[dict],
+                      vectors: Optional[List[List[float]]] = None, persist: bool = True,
+                      timeout: Optional[float] = None) -> List[str]:
+        """
+        Index chunks under point ids derived from their document (metadata 'source') and
+        content hash, skipping chunks that are already in Qdrant. The ids are stored in
+        the payload metadata as 'document_id' and 'chunk_id'. Returns the ids of the
+        chunks that were actually added.
+
+        A skipped chunk whose metadata changed (it moved to another chunk_index or page
+        when its document was edited) gets the new metadata in Qdrant and the keyword
+        index, without being embedded again.
+
+        vectors: precomputed chunk embeddings (otherwise they are embedded here).
+        persist: publish a keyword index snapshot now; batch writers pass False and call
+        persist_keyword_index() once they are done.
+        timeout: seconds to wait for the keyword index writer lock (None: no limit). On
+        WriterLockTimeout neither Qdrant nor the keyword index has been changed.
+        """
+        ids, tagged = [], []
+        for text, meta in zip(texts, metadatas):
+            doc_id = document_id(meta['source']) if meta.get('source') is not None else None
+            ids.append(chunk_id(text, doc_id))
+            tagged.append(dict(meta, document_id=doc_id, chunk_id=ids[-1]))
+        metadatas = tagged
+        if vectors is None:
+            vectors = [None] * len(texts)
+
+        # Skip chunks already indexed (and duplicates within this batch), noting the ones
+        # whose stored metadata is out of date
+        metadata_key = self.vector_store.metadata_payload_key
+        existing = {str(point.id): (point.payload or {}).get(metadata_key) for point in self.client.retrieve(
+            self.collection_name, ids=list(set(ids)), with_payload=[metadata_key], with_vectors=False
+        )}
+        new_chunks, moved = {}, {}
+        for point_id, text, meta, vector in zip(ids, texts, metadatas, vectors):
+            if point_id in new_chunks or point_id in moved:
+                continue
+            if point_id not in existing:
+                new_chunks[point_id] = (text, meta, vector)
+            elif existing[point_id] != meta:
+                moved[point_id] = (text, meta)
+        if len(new_chunks) < len(texts):
+            print(f"[DocumentStore] Skipping {len(texts) - len(new_chunks)} already indexed chunks"
+                  f" ({len(moved)} with updated metadata)")
+        if not new_chunks and not moved:
+            return []
+        ids = list(new_chunks)
+        texts = [text for text, _, _ in new_chunks.values()]
+        metadatas = [meta for _, meta, _ in new_chunks.values()]
+        vectors = [vector for _, _, vector in new_chunks.values()]
+
+        # Embed all new chunks in one scheduled (batched, concurrent) pass, then upsert
+        if any(vector is None for vector in vectors):
+            with metrics.timer("embed"):
+                vectors = self.embeddings.embed_documents(texts)
+        # Upsert and update the BM25 index in place under the writer lock, so a write that
+        # cannot get the lock changes neither; persist publishes a new snapshot generation.
+        # Moved chunks are re-indexed with their new metadata (re-adding replaces them).
+        indexed = list(zip(ids, texts, metadatas)) + [(point_id, text, meta) for point_id, (text, meta) in moved.items()]
+        with self._writing(timeout):
+            with metrics.timer("upsert"):
+                self._upsert(ids, texts, metadatas, vectors)
+                self._set_metadata({point_id: meta for point_id, (_, meta) in moved.items()})
+            metrics.inc("bytes", "indexed", sum(len(text.encode("utf-8")) for text in texts))
+            with metrics.timer("keyword_index"):
+                self.keyword_index.add_many(*zip(*indexed))
+                if self._index_journal is not None:
+                    self._index_journal.extend(indexed)
+                if persist:
+                    self._save_keyword_index()
+        self.invalidate()
+        print(f"[DocumentStore] BM25 index updated with {len(texts)} new documents")
+        return ids
+
+    def replace_document(self, source: str, texts: List[str], metadatas: List[dict],
+                         vectors: Optional[List[List[float]]] = None, persist: bool = True,
+                         timeout: Optional[float] = None) -> Dict[str, Any]:
+        """
+        Make `texts` the full content of the document from `source`: new chunks are added
+        first, then the document's chunks that are no longer present are removed, so
+        unchanged chunks are neither re-embedded nor re-indexed.
+        """
+        doc_id = document_id(source)
+        metadatas = [dict(meta, source=source) for meta in metadatas]
+        added = self.add_documents(texts, metadatas, vectors=vectors, persist=False, timeout=timeout)
+        removed = self.prune_document(doc_id, {chunk_id(text, doc_id) for text in texts}, persist=False,
+                                      timeout=timeout)
+        if persist:
+            self.persist_keyword_index(timeout=timeout)
+        return {'document_id': doc_id, 'chunks': len(texts), 'new_chunks': len(added), 'removed_chunks': removed}
+
+    def delete_document(self, doc_id: str, persist: bool = True, timeout: Optional[float] = None) -> int:
+        """Remove every chunk of a document. Returns the number of chunks removed."""
+        return self.prune_document(doc_id, set(), persist=persist, timeout=timeout)
+
+    def prune_document(self, doc_id: str, keep: set, persist: bool = True, timeout: Optional[float] = None) -> int:
+        """
+        Remove the chunks of a document whose ids are not in `keep`, from Qdrant (by payload
+        filter) and from the keyword index (in place). Returns the number of chunks removed.
+        timeout: as for add_documents.
+        """
+        selector = Filter(
+            must=[FieldCondition(key="metadata.document_id", match=MatchValue(value=doc_id))],
+            must_not=[HasIdCondition(has_id=list(keep))] if keep else None
+        )
+        stale = []
+        next_offset = None
+        while True:
+            records, next_offset = self.client.scroll(
+                collection_name=self.collection_name,
+                scroll_filter=selector,
+                limit=1000,
+                offset=next_offset,
+                with_payload=False,
+                with_vectors=False
+            )
+            stale.extend(str(record.id) for record in records)
+            if not next_offset:
+                break
+        if not stale:
+            return 0
+
+        with self._writing(timeout):
+            with metrics.timer("delete"):
+                self.client.delete(self.collection_name, points_selector=FilterSelector(filter=selector))
+            with metrics.timer("keyword_index"):
+                for point_id in stale:
+                    self.keyword_index.remove(point_id)
+                if self._index_journal is not None:
+                    self._index_journal.extend((point_id, None, None) for point_id in stale)
+                if persist:
+                    self._save_keyword_index()
+        self.invalidate()
+        print(f"[DocumentStore] Removed {len(stale)} chunks of document {doc_id}")
+        return len(stale)
+
+    def persist_keyword_index(self, timeout: Optional[float] = None):
+        """
+        Publish a keyword index snapshot if there are unsaved changes. The merge runs
+        without _index_lock (unsaved changes keep the writer lock held), so writes in this
+        process go on meanwhile and stay dirty for the next snapshot.
+        """
+        with self._writing(timeout):
+            index = self.keyword_index
+            if not index.dirty:
+                return
+        with self._save_lock, metrics.timer("keyword_index_save"):
+            # A rebuild or another snapshot may have replaced the index meanwhile
+            if index is self.keyword_index:
+                index.save(self.keyword_index_path, collection_name=self.collection_name)
+                self._current_signature = self._current_file_signature()
+        with self._index_lock:
+            self._release_writer()
+
+    def persist_later(self):
+        """
+        Publish unsaved keyword index changes persist_delay seconds from now. Writers that
+        pass persist=False call this instead of saving, so a burst of small updates costs
+        one snapshot rather than one full merge of the index each.
+        """
+        with self._index_lock:
+            if self._persist_timer is not None:
+                return
+            self._persist_timer = threading.Timer(self.persist_delay, self._deferred_persist)
+            self._persist_timer.daemon = True
+            self._persist_timer.start()
+
+    def _deferred_persist(self):
+        with self._index_lock:
+            self._persist_timer = None
+        try:
+            self.persist_keyword_index()
+        except Exception as e:
+            print(f"[DocumentStore] Error publishing keyword index: {e}")
+
+    def _upsert(self, ids: List[str], texts: List[str], metadatas: List[dict], vectors: List[List[float]],
+                batch_size: int = 256):
+        """Write points in the same payload layout QdrantVectorStore uses"""
+        for i in range(0, len(ids), batch_size):
+            self.client.upsert(
+                collection_name=self.collection_name,
+                points=[
+                    PointStruct(
+                        id=point_id,
+                        vector=vector,
+                        payload={
+                            self.vector_store.content_payload_key: text,
+                            self.vector_store.metadata_payload_key: meta
+                        }
+                    )
+                    for point_id, text, meta, vector in zip(
+                        ids[i:i + batch_size], texts[i:i + batch_size],
+                        metadatas[i:i + batch_size], vectors[i:i + batch_size]
+                    )
+                ]
+            )
+
+    def _set_metadata(self, metadatas: Dict[str, dict], batch_size: int = 256):
+        """Replace the payload metadata of existing points (point id -> metadata)"""
+        items = list(metadatas.items())
+        for i in range(0, len(items), batch_size):
+            self.client.batch_update_points(
+                collection_name=self.collection_name,
+                update_operations=[
+                    SetPayloadOperation(set_payload=SetPayload(
+                        payload={self.vector_store.metadata_payload_key: meta}, points=[point_id]
+                    ))
+                    for point_id, meta in items[i:i + batch_size]
+                ]
+            )
+
+    def invalidate(self):
+        """Bump the index generation and drop cached search results (call after any index change)."""
+        self.generation += 1
+        self.results_cache.clear()
+
+    def cache_stats(self) -> Dict[str, Any]:
+        return {
+            'generation': self.generation,
+            'query_embeddings': self.query_embedding_cache.stats(),
+            'document_embeddings': self.embedding_cache.stats(),
+            'embedding_scheduler': self.embedding_scheduler.stats(),
+            'results': self.results_cache.stats()
+        }
+
+    def embed_query(self, query: str) -> List[float]:
+        """Embed a query, reusing the cached vector for repeated (normalized) queries."""
+        key = normalize_query(query)
+        embedding = self.query_embedding_cache.get(key)
+        if embedding is None:
+            with metrics.timer("embed_query"):
+                embedding = self.embeddings.embed_query(query)
+            self.query_embedding_cache.set(key, embedding)
+        return embedding
+
+    async def aembed_query(self, query: str) -> List[float]:
+        """Async embed_query, on the retrieval thread pool."""
+        return await self._run(self.embed_query, query)
+
+    def _results_key(self, query: str, top_k: int, alpha: float, fusion: str,
+                     filters: Optional[Dict[str, Any]] = None) -> tuple:
+        return (normalize_query(query), top_k, fusion, alpha if fusion == "weighted" else None,
+                filters_key(filters), self.generation)
+
+    def _cached_results(self, key: tuple) -> Optional[List[dict]]:
+        results = self.results_cache.get(key)
+        return [dict(r) for r in results] if results is not None else None
+
+    def search(self, query: str, top_k: int = 5, filters: Optional[Dict[str, Any]] = None) -> List[dict]:
         """Legacy semantic search"""
-        docs = self.vector_store.similarity_search_with_score(query, k=top_k)
-        return [
-            {"content": doc.page_content, "metadata": doc.metadata, "score": score}
-            for doc, score in docs
-        ]
+        return self._vector_search(self.embed_query(query), top_k, normalize_filters(filters))
+
+    def _vector_search(self, embedding: List[float], top_k: int, filters: Optional[Dict[str, Any]] = None) -> List[dict]:
+        if filters and self.exact_filter_limit:
+            results = self._exact_filtered_search(embedding, top_k, filters)
+            if results is not None:
+                return results
+        # Straight to Qdrant: QdrantVectorStore's search re-reads the collection config on
+        # every query, an extra round trip when Qdrant is a server
+        with metrics.timer("vector_search"):
+            points = self.client.query_points(
+                self.collection_name, query=embedding, query_filter=qdrant_filter(filters),
+                search_params=self.profile.search_params(), limit=top_k, with_payload=True
+            ).points
+        return [self._point_result(point, point.score) for point in points]
 
-    def hybrid_search(self, query: str, top_k: int = 5, alpha: float = 0.5) -> List[dict]:
+    def _point_result(self, point, score: float) -> dict:
+        """Search result in the layout of QdrantVectorStore documents (metadata carries _id)."""
+        metadata = dict(point.payload.get(self.vector_store.metadata_payload_key) or {},
+                        _id=point.id, _collection_name=self.collection_name)
+        return {"content": point.payload.get(self.vector_store.content_payload_key, ""),
+                "metadata": metadata, "score": score, "id": point.id}
+
+    def _exact_filtered_search(self, embedding: List[float], top_k: int, filters: Dict[str, Any]) -> Optional[List[dict]]:
+        """
+        Cosine top_k over just the chunks matching `filters`, found through the keyword
+        index (which mirrors the collection) and fetched by id. Returns None, leaving the
+        filter to Qdrant, if more than exact_filter_limit chunks match or the keyword
+        index is still being checked against Qdrant.
+        """
+        if self._index_journal is not None:
+            return None
+        ids = self.keyword_index.filter_ids(filters, limit=self.exact_filter_limit)
+        if ids is None:
+            return None
+        with metrics.timer("vector_search"):
+            if not ids:
+                return []
+            points = self.client.retrieve(self.collection_name, ids=ids, with_payload=True, with_vectors=True)
+            if not points:
+                return []
+            vectors = np.asarray([point.vector for point in points], dtype=np.float32)
+            query = np.asarray(embedding, dtype=np.float32)
+            norms = np.linalg.norm(vectors, axis=1) * (np.linalg.norm(query) or 1.0)
+            scores = vectors @ query / np.where(norms > 0, norms, 1.0)
+            order = np.argsort(-scores, kind="stable")[:top_k]
+
+        return [self._point_result(points[i], float(scores[i])) for i in order.tolist()]
+
+    def keyword_search(self, query: str, top_k: int = 5, filters: Optional[Dict[str, Any]] = None) -> List[dict]:
+        """BM25 search over the query terms' postings only (scores > 0, same ranking as exhaustive BM25)"""
+        self.refresh_keyword_index()
+        with metrics.timer("keyword_search"):
+            return [
+                {"content": entry['content'], "metadata": entry['metadata'], "score": score, "id": entry['id']}
+                for entry, score in self.keyword_index.search(self.keyword_index.analyze(query), top_k, filters=filters)
+            ]
+
+    def hybrid_search(self, query: str, top_k: int = 5, alpha: float = 0.5, fusion: str = "rrf",
+                      filters: Optional[Dict[str, Any]] = None) -> List[dict]:
         """
         Hybrid Search: Combines Semantic Search (Qdrant) and Keyword Search (BM25)
-        Returns a combined list of unique results (up to top_k * 2)
+        Returns one fused ranking of unique results, cut to top_k.
+        fusion="rrf" uses reciprocal rank fusion; fusion="weighted" blends min-max
+        normalized scores as alpha * semantic + (1 - alpha) * BM25.
+        filters: metadata filter (backend/filters.py) applied inside both searches.
         """
+        self.refresh_keyword_index()
+        filters = normalize_filters(filters)
+        key = self._results_key(query, top_k, alpha, fusion, filters)
+        cached = self._cached_results(key)
+        if cached is not None:
+            return cached
+
         # 1. Semantic Search
-        semantic_results = self.search(query, top_k=top_k)
-        for res in semantic_results:
-            res['source_type'] = 'semantic'
-            res['rank_info'] = f"Semantic Score: {res['score']:.4f}"
+        semantic_results = self._vector_search(self.embed_query(query), top_k, filters)
         
         # 2. Keyword Search (BM25)
-        bm25_results = []
-        if self.bm25:
-            tokenized_query = query.lower().split()
-            # Get top N scores
-            doc_scores = self.bm25.get_scores(tokenized_query)
-            # Get top indices
-            top_indices = sorted(range(len(doc_scores)), key=lambda i: doc_scores[i], reverse=True)[:top_k]
-            
-            for idx in top_indices:
-                if doc_scores[idx] > 0:
-                    entry = self.bm25_mapping[idx]
-                    bm25_results.append({
-                        "content": entry['content'],
-                        "metadata": entry['metadata'],
-                        "score": doc_scores[idx],
-                        "source_type": 'bm25',
-                        "rank_info": f"BM25 Score: {doc_scores[idx]:.4f}"
-                    })
-        
-        # 3. Combine Results (Deduplicate by content)
-        combined_results = []
-        seen_content = set()
+        bm25_results = self.keyword_search(query, top_k=top_k, filters=filters)
         
-        # Add semantic results first
-        for res in semantic_results:
-            if res['content'] not in seen_content:
-                combined_results.append(res)
-                seen_content.add(res['content'])
-                
-        # Add BM25 results
-        for res in bm25_results:
-            if res['content'] not in seen_content:
-                combined_results.append(res)
-                seen_content.add(res['content'])
-            else:
-                # If already exists (from semantic), update info to show it matched both
-                for existing in combined_results:
-                    if existing['content'] == res['content']:
-                        existing['source_type'] = 'hybrid'
-                        existing['rank_info'] += f" | BM25 Score: {res['score']:.4f}"
-                        break
-        
-        return combined_results
+        # 3. Fuse and deduplicate by chunk id
+        with metrics.timer("fuse"):
+            results = fuse(semantic_results, bm25_results, top_k=top_k, mode=fusion, alpha=alpha)
+        self.results_cache.set(key, [dict(r) for r in results])
+        return results
+
+    async def ahybrid_search(self, query: str, top_k: int = 5, alpha: float = 0.5, fusion: str = "rrf",
+                             filters: Optional[Dict[str, Any]] = None) -> List[dict]:
+        """
+        Async hybrid_search: the query embedding and BM25 scoring run concurrently on the
+        retrieval thread pool, and the vector search starts as soon as the embedding is
+        ready. Latency is the slowest branch instead of the sum, and the event loop is
+        never blocked by the Gemini, Qdrant or BM25 calls.
+        """
+        self.refresh_keyword_index()
+        filters = normalize_filters(filters)
+        key = self._results_key(query, top_k, alpha, fusion, filters)
+        cached = self._cached_results(key)
+        if cached is not None:
+            return cached
+
+        async def semantic_branch():
+            embedding = await self.aembed_query(query)
+            return await self._run(self._vector_search, embedding, top_k, filters)
+
+        semantic_results, bm25_results = await asyncio.gather(
+            semantic_branch(),
+            self._run(self.keyword_search, query, top_k, filters),
+        )
+        with metrics.timer("fuse"):
+            results = fuse(semantic_results, bm25_results, top_k=top_k, mode=fusion, alpha=alpha)
+        self.results_cache.set(key, [dict(r) for r in results])
+        return results
+
+    def _run(self, fn, *args):
+        """Run fn on the retrieval pool in the caller's context (so stage timings reach the request)."""
+        context = contextvars.copy_context()
+        return asyncio.get_running_loop().run_in_executor(self._executor, context.run, fn, *args)
+
+    def _create_collection(self):
+        self.profile.create_collection(self.client, self.collection_name)
+        self._create_payload_indexes()
+        print(f"[DocumentStore] Created collection '{self.collection_name}' with profile '{self.profile.name}'")
+
+    def _create_payload_indexes(self):
+        """
+        Payload indexes on the filterable metadata fields (backend/filters.py), so filtered
+        searches and per-document deletes do not scan the collection. Existing collections
+        get any missing index at startup.
+        """
+        with warnings.catch_warnings():
+            # The embedded local client has no payload indexes and warns on every call
+            warnings.simplefilter("ignore", UserWarning)
+            for field in FILTER_FIELDS:
+                schema = PayloadSchemaType.INTEGER if field in INTEGER_FIELDS else PayloadSchemaType.KEYWORD
+                self.client.create_payload_index(self.collection_name, f"metadata.{field}", schema)
+
+    def profile_status(self, info=None) -> Dict[str, Any]:
+        """
+        The requested profile next to the settings the collection actually has (info:
+        a get_collection() result, fetched if omitted). Storage settings only change
+        when the collection is recreated; query-time settings always follow the profile.
+        """
+        info = info or self.client.get_collection(self.collection_name)
+        actual = collection_settings(info)
+        return {
+            'requested': self.profile.to_dict(),
+            'actual': actual,
+            'mismatches': {key: {'requested': requested, 'actual': value}
+                           for key, (requested, value) in self.profile.mismatches(actual).items()},
+        }
 
     def delete_collection(self):
         """Delete the entire collection (useful for reset)."""
         self.client.delete_collection(self.collection_name)
+        self.invalidate()
+
+    def reset_collection(self, timeout: Optional[float] = None):
+        """Delete the collection and recreate it empty (same profile) and empty the keyword index."""
+        with self._writing(timeout):
+            self.delete_collection()
+            self._create_collection()
+            self.keyword_index.clear()
+            if self._index_journal is not None:
+                self._index_journal.clear()
+            self._save_keyword_index()
+        self.invalidate()
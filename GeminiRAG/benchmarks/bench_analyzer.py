@@ -0,0 +1,162 @@
+#!/usr/bin/env python3
+"""
+Keyword index analyzer benchmark on the synthetic corpus (benchmarks/corpus.py), fully
+offline. Compares the whitespace analyzer (lowercase + split, the original BM25
+tokenization, where "data." and "data" are different terms) with the default analyzer
+(punctuation split, English stopwords, plural stemming), and both with the original
+keyword search as a baseline: a List[str] of tokens per chunk kept next to a
+rank_bm25.BM25Okapi built over them, in memory only:
+
+1. Analysis throughput and index build throughput (add_many in batches).
+2. Memory per chunk of the in-memory index (tracemalloc; chunk texts and metadata are
+   allocated beforehand, so only the index structures count) and of the saved postings
+   and forward index on disk.
+3. Hit rate: queries made of words from a random chunk (as typed, without the sentence
+   punctuation) and how often that chunk ranks in the top k.
+
+Usage (from GeminiRAG/):
+    python benchmarks/bench_analyzer.py [--chunks 50000] [--queries 500] [--k 10]
+"""
+
+import argparse
+import os
+import random
+import shutil
+import sys
+import tempfile
+import time
+import tracemalloc
+
+import numpy as np
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from backend.analyzer import Analyzer
+from backend.keyword_index import KeywordIndex
+from benchmarks.corpus import SyntheticCorpus
+
+ANALYZERS = {
+    'whitespace': lambda: Analyzer(pattern=r"\S+", stopwords="none", stemmer="none"),
+    'default': Analyzer,
+}
+TEXT_FILES = ("text.bin", "meta.bin", "text_offsets.npy", "meta_offsets.npy")
+
+
+def build(analyzer, ids, texts, metadatas, batch, trace=False):
+    """Index every chunk with add_many; returns (index, seconds, traced bytes if `trace`)."""
+    index = KeywordIndex(analyzer=analyzer)
+    if trace:
+        tracemalloc.start()
+    start = time.perf_counter()
+    for i in range(0, len(texts), batch):
+        index.add_many(ids[i:i + batch], texts[i:i + batch], metadatas[i:i + batch])
+    seconds = time.perf_counter() - start
+    memory = None
+    if trace:
+        memory = tracemalloc.get_traced_memory()[0]
+        tracemalloc.stop()
+    return index, seconds, memory
+
+
+def build_baseline(texts, trace=False):
+    """The original structure: tokenized corpus + BM25Okapi; returns ((corpus, bm25), seconds, traced bytes if `trace`)."""
+    from rank_bm25 import BM25Okapi
+    if trace:
+        tracemalloc.start()
+    start = time.perf_counter()
+    corpus = [text.lower().split() for text in texts]
+    bm25 = BM25Okapi(corpus)
+    seconds = time.perf_counter() - start
+    memory = None
+    if trace:
+        memory = tracemalloc.get_traced_memory()[0]
+        tracemalloc.stop()
+    return (corpus, bm25), seconds, memory
+
+
+def baseline_hit_rate(bm25, corpus, args):
+    """hit_rate() for the baseline: the same queries, scored with BM25Okapi.get_scores over every chunk."""
+    rng = random.Random(args.seed)
+    hits = 0
+    for _ in range(args.queries):
+        chunk = rng.randrange(corpus.num_chunks)
+        words = corpus.chunk_text(chunk).replace(".", "").lower().split()
+        query = " ".join(rng.sample(words, min(args.query_words, len(words))))
+        scores = bm25.get_scores(query.lower().split())
+        # Ties go to the lower slot, as in KeywordIndex.top_k
+        top = np.lexsort((np.arange(len(scores)), -scores))[:args.k]
+        hits += any(slot == chunk and scores[slot] > 0 for slot in top.tolist())
+    return hits / args.queries
+
+
+def index_bytes_on_disk(path):
+    return sum(os.path.getsize(os.path.join(path, name)) for name in os.listdir(path) if name not in TEXT_FILES)
+
+
+def hit_rate(index, corpus, args):
+    rng = random.Random(args.seed)
+    hits = 0
+    for _ in range(args.queries):
+        chunk = rng.randrange(corpus.num_chunks)
+        words = corpus.chunk_text(chunk).replace(".", "").lower().split()
+        query = " ".join(rng.sample(words, min(args.query_words, len(words))))
+        slots = [slot for slot, _ in index.top_k(index.analyze(query), args.k)]
+        hits += any(index.get_entry(slot)['id'] == f"chunk-{chunk}" for slot in slots)
+    return hits / args.queries
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--chunks", type=int, default=50000)
+    parser.add_argument("--batch", type=int, default=512)
+    parser.add_argument("--queries", type=int, default=500)
+    parser.add_argument("--query-words", type=int, default=3)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    corpus = SyntheticCorpus(args.chunks, seed=args.seed)
+    chunks = list(corpus.chunks())
+    ids = [f"chunk-{i}" for i in range(len(chunks))]
+    texts = [text for text, _ in chunks]
+    metadatas = [metadata for _, metadata in chunks]
+    print(f"{args.chunks} chunks of ~{corpus.words_per_chunk} words")
+
+    start = time.perf_counter()
+    tokens = sum(len(text.lower().split()) for text in texts)
+    analyze_seconds = time.perf_counter() - start
+    _, _, baseline_memory = build_baseline(texts, trace=True)
+    (_, bm25), build_seconds, _ = build_baseline(texts)
+    rate = baseline_hit_rate(bm25, corpus, args)
+    print(f"  {'baseline':<10} analyze {len(texts) / analyze_seconds:8.0f} chunks/s ({tokens / len(texts):.0f} terms/chunk)  "
+          f"build {len(texts) / build_seconds:8.0f} chunks/s  "
+          f"in memory {baseline_memory / len(texts):6.0f} B/chunk  on disk     - B/chunk  "
+          f"{len(bm25.idf)} terms  hit@{args.k} {rate:.3f}  (List[str] + BM25Okapi)")
+    del bm25
+
+    for name, make_analyzer in ANALYZERS.items():
+        analyzer = make_analyzer()
+        start = time.perf_counter()
+        tokens = sum(len(analyzer(text)) for text in texts)
+        analyze_seconds = time.perf_counter() - start
+
+        # Timed without tracemalloc, which slows allocation down
+        _, _, memory = build(make_analyzer(), ids, texts, metadatas, args.batch, trace=True)
+        index, build_seconds, _ = build(make_analyzer(), ids, texts, metadatas, args.batch)
+        directory = tempfile.mkdtemp(prefix="bench_analyzer_")
+        try:
+            path = index.save(directory)
+            on_disk = index_bytes_on_disk(path)
+            num_terms = index.manifest['num_terms']
+            rate = hit_rate(index, corpus, args)
+        finally:
+            shutil.rmtree(directory, ignore_errors=True)
+
+        print(f"  {name:<10} analyze {len(texts) / analyze_seconds:8.0f} chunks/s ({tokens / len(texts):.0f} terms/chunk)  "
+              f"build {len(texts) / build_seconds:8.0f} chunks/s  "
+              f"in memory {memory / len(texts):6.0f} B/chunk  on disk {on_disk / len(texts):5.0f} B/chunk  "
+              f"{num_terms} terms  hit@{args.k} {rate:.3f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,132 @@
+#!/usr/bin/env python3
+"""
+/ask latency benchmark: blocking generation against the streamed NDJSON answer, fully
+offline with a FakeStreamingModel (fixed first-token and per-token delays).
+
+Reports time to first byte, time to first answer token, total time, and the worst
+event-loop stall seen by a 10 ms heartbeat task running alongside, then asserts (exiting
+non-zero on failure) that events arrive as sources, token*, done; that a model error
+ends the stream with an error event; and that a client disconnect stops generation
+early and closes the model's stream.
+
+Usage (from GeminiRAG/):
+    python benchmarks/bench_ask_stream.py [--tokens 200] [--token-latency 0.01]
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import sys
+import time
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from backend.generation import AnswerGenerator, answer_events, build_prompt
+from benchmarks.fakes import FakeStreamingModel
+
+RESULTS = [
+    {'content': f"Chunk {i} about retrieval.", 'score': 1.0 / (i + 1), 'metadata': {'chunk_index': i},
+     'source_type': 'hybrid', 'rank_info': ''}
+    for i in range(5)
+]
+
+
+async def heartbeat(stop: asyncio.Event, lags: list):
+    """Tick every 10 ms and record how late each tick fires."""
+    while not stop.is_set():
+        expected = time.perf_counter() + 0.01
+        await asyncio.sleep(0.01)
+        lags.append(time.perf_counter() - expected)
+
+
+async def with_heartbeat(coro):
+    stop, lags = asyncio.Event(), []
+    task = asyncio.create_task(heartbeat(stop, lags))
+    await asyncio.sleep(0)
+    try:
+        result = await coro
+    finally:
+        stop.set()
+        await task
+    return result, max(lags, default=0.0)
+
+
+async def blocking_ask(model):
+    """The original handler: blocking generate_content inside an async endpoint."""
+    start = time.perf_counter()
+    context = "\n\n".join(f"[Source {i+1}]: {r['content']}" for i, r in enumerate(RESULTS))
+    answer = model.generate_content(build_prompt("question", context)).text
+    body = json.dumps({'answer': answer, 'sources': RESULTS})
+    elapsed = time.perf_counter() - start
+    return elapsed, elapsed, elapsed, len(body)
+
+
+async def streaming_ask(model):
+    start = time.perf_counter()
+    first_byte = first_token = None
+    size = 0
+    async for line in answer_events("question", RESULTS, AnswerGenerator(model=model)):
+        now = time.perf_counter() - start
+        first_byte = first_byte if first_byte is not None else now
+        if first_token is None and json.loads(line)['type'] == 'token':
+            first_token = now
+        size += len(line)
+    return first_byte, first_token, time.perf_counter() - start, size
+
+
+async def event_types(model, is_disconnected=None):
+    return [json.loads(line)['type'] async for line in
+            answer_events("question", RESULTS, AnswerGenerator(model=model), is_disconnected=is_disconnected)]
+
+
+async def check(model):
+    """Assert event order, error reporting and that a disconnect stops and closes the model stream."""
+    n_tokens = len(model().tokens)
+
+    types = await event_types(model())
+    assert types == ['sources'] + ['token'] * n_tokens + ['done'], f"event order: {types[:3]}...{types[-2:]}"
+
+    failing = model()
+    failing.fail_after = 5
+    types = await event_types(failing)
+    assert types == ['sources'] + ['token'] * 5 + ['error'], f"model error: {types}"
+    assert failing.closed, "the model stream is closed after an error"
+
+    events = 0
+
+    async def is_disconnected():
+        return events >= 10
+
+    disconnected = model()
+    async for _ in answer_events("question", RESULTS, AnswerGenerator(model=disconnected), is_disconnected=is_disconnected):
+        events += 1
+    assert events == 10, f"{events} events sent after the client disconnected at 10"
+    assert disconnected.closed, "the model stream is closed on disconnect"
+    assert disconnected.tokens_sent <= 10 < n_tokens, f"model produced {disconnected.tokens_sent}/{n_tokens} tokens"
+    print(f"checks passed: event order, error event, disconnect stopped the model after "
+          f"{disconnected.tokens_sent}/{n_tokens} tokens and closed its stream")
+
+
+async def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--tokens", type=int, default=200)
+    parser.add_argument("--token-latency", type=float, default=0.01)
+    parser.add_argument("--first-token-latency", type=float, default=0.3)
+    args = parser.parse_args()
+
+    def model():
+        return FakeStreamingModel(args.tokens, args.token_latency, args.first_token_latency)
+
+    print(f"{args.tokens} tokens, first token after {args.first_token_latency * 1000:.0f} ms, "
+          f"{args.token_latency * 1000:.0f} ms per token")
+    print(f"{'mode':>10} {'TTFB ms':>8} {'1st tok ms':>10} {'total ms':>9} {'loop stall ms':>14}")
+    for name, fn in [("blocking", blocking_ask), ("streaming", streaming_ask)]:
+        (first_byte, first_token, total, _), stall = await with_heartbeat(fn(model()))
+        print(f"{name:>10} {first_byte * 1000:>8.0f} {first_token * 1000:>10.0f} {total * 1000:>9.0f} {stall * 1000:>14.0f}")
+
+    await check(model)
+
+
+if __name__ == '__main__':
+    asyncio.run(main())
@@ -0,0 +1,88 @@
+#!/usr/bin/env python3
+"""
+Context assembly benchmark for backend.context_builder, fully offline.
+
+Builds result lists the way hybrid_search returns them for /ask (up to 2*top_k chunks):
+overlapping neighbours from the same file (RecursiveCharacterTextSplitter, 1500/300),
+the same text uploaded under a second filename, and unrelated chunks, in shuffled fused
+order. Reports prompt tokens before and after assembly, what was pruned, build time,
+and whether every sentence of the chunks that were used survives in the context.
+
+Usage (from GeminiRAG/):
+    python benchmarks/bench_context.py [--queries 200] [--top-k 5] [--budget 4000]
+"""
+
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from langchain.text_splitter import RecursiveCharacterTextSplitter
+
+from backend.context_builder import ContextBuilder
+
+WORDS = ("index vector query chunk token model answer page source cache fusion score "
+         "retrieval embedding prompt context latency budget overlap document").split()
+
+
+def make_file(rng, sentences=120):
+    return " ".join(
+        f"S{i} " + " ".join(rng.choice(WORDS) for _ in range(rng.randint(8, 18))) + "."
+        for i in range(sentences)
+    )
+
+
+def make_results(rng, splitter, top_k):
+    chunks = splitter.split_text(make_file(rng))
+    start = rng.randrange(0, max(len(chunks) - top_k, 1))
+    results = [{'content': chunks[i], 'metadata': {'source': 'manual.pdf', 'chunk_index': i}}
+               for i in range(start, min(start + top_k, len(chunks)))]
+    # The same file uploaded again under another name
+    for r in rng.sample(results, k=min(2, len(results))):
+        results.append({'content': r['content'], 'metadata': {'source': 'manual (1).pdf',
+                                                              'chunk_index': r['metadata']['chunk_index']}})
+    other = splitter.split_text(make_file(rng, 40))
+    results += [{'content': c, 'metadata': {'source': 'notes.txt', 'chunk_index': i}}
+                for i, c in enumerate(other[:top_k])]
+    rng.shuffle(results)
+    return results[:2 * top_k]
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--top-k", type=int, default=5)
+    parser.add_argument("--budget", type=int, default=4000, help="context token budget")
+    args = parser.parse_args()
+
+    rng = random.Random(11)
+    splitter = RecursiveCharacterTextSplitter(chunk_size=1500, chunk_overlap=300,
+                                              separators=["\n\n", "\n", ". ", " ", ""])
+    queries = [make_results(rng, splitter, args.top_k) for _ in range(args.queries)]
+
+    builder = ContextBuilder(max_tokens=args.budget)
+    within_budget = lossless = 0
+    start = time.perf_counter()
+    for results in queries:
+        context, info = builder.build(results)
+        if info['over_budget_dropped'] == 0:
+            within_budget += 1
+            sentences = {s for r in results for s in r['content'].split(". ")}
+            lossless += all(s in context for s in sentences)
+    elapsed = time.perf_counter() - start
+
+    stats = builder.stats()
+    print(f"{args.queries} queries, up to {2 * args.top_k} chunks each, budget {args.budget} tokens")
+    print(f"prompt context tokens: {stats['tokens_in']} -> {stats['tokens_out']} "
+          f"(saved {stats['savings_rate']:.0%}, {stats['avg_tokens_saved_per_query']} per query)")
+    print(f"near-duplicates dropped: {stats['duplicates_dropped']}, over budget: {stats['over_budget_dropped']}, "
+          f"overlap chars trimmed: {stats['overlap_chars_trimmed']}")
+    print(f"queries with every sentence kept: {lossless}/{within_budget} within budget")
+    print(f"build time: {elapsed / args.queries * 1000:.2f} ms per query")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,106 @@
+#!/usr/bin/env python3
+"""
+Embedding throughput benchmark for backend.embedding_scheduler, fully offline.
+
+A FakeEmbeddings client with fixed per-request latency stands in for Gemini, so the
+numbers show how batching and concurrency hide round-trip time, and how jittered
+retries absorb injected quota errors. Before the timings it checks the scheduler's
+contract and exits non-zero if any check fails: batches stay under the count and token
+limits, output order matches input order when batches finish out of order, at most
+max_concurrency requests are in flight, and a batch that keeps failing is retried
+max_retries times before its error reaches the caller.
+
+Usage (from GeminiRAG/):
+    python benchmarks/bench_embedding_scheduler.py [--texts 2000] [--latency 0.05]
+"""
+
+import argparse
+import os
+import sys
+import time
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from backend.embedding_scheduler import EmbeddingScheduler, estimate_tokens
+from benchmarks.fakes import FakeEmbeddings
+
+
+def run(texts, latency, batch_size, concurrency, failure_rate=0.0):
+    fake = FakeEmbeddings(dim=64, latency=latency, failure_rate=failure_rate, seed=1)
+    scheduler = EmbeddingScheduler(fake, batch_size=batch_size, max_concurrency=concurrency,
+                                   base_delay=0.01, max_delay=0.1, max_retries=8)
+    start = time.perf_counter()
+    vectors = scheduler.embed_documents(texts)
+    elapsed = time.perf_counter() - start
+    assert len(vectors) == len(texts)
+    stats = scheduler.stats()
+    scheduler.close()
+    return elapsed, fake.calls, stats['retries']
+
+
+def check():
+    """Assert the scheduler's batching, ordering, concurrency and retry guarantees."""
+    # Mixed lengths, so both the count limit and the token limit cut batches
+    texts = [f"text {i} " + "word " * (i % 50) for i in range(300)]
+    fake = FakeEmbeddings(dim=16, latency=0.005, jitter=4.0, seed=2)
+    scheduler = EmbeddingScheduler(fake, batch_size=16, max_batch_tokens=120, max_concurrency=4,
+                                   base_delay=0.001, max_delay=0.01, max_retries=2)
+    try:
+        vectors = scheduler.embed_documents(texts)
+    finally:
+        scheduler.close()
+
+    sent = [text for batch in fake.batches for text in batch]
+    assert sorted(sent) == sorted(texts), "every text is sent exactly once"
+    for batch in fake.batches:
+        assert len(batch) <= 16, f"batch of {len(batch)} texts exceeds batch_size"
+        tokens = sum(estimate_tokens(text) for text in batch)
+        assert len(batch) == 1 or tokens <= 120, f"batch of {tokens} tokens exceeds max_batch_tokens"
+    assert len(fake.batches) > 300 // 16 + 1, "the token limit split some batches"
+    assert vectors == [fake._embed(text) for text in texts], "output order matches input order"
+    assert 1 < fake.max_in_flight <= 4, f"{fake.max_in_flight} requests in flight with max_concurrency=4"
+
+    # Every call fails: each batch is tried 1 + max_retries times, then the error surfaces
+    for n_texts in (10, 40):  # one batch (called inline) and several (through the pool)
+        fake = FakeEmbeddings(dim=16, failure_rate=1.0)
+        scheduler = EmbeddingScheduler(fake, batch_size=16, max_concurrency=4,
+                                       base_delay=0.001, max_delay=0.01, max_retries=2)
+        try:
+            scheduler.embed_documents(texts[:n_texts])
+        except RuntimeError as e:
+            assert "429" in str(e)
+        else:
+            raise AssertionError("a batch that keeps failing raises")
+        finally:
+            scheduler.close()
+        n_batches = len(scheduler.batches(texts[:n_texts]))
+        assert fake.calls == n_batches * 3, f"{fake.calls} calls for {n_batches} batches with max_retries=2"
+        assert scheduler.stats()['retries'] == n_batches * 2
+        assert scheduler.stats()['failures'] == n_batches
+    print("checks passed: batch limits, order, max in flight, retries")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--texts", type=int, default=2000)
+    parser.add_argument("--latency", type=float, default=0.05, help="seconds per fake request")
+    args = parser.parse_args()
+
+    check()
+    texts = [f"chunk {i} about topic {i % 37} with some filler words" for i in range(args.texts)]
+    print(f"{args.texts} texts, {args.latency * 1000:.0f} ms per request")
+    print(f"{'batch':>6} {'conc':>5} {'fail%':>6} {'requests':>9} {'retries':>8} {'seconds':>8} {'texts/s':>9}")
+    for batch_size, concurrency, failure_rate in [
+        (1, 1, 0.0), (20, 1, 0.0), (100, 1, 0.0), (20, 4, 0.0), (20, 8, 0.0), (20, 8, 0.2),
+    ]:
+        if batch_size == 1 and args.texts > 200:
+            sample = texts[:200]
+        else:
+            sample = texts
+        elapsed, calls, retries = run(sample, args.latency, batch_size, concurrency, failure_rate)
+        print(f"{batch_size:>6} {concurrency:>5} {failure_rate * 100:>6.0f} {calls:>9} {retries:>8} "
+              f"{elapsed:>8.2f} {len(sample) / elapsed:>9.0f}")
+
+
+if __name__ == '__main__':
+    main()
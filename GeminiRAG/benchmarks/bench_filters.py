@@ -0,0 +1,159 @@
+#!/usr/bin/env python3
+"""
+Metadata filter benchmark on a multi-source synthetic corpus (benchmarks/corpus.py),
+fully offline.
+
+1. Keyword index: BM25 top-k latency unfiltered and with filters of different
+   selectivity (one source, ten sources, a chunk_index range), on a snapshot
+   generation like the server serves. Filtered results are checked against
+   exhaustive scoring restricted to the matching chunks.
+2. hybrid_search through DocumentStore (fake embeddings, local Qdrant or --url),
+   unfiltered and restricted to one source. The embedded local client evaluates
+   payload filters without indexes; use a Qdrant server for representative numbers.
+
+Usage (from GeminiRAG/):
+    python benchmarks/bench_filters.py [--chunks 50000] [--chunks-per-doc 20] [--queries 300]
+        [--hybrid-chunks 10000] [--url http://localhost:6333]
+"""
+
+import argparse
+import os
+import random
+import shutil
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from backend.filters import matches, normalize_filters
+from backend.keyword_index import KeywordIndex
+from benchmarks.corpus import SyntheticCorpus
+
+
+def percentiles(latencies):
+    ms = np.array(latencies) * 1000
+    return f"p50 {np.percentile(ms, 50):7.3f} ms  p95 {np.percentile(ms, 95):7.3f} ms"
+
+
+def filter_cases(corpus, rng):
+    """name -> function returning a filter (or None) for each query."""
+    sources = lambda n: [corpus.source(d) for d in rng.sample(range(corpus.num_documents), n)]
+    return {
+        'unfiltered': lambda: None,
+        'one source': lambda: {'source': sources(1)[0]},
+        'ten sources': lambda: {'source': sources(10)},
+        'chunk_index < 5': lambda: {'chunk_index': {'lt': 5}},
+    }
+
+
+def exhaustive(index, tokens, k, filters):
+    """Reference: full BM25 scores, restricted to matching chunks, sorted."""
+    scores = index.get_scores(tokens)
+    filters = normalize_filters(filters)
+    hits = []
+    for slot in np.flatnonzero(scores > 0):
+        entry = index.get_entry(int(slot))
+        if entry is not None and all(matches(c, entry['metadata'].get(f)) for f, c in filters.items()):
+            hits.append((int(slot), float(scores[slot])))
+    return sorted(hits, key=lambda hit: (-hit[1], hit[0]))[:k]
+
+
+def bench_keyword_index(args, corpus):
+    directory = tempfile.mkdtemp(prefix="bench_filters_")
+    try:
+        start = time.perf_counter()
+        index = KeywordIndex()
+        for texts, metadatas in corpus.batches(2048):
+            index.add_many([f"chunk-{len(index) + j}" for j in range(len(texts))], texts, metadatas)
+        index.save(directory)
+        print(f"Keyword index: {len(index)} chunks from {corpus.num_documents} sources "
+              f"built and saved in {time.perf_counter() - start:.1f}s")
+
+        rng = random.Random(args.seed)
+        queries = [index.analyze(q) for q in corpus.queries(args.queries, seed=args.seed)]
+        for name, make_filter in filter_cases(corpus, rng).items():
+            filters = [make_filter() for _ in queries]
+            latencies = []
+            for tokens, f in zip(queries, filters):
+                t = time.perf_counter()
+                index.top_k(tokens, args.k, filters=f)
+                latencies.append(time.perf_counter() - t)
+            matched = len(index.filter_slots(filters[0])) if filters[0] else len(index)
+            print(f"  {name:<16} {matched:>8} chunks  {percentiles(latencies)}")
+
+            if filters[0] is not None:
+                for tokens, f in list(zip(queries, filters))[:args.verify]:
+                    got = index.top_k(tokens, args.k, filters=f)
+                    expected = exhaustive(index, tokens, args.k, f)
+                    if [s for s, _ in got] != [s for s, _ in expected] or \
+                            not np.allclose([x for _, x in got], [x for _, x in expected]):
+                        print(f"FAIL: filtered top-k differs from exhaustive scoring for {f}")
+                        sys.exit(1)
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+
+
+def bench_hybrid(args):
+    from qdrant_client import QdrantClient
+
+    from backend.vector_store import DocumentStore
+    from benchmarks.fakes import FakeEmbeddings
+
+    corpus = SyntheticCorpus(args.hybrid_chunks, chunks_per_doc=args.chunks_per_doc, seed=args.seed)
+    data_dir = tempfile.mkdtemp(prefix="bench_filters_store_")
+    store = DocumentStore(embeddings=FakeEmbeddings(), data_dir=data_dir,
+                          client=QdrantClient(url=args.url) if args.url else None)
+    try:
+        store.reset_collection()
+        for texts, metadatas in corpus.batches(512):
+            store.add_documents(texts, metadatas, persist=False)
+        store.persist_keyword_index()
+        store.wait_until_ready()
+        print(f"hybrid_search: {args.hybrid_chunks} chunks from {corpus.num_documents} sources "
+              f"({'Qdrant ' + args.url if args.url else 'local Qdrant'})")
+
+        rng = random.Random(args.seed)
+        queries = corpus.queries(args.queries, seed=args.seed + 1)
+        store.hybrid_search(queries[0], top_k=args.k)  # warm up
+        for name in ('unfiltered', 'one source'):
+            make_filter = filter_cases(corpus, rng)[name]
+            latencies = []
+            # Each query is new, so the results cache never answers
+            for query in queries[1:]:
+                f = make_filter()
+                t = time.perf_counter()
+                results = store.hybrid_search(query, top_k=args.k, filters=f)
+                latencies.append(time.perf_counter() - t)
+                if f and any(r['metadata']['source'] != f['source'] for r in results):
+                    print(f"FAIL: result outside filter {f}")
+                    sys.exit(1)
+            print(f"  {name:<16} {percentiles(latencies)}")
+            queries = corpus.queries(args.queries, seed=args.seed + 2)
+    finally:
+        store.close()
+        shutil.rmtree(data_dir, ignore_errors=True)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--chunks", type=int, default=50000)
+    parser.add_argument("--chunks-per-doc", type=int, default=20)
+    parser.add_argument("--queries", type=int, default=300)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--verify", type=int, default=20, help="filtered queries checked against exhaustive scoring")
+    parser.add_argument("--hybrid-chunks", type=int, default=10000, help="0 skips the hybrid_search part")
+    parser.add_argument("--url", default=os.getenv("QDRANT_URL"), help="Qdrant server (default: embedded local)")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    bench_keyword_index(args, SyntheticCorpus(args.chunks, chunks_per_doc=args.chunks_per_doc, seed=args.seed))
+    if args.hybrid_chunks:
+        bench_hybrid(args)
+    print("OK")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,75 @@
+#!/usr/bin/env python3
+"""
+Merge-cost benchmark: legacy content-string dedup vs backend.fusion.fuse
+
+Usage (from GeminiRAG/):
+    python benchmarks/bench_fusion.py
+"""
+
+import os
+import sys
+import time
+import uuid
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from backend.fusion import fuse
+
+
+def legacy_merge(semantic_results, bm25_results):
+    """The pre-fusion hybrid_search merge: content-string dedup with a rescan per overlap."""
+    combined_results = []
+    seen_content = set()
+    for res in semantic_results:
+        if res['content'] not in seen_content:
+            combined_results.append(res)
+            seen_content.add(res['content'])
+    for res in bm25_results:
+        if res['content'] not in seen_content:
+            combined_results.append(res)
+            seen_content.add(res['content'])
+        else:
+            for existing in combined_results:
+                if existing['content'] == res['content']:
+                    existing['source_type'] = 'hybrid'
+                    existing['rank_info'] += f" | BM25 Score: {res['score']:.4f}"
+                    break
+    return combined_results
+
+
+def make_results(top_k, overlap=0.5, chunk_chars=1500):
+    """Two result lists of top_k chunks each, sharing `overlap` of their chunks."""
+    shared = int(top_k * overlap)
+    chunks = [(uuid.uuid4().hex, f"{i:08d}" + "x" * chunk_chars) for i in range(2 * top_k - shared)]
+    semantic = chunks[:top_k]
+    keyword = chunks[top_k - shared:]
+
+    def to_results(items, label):
+        return [
+            {'id': chunk_id, 'content': content, 'metadata': {}, 'score': 1.0 / (rank + 1),
+             'source_type': label, 'rank_info': f"{label}: {1.0 / (rank + 1):.4f}"}
+            for rank, (chunk_id, content) in enumerate(items)
+        ]
+    return to_results(semantic, 'semantic'), to_results(keyword[::-1], 'bm25')
+
+
+def time_it(fn, repeat):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        fn()
+    return (time.perf_counter() - start) / repeat * 1000
+
+
+def main():
+    print(f"{'top_k':>6} {'legacy ms':>11} {'rrf ms':>9} {'weighted ms':>12}")
+    for top_k in (10, 100, 1000):
+        repeat = max(3, 2000 // top_k)
+        semantic, keyword = make_results(top_k)
+        legacy = time_it(lambda: legacy_merge([dict(r) for r in semantic], [dict(r) for r in keyword]), repeat)
+        rrf = time_it(lambda: fuse(semantic, keyword, top_k=top_k, mode="rrf"), repeat)
+        weighted = time_it(lambda: fuse(semantic, keyword, top_k=top_k, mode="weighted"), repeat)
+        print(f"{top_k:>6} {legacy:>11.3f} {rrf:>9.3f} {weighted:>12.3f}")
+
+
+if __name__ == '__main__':
+    main()
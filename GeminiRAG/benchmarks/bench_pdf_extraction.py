@@ -0,0 +1,124 @@
+#!/usr/bin/env python3
+"""
+PDF extraction benchmark: the original in-memory path against backend.extraction.
+
+Generates a text-only PDF (500 pages by default) and compares
+  - legacy: PdfReader(io.BytesIO(content)) with repeated string concatenation,
+    as /upload used to do on the event loop
+  - streaming: memory-mapped spool file, page ranges extracted in a process pool,
+    pages yielded in order
+reporting wall time and peak Python memory of the calling process (tracemalloc).
+
+Usage (from GeminiRAG/):
+    python benchmarks/bench_pdf_extraction.py [--pages 500] [--lines 45]
+"""
+
+import argparse
+import io
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from backend import extraction
+
+
+def write_pdf(path, pages, lines_per_page):
+    """Write a minimal multi-page PDF with one Helvetica text stream per page."""
+    objects = []  # object bodies, object number = index + 1
+
+    def add(body: bytes) -> int:
+        objects.append(body)
+        return len(objects)
+
+    catalog = add(b"")  # filled in once the page tree exists
+    page_tree = add(b"")
+    font = add(b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>")
+    page_ids = []
+    for p in range(pages):
+        ops = [b"BT /F1 10 Tf 12 TL 40 800 Td"]
+        for line in range(lines_per_page):
+            text = f"Page {p + 1} line {line + 1}: the quick brown fox jumps over the lazy dog {p * lines_per_page + line}"
+            ops.append(f"({text}) Tj T*".encode())
+        ops.append(b"ET")
+        stream = b"\n".join(ops)
+        content = add(b"<< /Length %d >>\nstream\n" % len(stream) + stream + b"\nendstream")
+        page_ids.append(add(
+            b"<< /Type /Page /Parent %d 0 R /MediaBox [0 0 595 842] "
+            b"/Resources << /Font << /F1 %d 0 R >> >> /Contents %d 0 R >>" % (page_tree, font, content)
+        ))
+    objects[catalog - 1] = b"<< /Type /Catalog /Pages %d 0 R >>" % page_tree
+    kids = b" ".join(b"%d 0 R" % i for i in page_ids)
+    objects[page_tree - 1] = b"<< /Type /Pages /Kids [%s] /Count %d >>" % (kids, len(page_ids))
+
+    out = bytearray(b"%PDF-1.4\n")
+    offsets = []
+    for number, body in enumerate(objects, start=1):
+        offsets.append(len(out))
+        out += b"%d 0 obj\n" % number + body + b"\nendobj\n"
+    xref = len(out)
+    out += b"xref\n0 %d\n0000000000 65535 f \n" % (len(objects) + 1)
+    for offset in offsets:
+        out += b"%010d 00000 n \n" % offset
+    out += b"trailer\n<< /Size %d /Root %d 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (len(objects) + 1, catalog, xref)
+    with open(path, "wb") as f:
+        f.write(out)
+
+
+def legacy(path):
+    from pypdf import PdfReader
+    with open(path, "rb") as f:
+        content = f.read()
+    pdf_reader = PdfReader(io.BytesIO(content))
+    text = ""
+    for page in pdf_reader.pages:
+        text += page.extract_text() + "\n"
+    return text.count("\n"), len(pdf_reader.pages)
+
+
+def streaming(path):
+    pages = 0
+    last = 0
+    for page, text in extraction.iter_pages(path, "bench.pdf"):
+        assert page == last + 1, "pages out of order"
+        last = page
+        pages += 1
+    return None, pages
+
+
+def measure(fn, path):
+    tracemalloc.start()
+    start = time.perf_counter()
+    _, pages = fn(path)
+    elapsed = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return elapsed, peak, pages
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--pages", type=int, default=500)
+    parser.add_argument("--lines", type=int, default=45, help="text lines per page")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "bench.pdf")
+        write_pdf(path, args.pages, args.lines)
+        print(f"{args.pages}-page PDF, {os.path.getsize(path) / 1e6:.1f} MB, "
+              f"{extraction.PDF_EXTRACT_PROCESSES} processes, {extraction.PDF_PAGES_PER_TASK} pages/task")
+
+        # Warm the process pool so its startup is not billed to the first run
+        list(extraction.iter_pages(path, "bench.pdf"))
+
+        print(f"{'path':>10} {'pages':>6} {'seconds':>8} {'pages/s':>8} {'peak MB':>8}")
+        for name, fn in [("legacy", legacy), ("streaming", streaming)]:
+            elapsed, peak, pages = measure(fn, path)
+            print(f"{name:>10} {pages:>6} {elapsed:>8.2f} {pages / elapsed:>8.0f} {peak / 1e6:>8.1f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,139 @@
+#!/usr/bin/env python3
+"""
+Collection profile benchmark: recall@k against exact search, p50/p99 query latency and
+resident memory for each profile in backend.collection_profiles, on a synthetic
+clustered corpus of 768-dim vectors.
+
+Point it at a Qdrant server with --url (or QDRANT_URL) for meaningful numbers. Memory
+is then the server's resident set (its /metrics endpoint), measured after each profile's
+collection is loaded. Without a URL the embedded local client is used, which accepts
+the profile settings but always searches exactly in RAM. Expect recall 1.0 and the
+same latency for every profile in that mode.
+
+Usage (from GeminiRAG/):
+    python benchmarks/bench_profiles.py [--url http://localhost:6333] [--points 20000]
+        [--queries 200] [--k 10] [--profiles memory,scalar,binary,on_disk]
+"""
+
+import argparse
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from qdrant_client import QdrantClient
+from qdrant_client.models import CollectionStatus, PointStruct
+
+from backend.collection_profiles import PROFILES, VECTOR_SIZE
+
+
+def make_corpus(points, queries, dim, seed=0):
+    """Unit vectors around 200 random centers; queries are drawn the same way."""
+    rng = np.random.default_rng(seed)
+    centers = rng.standard_normal((200, dim)).astype(np.float32)
+
+    def sample(n):
+        vectors = centers[rng.integers(0, len(centers), n)] + 0.6 * rng.standard_normal((n, dim)).astype(np.float32)
+        return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+    return sample(points), sample(queries)
+
+
+def exact_top_k(corpus, queries, k):
+    top = []
+    for start in range(0, len(queries), 256):
+        scores = queries[start:start + 256] @ corpus.T
+        part = np.argpartition(-scores, k, axis=1)[:, :k]
+        order = np.take_along_axis(scores, part, axis=1).argsort(axis=1)[:, ::-1]
+        top.extend(np.take_along_axis(part, order, axis=1))
+    return [set(row.tolist()) for row in top]
+
+
+def resident_bytes(url):
+    """Server RSS from Qdrant's Prometheus metrics, or this process's RSS in local mode."""
+    if url:
+        import httpx
+        for line in httpx.get(f"{url.rstrip('/')}/metrics", timeout=10).text.splitlines():
+            if line.startswith("memory_resident_bytes"):
+                return float(line.split()[-1])
+        return float('nan')
+    with open("/proc/self/statm") as f:
+        return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+
+
+def wait_indexed(client, name, timeout=600):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        info = client.get_collection(name)
+        if info.status == CollectionStatus.GREEN:
+            return
+        time.sleep(1)
+    print(f"  (collection {name} still optimizing after {timeout}s)")
+
+
+def run_profile(client, url, profile, corpus, queries, truth, k):
+    name = f"bench_profile_{profile.name}"
+    if client.collection_exists(name):
+        client.delete_collection(name)
+    rss_before = resident_bytes(url)
+    profile.create_collection(client, name, size=corpus.shape[1])
+    for start in range(0, len(corpus), 1000):
+        batch = corpus[start:start + 1000]
+        client.upsert(name, points=[
+            PointStruct(id=start + i, vector=vector.tolist(), payload={'n': start + i})
+            for i, vector in enumerate(batch)
+        ], wait=True)
+    wait_indexed(client, name)
+    rss = resident_bytes(url)
+
+    params = profile.search_params()
+    latencies, recalls = [], []
+    for query, expected in zip(queries, truth):
+        start = time.perf_counter()
+        points = client.query_points(name, query=query.tolist(), limit=k, search_params=params).points
+        latencies.append(time.perf_counter() - start)
+        recalls.append(len(expected & {p.id for p in points}) / k)
+    client.delete_collection(name)
+    return float(np.mean(recalls)), np.percentile(latencies, 50), np.percentile(latencies, 99), rss, rss - rss_before
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--url", default=os.getenv("QDRANT_URL"))
+    parser.add_argument("--points", type=int, default=20000)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--profiles", default=",".join(PROFILES))
+    args = parser.parse_args()
+
+    corpus, queries = make_corpus(args.points, args.queries, VECTOR_SIZE)
+    truth = exact_top_k(corpus, queries, args.k)
+
+    tmp = None
+    if args.url:
+        client = QdrantClient(url=args.url)
+        print(f"Qdrant server {args.url}")
+    else:
+        tmp = tempfile.mkdtemp(prefix="bench_profiles_")
+        client = QdrantClient(path=tmp)
+        print("Embedded local Qdrant: profile settings are accepted but search is always exact in RAM")
+
+    print(f"{args.points} points x {VECTOR_SIZE} dims, {args.queries} queries, k={args.k}")
+    print(f"{'profile':>9} {'recall@k':>9} {'p50 ms':>7} {'p99 ms':>7} {'RSS MB':>8} {'+MB':>7}")
+    try:
+        for name in args.profiles.split(","):
+            recall, p50, p99, rss, delta = run_profile(client, args.url, PROFILES[name], corpus, queries, truth, args.k)
+            print(f"{name:>9} {recall:>9.4f} {p50 * 1000:>7.2f} {p99 * 1000:>7.2f} {rss / 1e6:>8.1f} {delta / 1e6:>7.1f}")
+    finally:
+        client.close()
+        if tmp:
+            shutil.rmtree(tmp, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    main()
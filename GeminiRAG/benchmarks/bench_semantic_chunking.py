@@ -0,0 +1,143 @@
+#!/usr/bin/env python3
+"""
+Semantic chunking benchmark: the original SemanticChunker path against the native
+single-pass splitter in backend.chunking, fully offline.
+
+For each synthetic document every path chunks the text and produces chunk vectors
+ready for indexing:
+  - legacy: base split + SemanticChunker.create_documents + small-chunk merge, then
+    embed the chunks again for Qdrant
+  - native: AgenticChunker.chunk_with_vectors (sentence windows embedded once in
+    batched requests), then embed the chunks again (the default)
+  - pooled: the same with SEMANTIC_POOLED_VECTORS=true, whose chunk vectors are pooled
+    from the sentence embeddings, so chunks are not embedded again
+and reports embedding requests, texts embedded (what the embedding API bills) and time,
+and checks that every path returns the same chunks.
+
+Every path embeds one window per sentence, and those windows are nearly all of the
+texts embedded. The default native path saves CPU time, not embeddings. Pooled vectors
+save the per-document chunk requests (about half of the requests) but only the chunk
+texts, a few percent of what is billed.
+
+Usage (from GeminiRAG/):
+    python benchmarks/bench_semantic_chunking.py [--docs 20] [--sentences 300]
+"""
+
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+os.environ.setdefault("GOOGLE_API_KEY", "offline-benchmark")
+
+from langchain.text_splitter import RecursiveCharacterTextSplitter
+from langchain_experimental.text_splitter import SemanticChunker
+
+from backend.chunking import AgenticChunker
+from benchmarks.fakes import FakeEmbeddings
+
+TOPICS = [
+    "qdrant vector index collection payload segment hnsw graph",
+    "gemini model prompt answer context token generation stream",
+    "pdf page extraction upload spool reader layout text",
+    "bm25 keyword term frequency inverse document posting list",
+    "cache hit miss eviction ttl generation invalidation memory",
+]
+
+
+def make_document(rng, sentences):
+    """Sentences drawn from one topic at a time, switching topic every few sentences."""
+    out = []
+    topic = rng.choice(TOPICS).split()
+    for i in range(sentences):
+        if i and rng.random() < 0.12:
+            topic = rng.choice(TOPICS).split()
+        words = [rng.choice(topic) for _ in range(rng.randint(6, 16))]
+        out.append(" ".join(words).capitalize() + rng.choice([".", ".", "?", "!"]))
+    return " ".join(out)
+
+
+def legacy_chunks(text, embeddings):
+    """The pre-native _semantic_chunking, verbatim apart from the function signature."""
+    base_splitter = RecursiveCharacterTextSplitter(chunk_size=1500, chunk_overlap=300,
+                                                   separators=["\n\n", "\n", ". ", " ", ""])
+    base_chunks = base_splitter.split_text(text)
+    if len(base_chunks) <= 2:
+        return base_chunks
+    semantic_splitter = SemanticChunker(embeddings, breakpoint_threshold_type="percentile",
+                                        breakpoint_threshold_amount=90)
+    docs = semantic_splitter.create_documents([text])
+    raw_chunks = [doc.page_content.strip() for doc in docs]
+    merged_chunks = []
+    current_chunk = ""
+    for chunk in raw_chunks:
+        if not chunk or len(set(chunk)) < 10:
+            continue
+        if not current_chunk:
+            current_chunk = chunk
+        elif len(current_chunk) < 350:
+            current_chunk += " " + chunk
+        else:
+            merged_chunks.append(current_chunk)
+            current_chunk = chunk
+    if current_chunk:
+        if len(current_chunk) < 350 and merged_chunks:
+            merged_chunks[-1] += " " + current_chunk
+        else:
+            merged_chunks.append(current_chunk)
+    return merged_chunks if merged_chunks else base_chunks
+
+
+def run_legacy(docs):
+    fake = FakeEmbeddings(dim=256)
+    start = time.perf_counter()
+    results = []
+    for text in docs:
+        chunks = legacy_chunks(text, fake)
+        fake.embed_documents(chunks)  # chunks embedded again by add_documents
+        results.append(chunks)
+    return results, fake, time.perf_counter() - start
+
+
+def run_native(docs, pooled_vectors):
+    fake = FakeEmbeddings(dim=256)
+    chunker = AgenticChunker(strategy="semantic", embeddings=fake, pooled_vectors=pooled_vectors)
+    start = time.perf_counter()
+    results = []
+    for text in docs:
+        chunks, vectors = chunker.chunk_with_vectors(text)
+        if vectors is None:
+            fake.embed_documents(chunks)
+        results.append(chunks)
+    return results, fake, time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--docs", type=int, default=20)
+    parser.add_argument("--sentences", type=int, default=300, help="sentences per document")
+    args = parser.parse_args()
+
+    rng = random.Random(7)
+    docs = [make_document(rng, args.sentences) for _ in range(args.docs)]
+    docs += ["A short note. It fits in one base chunk.", "x" * 2000]  # base-split-only cases
+
+    legacy, legacy_fake, legacy_seconds = run_legacy(docs)
+    runs = {'native': run_native(docs, pooled_vectors=False), 'pooled': run_native(docs, pooled_vectors=True)}
+
+    print(f"{len(docs)} documents, {sum(len(c) for c in legacy)} chunks, identical chunking: " +
+          ", ".join(f"{name} {sum(a == b for a, b in zip(legacy, chunks))}/{len(docs)}"
+                    for name, (chunks, _, _) in runs.items()))
+    print(f"{'path':>8} {'requests':>9} {'texts':>7} {'seconds':>8}  saved vs legacy")
+    print(f"{'legacy':>8} {legacy_fake.calls:>9} {legacy_fake.texts:>7} {legacy_seconds:>8.2f}")
+    for name, (_, fake, seconds) in runs.items():
+        print(f"{name:>8} {fake.calls:>9} {fake.texts:>7} {seconds:>8.2f}  "
+              f"requests {1 - fake.calls / legacy_fake.calls:.0%}, texts {1 - fake.texts / legacy_fake.texts:.0%}")
+    print("texts embedded is what the embedding API bills, and the sentence windows every path embeds are most "
+          "of it: pooled vectors save requests, not billed texts")
+
+
+if __name__ == '__main__':
+    main()
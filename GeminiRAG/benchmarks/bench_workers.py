@@ -0,0 +1,201 @@
+#!/usr/bin/env python3
+"""
+Multi-process serving benchmark: /search (or /ask) throughput with 1..N uvicorn
+workers sharing one Qdrant server and one memory-mapped keyword index, fully offline.
+
+1. Starts the Qdrant stand-in (benchmarks/qdrant_standin.py) unless --url is given,
+   and loads a synthetic corpus through DocumentStore with the fake embedder.
+2. For each worker count, serves web/server.py's app with the fake embedder and model
+   (uvicorn --workers N) and drives it with --concurrency clients for --duration
+   seconds of unique queries, so no cache answers. Reports requests/sec and latency.
+3. Publishes a new document through one worker (PUT /documents) and measures how long
+   until --confirm consecutive searches, spread over the workers, all find it.
+
+Throughput can only scale up to the machine's cores, shared with the load generator
+and the stand-in. The stand-in serves one request at a time, so for more than a few
+workers use a real Qdrant server (--url).
+
+Usage (from GeminiRAG/):
+    python benchmarks/bench_workers.py [--workers 1,2,4] [--chunks 10000] [--duration 15]
+        [--concurrency 32] [--endpoint search] [--url http://localhost:6333]
+"""
+
+import argparse
+import asyncio
+import os
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.append(ROOT)
+
+from benchmarks.corpus import SyntheticCorpus
+
+
+def create_app():
+    """uvicorn --factory entry point for each worker: the server app on fake Gemini clients."""
+    sys.path.append(os.path.join(ROOT, 'web'))
+    import server
+    from backend.generation import AnswerGenerator
+    from backend.vector_store import DocumentStore
+    from benchmarks.fakes import FakeEmbeddings, FakeStreamingModel
+
+    # Assigned before startup, so the app's lifespan hook uses it instead of opening its own
+    server.doc_store = DocumentStore(embeddings=FakeEmbeddings())
+    server.answer_generator = AnswerGenerator(model=FakeStreamingModel(n_tokens=50, first_token_latency=0.05))
+    return server.app
+
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def wait_for(url: str, path: str, timeout: float = 120):
+    import httpx
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            if httpx.get(url + path, timeout=2).status_code == 200:
+                return
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.3)
+    raise RuntimeError(f"{url} did not come up within {timeout}s")
+
+
+def load_corpus(args, corpus, data_dir):
+    from qdrant_client import QdrantClient
+    from backend.vector_store import DocumentStore
+    from benchmarks.fakes import FakeEmbeddings
+
+    store = DocumentStore(embeddings=FakeEmbeddings(), client=QdrantClient(url=args.url), data_dir=data_dir)
+    try:
+        store.wait_until_ready()
+        store.reset_collection()
+        for texts, metadatas in corpus.batches(512):
+            store.add_documents(texts, metadatas, persist=False)
+        store.persist_keyword_index()
+    finally:
+        store.close()
+
+
+async def drive(base_url, queries, args):
+    """Closed loop: --concurrency clients sending the next query as soon as one returns."""
+    import httpx
+    latencies, errors = [], 0
+    deadline = time.perf_counter() + args.duration
+    position = 0
+    limits = httpx.Limits(max_connections=args.concurrency, max_keepalive_connections=0)
+
+    async with httpx.AsyncClient(base_url=base_url, timeout=60, limits=limits) as client:
+        async def worker():
+            nonlocal errors, position
+            while time.perf_counter() < deadline:
+                query = queries[position % len(queries)]
+                position += 1
+                start = time.perf_counter()
+                try:
+                    response = await client.post(f"/{args.endpoint}", json={'query': query, 'top_k': 5})
+                    if response.status_code != 200 or 'error' in response.json():
+                        errors += 1
+                except httpx.HTTPError:
+                    errors += 1
+                latencies.append(time.perf_counter() - start)
+
+        start = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(args.concurrency)))
+        seconds = time.perf_counter() - start
+
+    ms = np.array(latencies) * 1000
+    return {'requests': len(latencies), 'errors': errors, 'requests_per_sec': len(latencies) / seconds,
+            'p50_ms': float(np.percentile(ms, 50)), 'p95_ms': float(np.percentile(ms, 95))}
+
+
+def propagation(base_url, args, marker):
+    """Seconds from PUT /documents returning until --confirm consecutive searches find the marker."""
+    import httpx
+    # New connections each time, so the searches land on different workers
+    response = httpx.put(f"{base_url}/documents", timeout=60,
+                         json={'source': f"{marker}.txt", 'text': f"Fresh text about {marker} for the search"}).json()
+    if not response.get('success'):
+        raise RuntimeError(f"PUT /documents failed: {response}")
+    start = time.perf_counter()
+    streak = 0
+    while streak < args.confirm:
+        results = httpx.post(f"{base_url}/search", json={'query': marker, 'top_k': 3}, timeout=60).json()['results']
+        streak = streak + 1 if any(marker in r['content'] for r in results) else 0
+        if time.perf_counter() - start > 30:
+            raise RuntimeError("new document not visible on every worker after 30s")
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--workers", default="1,2,4")
+    parser.add_argument("--chunks", type=int, default=10000)
+    parser.add_argument("--duration", type=float, default=15.0, help="seconds of load per worker count")
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--endpoint", default="search", choices=["search", "ask"])
+    parser.add_argument("--confirm", type=int, default=20, help="consecutive hits that confirm propagation")
+    parser.add_argument("--url", default=os.getenv("QDRANT_URL"), help="Qdrant server (default: start the stand-in)")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+    worker_counts = [int(n) for n in args.workers.split(",") if n]
+
+    data_dir = tempfile.mkdtemp(prefix="bench_workers_")
+    env = dict(os.environ, GEMINIRAG_DATA_DIR=data_dir, GOOGLE_API_KEY=os.getenv("GOOGLE_API_KEY", "offline-benchmark"))
+    processes = []
+    try:
+        if not args.url:
+            port = free_port()
+            processes.append(subprocess.Popen([sys.executable, os.path.join(ROOT, "benchmarks", "qdrant_standin.py"),
+                                               "--port", str(port)], env=env))
+            args.url = f"http://127.0.0.1:{port}"
+            wait_for(args.url, "/")
+        env['QDRANT_URL'] = args.url
+        os.environ.update(GEMINIRAG_DATA_DIR=data_dir, QDRANT_URL=args.url, GOOGLE_API_KEY=env['GOOGLE_API_KEY'])
+
+        corpus = SyntheticCorpus(args.chunks, seed=args.seed)
+        start = time.perf_counter()
+        load_corpus(args, corpus, data_dir)
+        print(f"Loaded {args.chunks} chunks into {args.url} in {time.perf_counter() - start:.1f}s "
+              f"({os.cpu_count()} CPUs)")
+
+        baseline = None
+        for n in worker_counts:
+            port = free_port()
+            server = subprocess.Popen(
+                [sys.executable, "-m", "uvicorn", "--factory", "benchmarks.bench_workers:create_app",
+                 "--port", str(port), "--workers", str(n), "--log-level", "warning"],
+                cwd=ROOT, env=env, stdout=subprocess.DEVNULL
+            )
+            try:
+                base_url = f"http://127.0.0.1:{port}"
+                wait_for(base_url, "/stats")
+                queries = corpus.queries(5000, seed=args.seed + n)
+                result = asyncio.run(drive(base_url, queries, args))
+                seconds = propagation(base_url, args, marker=f"marker{n}x{args.seed}")
+                baseline = baseline or result['requests_per_sec']
+                print(f"  {n} worker(s): {result['requests_per_sec']:8.1f} req/s (x{result['requests_per_sec'] / baseline:.2f})  "
+                      f"p50 {result['p50_ms']:7.1f} ms  p95 {result['p95_ms']:7.1f} ms  "
+                      f"{result['errors']} errors  new document on all workers after {seconds * 1000:.0f} ms")
+            finally:
+                server.terminate()
+                server.wait(30)
+    finally:
+        for process in processes:
+            process.terminate()
+            process.wait(30)
+        shutil.rmtree(data_dir, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    main()
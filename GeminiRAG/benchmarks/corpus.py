@@ -0,0 +1,91 @@
+"""
+Deterministic synthetic corpus for benchmarks.
+
+Chunks are sentences of pseudo-words drawn from a Zipf distribution over a fixed
+vocabulary, grouped into documents. Every chunk is generated from its own seed, so any
+chunk (and any query derived from it) can be produced without generating the rest,
+and corpora of 1k to 1M chunks stream in constant memory.
+"""
+
+import random
+from typing import Iterator, List, Tuple
+
+import numpy as np
+
+SYLLABLES = ("ka", "lo", "mi", "ne", "ru", "ta", "vo", "shi", "pe", "da", "gu", "ri", "so", "xe", "bi", "fa")
+
+
+def make_vocabulary(size: int, seed: int = 0) -> List[str]:
+    """`size` distinct pronounceable pseudo-words."""
+    rng = random.Random(seed)
+    words, seen = [], set()
+    while len(words) < size:
+        word = "".join(rng.choice(SYLLABLES) for _ in range(rng.randint(2, 4)))
+        if word not in seen:
+            seen.add(word)
+            words.append(word)
+    return words
+
+
+class SyntheticCorpus:
+    def __init__(self, chunks: int, chunks_per_doc: int = 20, words_per_chunk: int = 120,
+                 vocabulary: int = 20000, zipf: float = 1.1, seed: int = 0):
+        self.num_chunks = chunks
+        self.chunks_per_doc = chunks_per_doc
+        self.words_per_chunk = words_per_chunk
+        self.seed = seed
+        self.vocabulary = make_vocabulary(vocabulary, seed)
+        weights = 1.0 / np.arange(1, vocabulary + 1) ** zipf
+        self._cdf = np.cumsum(weights / weights.sum())
+
+    @property
+    def num_documents(self) -> int:
+        return -(-self.num_chunks // self.chunks_per_doc)
+
+    def chunk_text(self, i: int) -> str:
+        """Text of chunk i: sentences of 8-16 words, each capitalized and ending with a period."""
+        rng = np.random.default_rng((self.seed, i))
+        ids = np.minimum(np.searchsorted(self._cdf, rng.random(self.words_per_chunk)), len(self.vocabulary) - 1)
+        words = [self.vocabulary[j] for j in ids]
+        sentences, start = [], 0
+        for length in rng.integers(8, 17, size=self.words_per_chunk):
+            if start >= len(words):
+                break
+            sentence = words[start:start + length]
+            sentences.append(" ".join(sentence).capitalize() + ".")
+            start += length
+        return " ".join(sentences)
+
+    def source(self, doc: int) -> str:
+        return f"synthetic/doc-{doc:07d}.txt"
+
+    def chunks(self) -> Iterator[Tuple[str, dict]]:
+        """(text, metadata) for every chunk, in document order."""
+        for i in range(self.num_chunks):
+            doc, index = divmod(i, self.chunks_per_doc)
+            yield self.chunk_text(i), {'chunk_index': index, 'strategy': 'synthetic', 'source': self.source(doc), 'page': 1}
+
+    def batches(self, size: int) -> Iterator[Tuple[List[str], List[dict]]]:
+        texts, metadatas = [], []
+        for text, metadata in self.chunks():
+            texts.append(text)
+            metadatas.append(metadata)
+            if len(texts) >= size:
+                yield texts, metadatas
+                texts, metadatas = [], []
+        if texts:
+            yield texts, metadatas
+
+    def document_text(self, doc: int) -> str:
+        """Full text of a document, for chunking benchmarks."""
+        first = doc * self.chunks_per_doc
+        return "\n\n".join(self.chunk_text(i) for i in range(first, min(first + self.chunks_per_doc, self.num_chunks)))
+
+    def queries(self, n: int, words: int = 4, seed: int = 1) -> List[str]:
+        """Queries made of words from random chunks, so each has at least one relevant chunk."""
+        rng = random.Random(seed)
+        queries = []
+        for _ in range(n):
+            chunk_words = self.chunk_text(rng.randrange(self.num_chunks)).replace(".", "").lower().split()
+            queries.append(" ".join(rng.sample(chunk_words, min(words, len(chunk_words)))))
+        return queries
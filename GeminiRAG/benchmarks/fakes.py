@@ -0,0 +1,194 @@
+"""
+Deterministic offline stand-ins for the Gemini clients, for benchmarks.
+"""
+
+import asyncio
+import hashlib
+import random
+import re
+import threading
+import time
+from typing import Dict, List, Optional
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+from langchain_core.messages import AIMessage
+
+
+class FakeEmbeddings(Embeddings):
+    """
+    Hash-based embedder: each word hashes to a fixed random direction and a text's vector
+    is the normalized sum, so texts sharing words are similar. Optional per-call latency
+    (up to `jitter` times longer at random, so concurrent calls finish out of order) and
+    failure rate simulate a remote API. It records every batch it was sent and the peak
+    number of calls in flight.
+    """
+
+    def __init__(self, dim: int = 768, latency: float = 0.0, failure_rate: float = 0.0, seed: int = 0,
+                 jitter: float = 0.0):
+        self.dim = dim
+        self.latency = latency
+        self.jitter = jitter
+        self.failure_rate = failure_rate
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+        self.calls = 0
+        self.texts = 0
+        self.batches: List[List[str]] = []
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self._words: Dict[str, np.ndarray] = {}
+
+    def _word_vector(self, word: str) -> np.ndarray:
+        vector = self._words.get(word)
+        if vector is None:
+            seed = int.from_bytes(hashlib.blake2b(word.encode("utf-8"), digest_size=8).digest(), "little")
+            vector = self._words[word] = np.random.default_rng(seed).standard_normal(self.dim)
+        return vector
+
+    def _embed(self, text: str) -> List[float]:
+        vector = np.zeros(self.dim)
+        for word in text.lower().split():
+            vector += self._word_vector(word)
+        norm = np.linalg.norm(vector)
+        return (vector / norm if norm else vector).tolist()
+
+    def _call(self, texts: List[str]):
+        with self._lock:
+            self.calls += 1
+            self.texts += len(texts)
+            self.batches.append(list(texts))
+            self.in_flight += 1
+            self.max_in_flight = max(self.max_in_flight, self.in_flight)
+            fail = self.failure_rate and self._rng.random() < self.failure_rate
+            delay = self.latency * (1 + self.jitter * self._rng.random())
+        try:
+            if delay:
+                time.sleep(delay)
+        finally:
+            with self._lock:
+                self.in_flight -= 1
+        if fail:
+            raise RuntimeError("429 Resource has been exhausted (fake)")
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        self._call(texts)
+        return [self._embed(text) for text in texts]
+
+    def embed_query(self, text: str) -> List[float]:
+        self._call([text])
+        return self._embed(text)
+
+
+class FakeLLM:
+    """
+    Stand-in for ChatGoogleGenerativeAI's invoke/ainvoke. It answers a proposition prompt
+    by returning the sentences after "Text:" one per line, and any other prompt with a
+    fixed sentence. It has a fixed latency per call, an optional failure rate, and counts
+    calls and peak concurrency.
+    """
+
+    model = "fake-llm"
+
+    def __init__(self, latency: float = 0.0, failure_rate: float = 0.0, seed: int = 0):
+        self.latency = latency
+        self.failure_rate = failure_rate
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+        self.calls = 0
+        self.in_flight = 0
+        self.max_in_flight = 0
+
+    def _respond(self, prompt: str) -> AIMessage:
+        _, _, text = prompt.partition("Text:")
+        sentences = [s.strip() for s in re.split(r'(?<=[.!?]) +', text.strip()) if s.strip()]
+        return AIMessage(content="\n".join(sentences) if sentences else "This is a fake answer.")
+
+    def _start(self) -> bool:
+        with self._lock:
+            self.calls += 1
+            self.in_flight += 1
+            self.max_in_flight = max(self.max_in_flight, self.in_flight)
+            return bool(self.failure_rate) and self._rng.random() < self.failure_rate
+
+    def _finish(self, fail: bool):
+        with self._lock:
+            self.in_flight -= 1
+        if fail:
+            raise RuntimeError("429 Resource has been exhausted (fake)")
+
+    def invoke(self, prompt: str) -> AIMessage:
+        fail = self._start()
+        time.sleep(self.latency)
+        self._finish(fail)
+        return self._respond(prompt)
+
+    async def ainvoke(self, prompt: str) -> AIMessage:
+        fail = self._start()
+        await asyncio.sleep(self.latency)
+        self._finish(fail)
+        return self._respond(prompt)
+
+
+class _FakeResponse:
+    def __init__(self, text: str):
+        self.text = text
+
+
+class _FakeStream:
+    """Async iterator over answer pieces, like a streamed GenerateContentResponse."""
+
+    def __init__(self, model: "FakeStreamingModel"):
+        self.model = model
+        self.index = 0
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        if self.model.closed or self.index >= len(self.model.tokens):
+            raise StopAsyncIteration
+        await asyncio.sleep(self.model.first_token_latency if self.index == 0 else self.model.token_latency)
+        if self.model.fail_after is not None and self.index >= self.model.fail_after:
+            raise RuntimeError("500 An internal error has occurred (fake)")
+        self.index += 1
+        self.model.tokens_sent += 1
+        return _FakeResponse(self.model.tokens[self.index - 1])
+
+    async def aclose(self):
+        self.model.closed = True
+
+
+class FakeStreamingModel:
+    """
+    Stand-in for google.generativeai.GenerativeModel: a fixed answer of `n_tokens` pieces,
+    with a first-token delay and a per-token delay, available blocking (generate_content),
+    async, or async streamed. `tokens_sent` counts pieces actually produced and `closed`
+    records that the consumer closed the stream, which lets a benchmark check that a
+    cancelled stream stops generating. With `fail_after`, a stream raises after that many
+    pieces.
+    """
+
+    def __init__(self, n_tokens: int = 200, token_latency: float = 0.01, first_token_latency: float = 0.3,
+                 fail_after: Optional[int] = None):
+        self.tokens = [f"word{i} " for i in range(n_tokens)]
+        self.token_latency = token_latency
+        self.first_token_latency = first_token_latency
+        self.fail_after = fail_after
+        self.tokens_sent = 0
+        self.closed = False
+
+    def _total_latency(self) -> float:
+        return self.first_token_latency + self.token_latency * (len(self.tokens) - 1)
+
+    def generate_content(self, prompt: str) -> _FakeResponse:
+        time.sleep(self._total_latency())
+        self.tokens_sent += len(self.tokens)
+        return _FakeResponse("".join(self.tokens))
+
+    async def generate_content_async(self, prompt: str, stream: bool = False):
+        if stream:
+            return _FakeStream(self)
+        await asyncio.sleep(self._total_latency())
+        self.tokens_sent += len(self.tokens)
+        return _FakeResponse("".join(self.tokens))
@@ -0,0 +1,130 @@
+#!/usr/bin/env python3
+"""
+Stand-in Qdrant server for tests and benchmarks: the embedded (local mode) Qdrant
+behind the subset of the Qdrant REST API that DocumentStore uses, so QDRANT_URL
+deployments (several uvicorn workers on one collection) can be exercised without
+installing Qdrant.
+
+It searches exhaustively in one Python process, one request at a time, so it is not a
+performance reference. With many workers it becomes the bottleneck; use a real Qdrant
+server for absolute numbers.
+
+Usage (from GeminiRAG/):
+    python benchmarks/qdrant_standin.py [--port 6333] [--path DIR]   (default: in memory)
+"""
+
+import argparse
+import time
+from importlib.metadata import version
+
+from fastapi import FastAPI, Request
+from qdrant_client import QdrantClient
+from qdrant_client.http import models as m
+
+
+def create_app(client: QdrantClient) -> FastAPI:
+    app = FastAPI(title="Qdrant stand-in")
+
+    def ok(result):
+        if hasattr(result, "model_dump"):
+            result = result.model_dump(mode="json")
+        elif isinstance(result, list):
+            result = [item.model_dump(mode="json") for item in result]
+        return {'result': result, 'status': "ok", 'time': 0.0}
+
+    def update_result():
+        return ok(m.UpdateResult(operation_id=int(time.time() * 1000), status=m.UpdateStatus.COMPLETED))
+
+    @app.get("/")
+    async def root():
+        return {'title': "qdrant stand-in", 'version': version("qdrant-client")}
+
+    @app.get("/collections/{name}/exists")
+    async def collection_exists(name: str):
+        return ok({'exists': client.collection_exists(name)})
+
+    @app.put("/collections/{name}")
+    async def create_collection(name: str, request: Request):
+        body = m.CreateCollection.model_validate(await request.json())
+        return ok(client.create_collection(
+            name, vectors_config=body.vectors, sparse_vectors_config=body.sparse_vectors,
+            hnsw_config=body.hnsw_config, quantization_config=body.quantization_config,
+            on_disk_payload=body.on_disk_payload
+        ))
+
+    @app.delete("/collections/{name}")
+    async def delete_collection(name: str):
+        return ok(client.delete_collection(name))
+
+    @app.get("/collections/{name}")
+    async def get_collection(name: str):
+        return ok(client.get_collection(name))
+
+    @app.put("/collections/{name}/index")
+    async def create_payload_index(name: str, request: Request):
+        # Local mode has no payload indexes; filters are evaluated point by point
+        return update_result()
+
+    @app.put("/collections/{name}/points")
+    async def upsert(name: str, request: Request):
+        body = m.PointsList.model_validate(await request.json())
+        client.upsert(name, points=body.points)
+        return update_result()
+
+    @app.post("/collections/{name}/points")
+    async def retrieve(name: str, request: Request):
+        body = m.PointRequest.model_validate(await request.json())
+        return ok(client.retrieve(name, ids=body.ids, with_payload=body.with_payload,
+                                  with_vectors=body.with_vector))
+
+    @app.post("/collections/{name}/points/batch")
+    async def batch_update(name: str, request: Request):
+        body = m.UpdateOperations.model_validate(await request.json())
+        client.batch_update_points(name, update_operations=body.operations)
+        return ok([m.UpdateResult(operation_id=int(time.time() * 1000), status=m.UpdateStatus.COMPLETED)
+                   for _ in body.operations])
+
+    @app.post("/collections/{name}/points/scroll")
+    async def scroll(name: str, request: Request):
+        body = m.ScrollRequest.model_validate(await request.json())
+        points, next_offset = client.scroll(name, scroll_filter=body.filter, limit=body.limit or 10,
+                                            offset=body.offset, with_payload=body.with_payload,
+                                            with_vectors=body.with_vector)
+        return ok(m.ScrollResult(points=points, next_page_offset=next_offset))
+
+    @app.post("/collections/{name}/points/delete")
+    async def delete(name: str, request: Request):
+        body = await request.json()
+        selector = m.FilterSelector.model_validate(body) if 'filter' in body else m.PointIdsList.model_validate(body)
+        client.delete(name, points_selector=selector)
+        return update_result()
+
+    @app.post("/collections/{name}/points/count")
+    async def count(name: str, request: Request):
+        body = m.CountRequest.model_validate(await request.json())
+        return ok(client.count(name, count_filter=body.filter, exact=True))
+
+    @app.post("/collections/{name}/points/query")
+    async def query(name: str, request: Request):
+        body = m.QueryRequest.model_validate(await request.json())
+        return ok(client.query_points(name, query=body.query, query_filter=body.filter, limit=body.limit or 10,
+                                      with_payload=body.with_payload, score_threshold=body.score_threshold))
+
+    return app
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=6333)
+    parser.add_argument("--path", help="directory for the local database (default: in memory)")
+    args = parser.parse_args()
+
+    import uvicorn
+    client = QdrantClient(path=args.path) if args.path else QdrantClient(location=":memory:")
+    print(f"[Qdrant stand-in] Serving {'in-memory' if not args.path else args.path} on http://{args.host}:{args.port}")
+    uvicorn.run(create_app(client), host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,294 @@
+#!/usr/bin/env python3
+"""
+Offline benchmark suite: DocumentStore, AgenticChunker and the FastAPI app on a
+synthetic corpus, with the deterministic fake embedder and LLM from benchmarks/fakes.py
+in place of Gemini. No API key or network is needed.
+
+Scenarios, run for each corpus size (--sizes, 1k to 1M chunks):
+    ingest   chunking throughput (semantic strategy) on a sample of documents, then
+             add_documents in batches (embed + upsert + keyword index) for the whole corpus
+    startup  DocumentStore construction on the ingested data: warm (keyword index snapshot)
+             and cold (snapshot deleted, rebuilt from Qdrant)
+    search   hybrid_search latency (p50/p95/p99) for each --top-k, with unique queries so
+             the caches never answer
+    ask      POST /ask end to end through the app under each --concurrency level, with
+             generation by the fake model
+
+Results are written as JSON (--output); --compare prints the ratio of every number to a
+previous run's file.
+
+The embedded local Qdrant keeps every vector in memory and searches exhaustively, which
+is slow for large corpora. Past ~100k chunks use a Qdrant server (--url).
+
+Usage (from GeminiRAG/):
+    python benchmarks/run_suite.py [--sizes 1000,10000] [--scenarios ingest,startup,search,ask]
+        [--top-k 1,5,10,50] [--concurrency 1,8,32] [--url http://localhost:6333]
+        [--output results.json] [--compare previous.json]
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import platform
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+# web/server.py is imported by the ask scenario: keep anything it writes in a scratch
+# directory and give its Gemini client a placeholder key. Its doc_store is set to the
+# fake-backed store, so no request reaches Gemini.
+os.environ['GEMINIRAG_DATA_DIR'] = tempfile.mkdtemp(prefix="bench_server_")
+os.environ.setdefault('GOOGLE_API_KEY', "offline-benchmark")
+
+from qdrant_client import QdrantClient
+
+from backend.chunking import AgenticChunker
+from backend.generation import AnswerGenerator
+from backend.vector_store import DocumentStore
+from benchmarks.corpus import SyntheticCorpus
+from benchmarks.fakes import FakeEmbeddings, FakeLLM, FakeStreamingModel
+
+SCENARIOS = ("ingest", "startup", "search", "ask")
+
+
+def latency_summary(latencies):
+    ms = np.array(latencies) * 1000
+    return {
+        'count': len(ms),
+        'mean_ms': round(float(ms.mean()), 3),
+        'p50_ms': round(float(np.percentile(ms, 50)), 3),
+        'p95_ms': round(float(np.percentile(ms, 95)), 3),
+        'p99_ms': round(float(np.percentile(ms, 99)), 3),
+    }
+
+
+class Bench:
+    def __init__(self, args):
+        self.args = args
+        self.embedder = FakeEmbeddings(latency=args.embed_latency)
+        self.llm = FakeLLM()
+
+    def open_store(self, data_dir, reset=False):
+        client = QdrantClient(url=self.args.url) if self.args.url else None
+        store = DocumentStore(embeddings=self.embedder, client=client, data_dir=data_dir)
+        if reset:
+            store.reset_collection()
+        return store
+
+    # ------------------------------------------------------------------ scenarios
+
+    def ingest(self, corpus, data_dir):
+        store = self.open_store(data_dir, reset=True)
+        try:
+            # Chunking: the semantic strategy on a sample of whole documents
+            chunker = AgenticChunker(strategy="semantic", embeddings=store.embeddings, llm=self.llm)
+            sample = min(self.args.chunk_docs, corpus.num_documents)
+            start = time.perf_counter()
+            produced = sum(len(chunker.chunk_with_vectors(corpus.document_text(doc))[0]) for doc in range(sample))
+            chunk_seconds = time.perf_counter() - start
+
+            # Indexing the whole corpus
+            start = time.perf_counter()
+            for texts, metadatas in corpus.batches(self.args.batch):
+                store.add_documents(texts, metadatas, persist=False)
+            store.persist_keyword_index()
+            seconds = time.perf_counter() - start
+            return {
+                'chunking': {
+                    'documents': sample,
+                    'chunks': produced,
+                    'docs_per_sec': round(sample / chunk_seconds, 2),
+                    'chunks_per_sec': round(produced / chunk_seconds, 2),
+                },
+                'indexing': {
+                    'chunks': corpus.num_chunks,
+                    'seconds': round(seconds, 3),
+                    'chunks_per_sec': round(corpus.num_chunks / seconds, 2),
+                    'docs_per_sec': round(corpus.num_documents / seconds, 2),
+                },
+            }
+        finally:
+            store.close()
+
+    def startup(self, corpus, data_dir):
+        results = {}
+        for mode in ("warm", "cold"):
+            if mode == "cold":
+                shutil.rmtree(os.path.join(data_dir, "keyword_index"), ignore_errors=True)
+            start = time.perf_counter()
+            store = self.open_store(data_dir)
+            constructed = time.perf_counter() - start
+            store.wait_until_ready()
+            ready = time.perf_counter() - start
+            results[mode] = {
+                'construct_ms': round(constructed * 1000, 2),
+                'ready_ms': round(ready * 1000, 2),
+                'keyword_docs': len(store.keyword_index),
+                'startup_stats': store.startup_stats,
+            }
+            store.close()
+        return results
+
+    def search(self, corpus, data_dir):
+        store = self.open_store(data_dir)
+        try:
+            store.wait_until_ready()
+            results = {}
+            for top_k in self.args.top_k:
+                queries = corpus.queries(self.args.queries, seed=top_k)
+                store.hybrid_search(queries[0], top_k=top_k)  # warm up
+                latencies = []
+                for query in queries[1:]:
+                    start = time.perf_counter()
+                    store.hybrid_search(query, top_k=top_k)
+                    latencies.append(time.perf_counter() - start)
+                results[f"top_k={top_k}"] = latency_summary(latencies)
+            return results
+        finally:
+            store.close()
+
+    def ask(self, corpus, data_dir):
+        server = self.server()
+        store = self.open_store(data_dir)
+        previous = server.doc_store, server.answer_generator
+        server.doc_store = store
+        server.answer_generator = AnswerGenerator(model=FakeStreamingModel(
+            n_tokens=self.args.answer_tokens, token_latency=self.args.token_latency,
+            first_token_latency=self.args.first_token_latency
+        ))
+        try:
+            store.wait_until_ready()
+            return {f"concurrency={c}": asyncio.run(self._ask_load(server.app, corpus, c))
+                    for c in self.args.concurrency}
+        finally:
+            server.doc_store, server.answer_generator = previous
+            store.close()
+
+    async def _ask_load(self, app, corpus, concurrency):
+        import httpx
+        queries = corpus.queries(self.args.ask_requests, seed=1000 + concurrency)
+        latencies, errors = [], 0
+
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://bench",
+                                     timeout=None) as client:
+            async def worker(mine):
+                nonlocal errors
+                for query in mine:
+                    start = time.perf_counter()
+                    body = (await client.post("/ask", json={'query': query, 'top_k': 5})).json()
+                    latencies.append(time.perf_counter() - start)
+                    if 'error' in body:
+                        errors += 1
+
+            start = time.perf_counter()
+            await asyncio.gather(*(worker(queries[i::concurrency]) for i in range(concurrency)))
+            seconds = time.perf_counter() - start
+
+        return {'requests': len(queries), 'errors': errors, 'requests_per_sec': round(len(queries) / seconds, 2),
+                **latency_summary(latencies)}
+
+    def server(self):
+        sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'web')))
+        import server
+        return server
+
+    def run(self):
+        results = {}
+        for size in self.args.sizes:
+            corpus = SyntheticCorpus(size, seed=self.args.seed)
+            data_dir = tempfile.mkdtemp(prefix=f"bench_suite_{size}_")
+            print(f"== {size} chunks ({corpus.num_documents} documents)")
+            results[str(size)] = {}
+            try:
+                # Every scenario after ingest runs on the data it wrote
+                for scenario in ("ingest",) + tuple(s for s in self.args.scenarios if s != "ingest"):
+                    start = time.perf_counter()
+                    results[str(size)][scenario] = getattr(self, scenario)(corpus, data_dir)
+                    print(f"   {scenario}: {time.perf_counter() - start:.1f}s")
+                    print("   " + json.dumps(results[str(size)][scenario]))
+                if "ingest" not in self.args.scenarios:
+                    del results[str(size)]["ingest"]
+            finally:
+                shutil.rmtree(data_dir, ignore_errors=True)
+        return results
+
+
+def git_commit():
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], text=True,
+                                       cwd=os.path.dirname(__file__), stderr=subprocess.DEVNULL).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(current, previous, path=""):
+    """Print current/previous for every number present in both result trees."""
+    for key, value in current.items():
+        if key not in previous:
+            continue
+        here = f"{path}.{key}" if path else key
+        if isinstance(value, dict) and isinstance(previous[key], dict):
+            compare(value, previous[key], here)
+        elif isinstance(value, (int, float)) and isinstance(previous[key], (int, float)) and previous[key]:
+            print(f"{here:<70} {previous[key]:>12g} -> {value:>12g}  x{value / previous[key]:.2f}")
+
+
+def parse_list(cast):
+    return lambda text: [cast(item) for item in text.split(",") if item]
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sizes", type=parse_list(int), default=[1000, 10000])
+    parser.add_argument("--scenarios", type=parse_list(str), default=list(SCENARIOS))
+    parser.add_argument("--top-k", type=parse_list(int), default=[1, 5, 10, 50])
+    parser.add_argument("--queries", type=int, default=200, help="hybrid_search queries per top_k")
+    parser.add_argument("--concurrency", type=parse_list(int), default=[1, 8, 32])
+    parser.add_argument("--ask-requests", type=int, default=200, help="/ask requests per concurrency level")
+    parser.add_argument("--batch", type=int, default=512, help="chunks per add_documents call")
+    parser.add_argument("--chunk-docs", type=int, default=50, help="documents in the chunking sample")
+    parser.add_argument("--embed-latency", type=float, default=0.0, help="fake embedding API latency per call (s)")
+    parser.add_argument("--first-token-latency", type=float, default=0.05, help="fake model first token delay (s)")
+    parser.add_argument("--token-latency", type=float, default=0.0, help="fake model delay per further token (s)")
+    parser.add_argument("--answer-tokens", type=int, default=50)
+    parser.add_argument("--url", default=os.getenv("QDRANT_URL"), help="Qdrant server (default: embedded local)")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", default="benchmark_results.json")
+    parser.add_argument("--compare", help="previous results JSON to compare against")
+    args = parser.parse_args()
+
+    unknown = set(args.scenarios) - set(SCENARIOS)
+    if unknown:
+        parser.error(f"unknown scenarios {sorted(unknown)}, expected {SCENARIOS}")
+
+    results = Bench(args).run()
+    report = {
+        'meta': {
+            'timestamp': time.strftime("%Y-%m-%dT%H:%M:%S"),
+            'git_commit': git_commit(),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'cpus': os.cpu_count(),
+            'qdrant': args.url or "local",
+            'args': vars(args),
+        },
+        'results': results,
+    }
+    with open(args.output, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"Results written to {args.output}")
+
+    if args.compare:
+        with open(args.compare) as f:
+            compare(results, json.load(f)['results'])
+
+
+if __name__ == '__main__':
+    main()
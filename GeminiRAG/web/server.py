@@ -4,12 +4,16 @@ Standalone Qdrant Semantic Search Test Server
 Runs on port 6000
 """
 
-from fastapi import FastAPI, UploadFile, File, Form
-from fastapi.responses import FileResponse
+from fastapi import FastAPI, UploadFile, File, Form, Request
+from fastapi.responses import FileResponse, JSONResponse, PlainTextResponse, StreamingResponse
 from fastapi.staticfiles import StaticFiles
 from pydantic import BaseModel
+from contextlib import asynccontextmanager
+from typing import Any, Dict, Optional
 import sys
 import os
+import tempfile
+import time
 from dotenv import load_dotenv
 
 # Load environment variables
@@ -18,31 +22,89 @@ load_dotenv()
 # Add parent directory to path
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 
-from backend.vector_store import DocumentStore
+from backend.vector_store import DocumentStore, document_id
+from backend.keyword_index import WriterLockTimeout
 from backend.chunking import AgenticChunker
+from backend.ingestion import IngestionQueue
+from backend.generation import AnswerGenerator, answer_events, format_sources
+from backend.answer_cache import AnswerCache
+from backend.fusion import result_key
+from backend.metrics import TimingMiddleware, metrics
 
-app = FastAPI(title="Qdrant Test Server")
+# DocumentStore (shared with main app) and the background ingestion pipeline for /upload.
+# Created by lifespan() in the process that serves requests, so the uvicorn supervisor
+# (and any process that only imports this module) never opens Qdrant or the keyword index.
+# A doc_store assigned before startup (e.g. by a benchmark) is used as is.
+doc_store: Optional[DocumentStore] = None
+ingestion: Optional[IngestionQueue] = None
 
-# Initialize DocumentStore (shared with main app)
-doc_store = DocumentStore()
+# Longest a write request waits for the keyword index writer lock (held by another
+# worker or the ingest CLI) before answering 503
+WRITE_TIMEOUT = float(os.getenv("KEYWORD_WRITER_TIMEOUT", "10"))
+
+
+def _busy(e: WriterLockTimeout) -> JSONResponse:
+    print(f"[Qdrant Test] Keyword index busy: {e}")
+    return JSONResponse(status_code=503, content={'success': False, 'error': str(e)})
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    global doc_store, ingestion
+    if doc_store is None:
+        doc_store = DocumentStore()
+    ingestion = IngestionQueue(
+        doc_store,
+        chunker_factory=lambda strategy: AgenticChunker(strategy=strategy, embeddings=doc_store.embeddings),
+        # Shared by all worker processes: job status files live here too
+        spool_dir=os.getenv("INGEST_SPOOL_DIR", os.path.join(tempfile.gettempdir(), "geminirag_uploads")),
+        workers=int(os.getenv("INGEST_WORKERS", "2")),
+        queue_size=int(os.getenv("INGEST_QUEUE_SIZE", "4")),
+        job_ttl=float(os.getenv("INGEST_JOB_TTL", "3600")),
+        max_jobs=int(os.getenv("INGEST_MAX_JOBS", "1000"))
+    )
+    yield
+    doc_store.close()
+
+app = FastAPI(title="Qdrant Test Server", lifespan=lifespan)
+
+# Per-route latency histograms, plus Server-Timing headers with the stages of each request
+app.add_middleware(TimingMiddleware, metrics=metrics,
+                   headers=os.getenv("METRICS_TIMING_HEADERS", "false").lower() == "true")
+
+# Gemini answer generation for /ask and /ask/stream
+answer_generator = AnswerGenerator()
+
+# Answers reused by paraphrased questions that retrieve the same chunks
+answer_cache = AnswerCache.from_env()
 
 class AddDocumentRequest(BaseModel):
     text: str
 
+class ReplaceDocumentRequest(BaseModel):
+    source: str
+    text: str
+
 class SearchRequest(BaseModel):
     query: str
     top_k: int = 3
+    fusion: str = "rrf"
+    alpha: float = 0.5
+    # Metadata filter, e.g. {"source": "manual.pdf"} or {"page": {"gte": 3}} (see backend/filters.py)
+    filters: Optional[Dict[str, Any]] = None
 
 @app.get("/")
 async def index():
     return FileResponse("index.html")
 
+# Document writes are plain `def` handlers: FastAPI runs them in its thread pool, so
+# chunking, embedding, Qdrant writes and waiting for the keyword index writer lock never
+# block the event loop
 @app.post("/add")
-async def add_document(request: AddDocumentRequest):
+def add_document(request: AddDocumentRequest):
     try:
         # Chunk the text - always use default (semantic) strategy
-        chunker = AgenticChunker(strategy="semantic")
-        chunks = chunker.chunk(request.text)
+        chunker = AgenticChunker(strategy="semantic", embeddings=doc_store.embeddings)
+        chunks, vectors = chunker.chunk_with_vectors(request.text)
         
         print(f"[Qdrant Test] Chunked text into {len(chunks)} chunks using semantic strategy")
         
@@ -56,11 +118,15 @@ async def add_document(request: AddDocumentRequest):
             })
         
         # Add to Qdrant
-        doc_store.add_documents(texts=chunks, metadatas=metadatas)
+        added_ids = doc_store.add_documents(texts=chunks, metadatas=metadatas, vectors=vectors, persist=False,
+                                            timeout=WRITE_TIMEOUT)
+        doc_store.persist_later()
         
-        print(f"[Qdrant Test] Successfully added {len(chunks)} chunks to vector store")
+        print(f"[Qdrant Test] Successfully added {len(added_ids)} new chunks to vector store")
         
-        return {'success': True, 'chunks': len(chunks)}
+        return {'success': True, 'chunks': len(chunks), 'new_chunks': len(added_ids), 'document_id': document_id('test_ui')}
+    except WriterLockTimeout as e:
+        return _busy(e)
     except Exception as e:
         print(f"[Qdrant Test] Error: {e}")
         import traceback
@@ -69,77 +135,98 @@ async def add_document(request: AddDocumentRequest):
 
 @app.post("/upload")
 async def upload_files(files: list[UploadFile] = File(...)):
+    """Spool uploads to disk and queue them for background ingestion; returns job ids immediately."""
     try:
-        from pypdf import PdfReader
-        import io
+        import aiofiles
         
-        results = []
-        total_chunks = 0
+        jobs = []
         
         print(f"[Qdrant Test] Uploading {len(files)} files")
         
         for file in files:
-            try:
-                print(f"[Qdrant Test] Processing file: {file.filename}")
-                
-                # Read file content
-                content = await file.read()
-                
-                # Extract text based on file type
-                text = ""
-                if file.filename.endswith('.pdf'):
-                    # Extract text from PDF
-                    pdf_reader = PdfReader(io.BytesIO(content))
-                    for page in pdf_reader.pages:
-                        text += page.extract_text() + "\n"
-                elif file.filename.endswith(('.txt', '.md')):
-                    # Read as text
-                    text = content.decode('utf-8')
-                else:
-                    results.append({'filename': file.filename, 'status': 'skipped', 'reason': 'Unsupported file type'})
-                    continue
-                
-                print(f"[Qdrant Test] Extracted {len(text)} characters from {file.filename}")
-                
-                # Chunk the text - always use default (semantic) strategy
-                chunker = AgenticChunker(strategy="semantic")
-                chunks = chunker.chunk(text)
-                
-                print(f"[Qdrant Test] Chunked into {len(chunks)} chunks using semantic strategy")
-                
-                # Create metadata
-                metadatas = []
-                for i in range(len(chunks)):
-                    metadatas.append({
-                        'chunk_index': i,
-                        'strategy': 'semantic',
-                        'source': file.filename
-                    })
-                
-                # Add to Qdrant
-                doc_store.add_documents(texts=chunks, metadatas=metadatas)
-                
-                print(f"[Qdrant Test] Successfully added {len(chunks)} chunks from {file.filename}")
-                total_chunks += len(chunks)
-                results.append({'filename': file.filename, 'status': 'success', 'chunks': len(chunks)})
-                
-            except Exception as e:
-                print(f"[Qdrant Test] Error processing {file.filename}: {e}")
-                results.append({'filename': file.filename, 'status': 'error', 'error': str(e)})
+            # Stream the upload to the spool directory in 1 MB pieces
+            path = ingestion.spool_path()
+            async with aiofiles.open(path, 'wb') as out:
+                while True:
+                    piece = await file.read(1024 * 1024)
+                    if not piece:
+                        break
+                    await out.write(piece)
+                    metrics.inc("bytes", "uploaded", len(piece))
+            
+            # Always use default (semantic) strategy
+            job = ingestion.submit(file.filename, path, strategy="semantic")
+            print(f"[Qdrant Test] Queued {file.filename} as job {job.id}")
+            jobs.append(job.to_dict())
         
-        return {'success': True, 'results': results, 'total_chunks': total_chunks}
+        return {'success': True, 'jobs': jobs}
     except Exception as e:
         print(f"[Qdrant Test] Upload error: {e}")
         import traceback
         traceback.print_exc()
         return {'success': False, 'error': str(e)}
 
+@app.get("/jobs")
+async def list_jobs():
+    """Jobs of every worker process (their status files are shared through the spool directory)"""
+    return {'jobs': ingestion.jobs()}
+
+@app.get("/jobs/{job_id}")
+async def get_job(job_id: str):
+    job = ingestion.get(job_id)
+    if job is None:
+        return JSONResponse(status_code=404, content={'error': f'Unknown job {job_id}'})
+    return job
+
+@app.put("/documents")
+def replace_document(request: ReplaceDocumentRequest):
+    """Create or replace the document from `source`; only its changed chunks are re-indexed."""
+    try:
+        chunker = AgenticChunker(strategy="semantic", embeddings=doc_store.embeddings)
+        chunks, vectors = chunker.chunk_with_vectors(request.text)
+        metadatas = [{'chunk_index': i, 'strategy': 'semantic'} for i in range(len(chunks))]
+        
+        result = doc_store.replace_document(request.source, chunks, metadatas, vectors=vectors, persist=False,
+                                            timeout=WRITE_TIMEOUT)
+        doc_store.persist_later()
+        
+        print(f"[Qdrant Test] Replaced document {result['document_id']} ({request.source}): "
+              f"{result['new_chunks']} new, {result['removed_chunks']} removed chunks")
+        return {'success': True, **result}
+    except WriterLockTimeout as e:
+        return _busy(e)
+    except Exception as e:
+        print(f"[Qdrant Test] Replace error: {e}")
+        import traceback
+        traceback.print_exc()
+        return {'success': False, 'error': str(e)}
+
+@app.delete("/documents/{document_id}")
+def delete_document(document_id: str):
+    """Remove one document's chunks from Qdrant and the keyword index"""
+    try:
+        removed = doc_store.delete_document(document_id, persist=False, timeout=WRITE_TIMEOUT)
+        doc_store.persist_later()
+        if not removed:
+            return JSONResponse(status_code=404, content={'success': False, 'error': f'Unknown document {document_id}'})
+        
+        print(f"[Qdrant Test] Deleted document {document_id} ({removed} chunks)")
+        return {'success': True, 'document_id': document_id, 'removed_chunks': removed}
+    except WriterLockTimeout as e:
+        return _busy(e)
+    except Exception as e:
+        print(f"[Qdrant Test] Delete error: {e}")
+        import traceback
+        traceback.print_exc()
+        return {'success': False, 'error': str(e)}
+
 @app.post("/search")
 async def search(request: SearchRequest):
     try:
-        print(f"[Qdrant Test] Searching for: '{request.query}' with top_k={request.top_k}")
+        print(f"[Qdrant Test] Searching for: '{request.query}' with top_k={request.top_k}, filters={request.filters}")
         # Use Hybrid Search
-        results = doc_store.hybrid_search(request.query, top_k=request.top_k)
+        results = await doc_store.ahybrid_search(request.query, top_k=request.top_k, alpha=request.alpha, fusion=request.fusion,
+                                                 filters=request.filters)
         
         print(f"[Qdrant Test] Found {len(results)} results")
         for i, r in enumerate(results):
@@ -156,20 +243,12 @@ async def search(request: SearchRequest):
 async def ask_question(request: SearchRequest):
     """RAG endpoint: Search + Synthesize answer with Gemini"""
     try:
-        import google.generativeai as genai
-        import os
-        
-        # Get API key
-        api_key = os.getenv("GOOGLE_API_KEY")
-        if not api_key:
-            return {'error': 'GOOGLE_API_KEY not found in environment'}
-        
-        genai.configure(api_key=api_key)
-        
         print(f"[Qdrant Test] RAG Query: '{request.query}'")
+        generation = doc_store.generation
         
         # Use Hybrid Search for better retrieval
-        results = doc_store.hybrid_search(request.query, top_k=request.top_k)
+        results = await doc_store.ahybrid_search(request.query, top_k=request.top_k, alpha=request.alpha, fusion=request.fusion,
+                                                 filters=request.filters)
         
         if not results:
             return {
@@ -178,53 +257,72 @@ async def ask_question(request: SearchRequest):
                 'sources': []
             }
         
-        # Build context from search results
-        context = "\n\n".join([
-            f"[Source {i+1}]: {r['content']}" 
-            for i, r in enumerate(results)
-        ])
+        # Reuse the answer to a similar question over the same chunks, if one is cached
+        if answer_cache.enabled:
+            embedding = await doc_store.aembed_query(request.query)
+            chunk_ids = [result_key(r) for r in results]
+            cached = answer_cache.lookup(embedding, chunk_ids, generation)
+            if cached is not None:
+                print(f"[Qdrant Test] Answer cache hit: '{cached['question']}' (similarity {cached['similarity']})")
+                return {
+                    'question': request.query,
+                    'answer': cached['answer'],
+                    'sources': cached['sources'],
+                    'context': cached['context'],
+                    'cached': {'question': cached['question'], 'similarity': cached['similarity']}
+                }
         
-        # Generate answer with Gemini
-        prompt = f"""Based on the following context, provide a detailed and comprehensive answer to the question. 
-        Explain the concepts thoroughly, citing specific details from the context where appropriate.
-        If the context contains examples, include them in your explanation.
-
-Context:
-{context}
-
-Question: {request.query}
-
-Answer:"""
+        start = time.perf_counter()
         
-        model = genai.GenerativeModel('gemini-2.0-flash-exp')
-        response = model.generate_content(prompt)
-        answer = response.text
+        # Assemble a token-budgeted context (near-duplicates and chunk overlaps removed)
+        prompt, context_info = answer_generator.prepare(request.query, results)
         
-        # Format sources
-        sources = [
-            {
-                'content': r['content'],
-                'score': r['score'],
-                'metadata': r['metadata'],
-                'source_type': r.get('source_type', 'unknown'),
-                'rank_info': r.get('rank_info', '')
-            }
-            for r in results
-        ]
+        # Generate answer with Gemini (async API, so the event loop keeps serving)
+        answer = await answer_generator.generate(prompt)
         
         print(f"[Qdrant Test] Generated answer: {answer[:100]}...")
         
-        return {
-            'question': request.query,
-            'answer': answer,
-            'sources': sources
-        }
+        response = {'answer': answer, 'sources': format_sources(results), 'context': context_info}
+        if answer_cache.enabled:
+            answer_cache.store(request.query, embedding, chunk_ids, generation, response, time.perf_counter() - start)
+        return {'question': request.query, **response}
     except Exception as e:
         print(f"[Qdrant Test] RAG error: {e}")
         import traceback
         traceback.print_exc()
         return {'error': str(e)}
 
+@app.post("/ask/stream")
+async def ask_question_stream(request: SearchRequest, http_request: Request):
+    """
+    Streaming RAG endpoint. Responds with NDJSON events: `sources` first, then `token`
+    events as Gemini generates the answer, then `done` (or `error`).
+    """
+    try:
+        print(f"[Qdrant Test] Streaming RAG Query: '{request.query}'")
+        generation = doc_store.generation
+        results = await doc_store.ahybrid_search(request.query, top_k=request.top_k, alpha=request.alpha, fusion=request.fusion,
+                                                 filters=request.filters)
+        
+        cached, on_answer = None, None
+        if results and answer_cache.enabled:
+            embedding = await doc_store.aembed_query(request.query)
+            chunk_ids = [result_key(r) for r in results]
+            cached = answer_cache.lookup(embedding, chunk_ids, generation)
+            on_answer = lambda answer, seconds: answer_cache.store(request.query, embedding, chunk_ids, generation,
+                                                                   answer, seconds)
+    except Exception as e:
+        print(f"[Qdrant Test] RAG error: {e}")
+        import traceback
+        traceback.print_exc()
+        return {'error': str(e)}
+    
+    return StreamingResponse(
+        answer_events(request.query, results, answer_generator, is_disconnected=http_request.is_disconnected,
+                      cached=cached, on_answer=on_answer),
+        media_type="application/x-ndjson"
+    )
+
 @app.get("/stats")
 async def stats():
     try:
@@ -232,31 +330,41 @@ async def stats():
         return {
             'collection_name': doc_store.collection_name,
             'points_count': collection_info.points_count,
-            'vector_size': collection_info.config.params.vectors.size
+            'vector_size': collection_info.config.params.vectors.size,
+            'collection_profile': doc_store.profile_status(collection_info),
+            'keyword_index': {
+                'documents': len(doc_store.keyword_index),
+                'generation': doc_store.keyword_index.generation
+            },
+            'startup': doc_store.startup_stats,
+            'cache': doc_store.cache_stats(),
+            'context': answer_generator.context_builder.stats(),
+            'answer_cache': answer_cache.stats(),
+            'latency': metrics.snapshot()
         }
     except Exception as e:
         print(f"[Qdrant Test] Stats error: {e}")
         return {'error': str(e)}
 
+@app.get("/metrics")
+async def prometheus_metrics():
+    """Stage and route latencies (p50/p95/p99) and byte/token counters in Prometheus text format"""
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
+
 @app.post("/clear")
-async def clear_collection():
+def clear_collection():
     """Delete all documents from the collection"""
     try:
         print(f"[Qdrant Test] Clearing all documents from collection: {doc_store.collection_name}")
         
-        # Delete the collection and recreate it
-        doc_store.client.delete_collection(collection_name=doc_store.collection_name)
-        
-        # Recreate the collection
-        from qdrant_client.models import Distance, VectorParams
-        doc_store.client.create_collection(
-            collection_name=doc_store.collection_name,
-            vectors_config=VectorParams(size=768, distance=Distance.COSINE)
-        )
+        # Delete the collection, recreate it with the configured profile and empty the keyword index
+        doc_store.reset_collection(timeout=WRITE_TIMEOUT)
         
         print(f"[Qdrant Test] Collection cleared and recreated")
         
         return {'success': True, 'message': 'All documents cleared'}
+    except WriterLockTimeout as e:
+        return _busy(e)
     except Exception as e:
         print(f"[Qdrant Test] Clear error: {e}")
         import traceback
@@ -273,4 +381,13 @@ if __name__ == '__main__':
     print("   - Search using semantic similarity")
     print("   - View Qdrant collection statistics")
     print("=" * 60)
-    uvicorn.run(app, host="0.0.0.0", port=6001)
+    # Several worker processes need a Qdrant server (QDRANT_URL): the embedded database
+    # can only be opened by one process
+    workers = int(os.getenv("SERVER_WORKERS", "1"))
+    if workers > 1 and not os.getenv("QDRANT_URL"):
+        print("⚠️  SERVER_WORKERS > 1 needs QDRANT_URL, starting a single worker")
+        workers = 1
+    if workers > 1:
+        uvicorn.run("server:app", host="0.0.0.0", port=6001, workers=workers)
+    else:
+        uvicorn.run(app, host="0.0.0.0", port=6001)